@@ -6,12 +6,41 @@ Outputs a JSON document to stdout containing:
   - callback_url
   - logic_app_name, workflow_name, tool_name
   - ai_foundry_project_endpoint, ai_model_deployment_name
+  - deployment (Kudu status URL; status succeeded or in_progress)
+  - timings (seconds per deployment step, and in total)
 
 Use shell redirection to capture the JSON and extract fields with `jq`.
 
+All HTTP calls share one aiohttp session and one credential (its
+management token is fetched once). Steps that do not depend on each other
+run concurrently:
+
+  management token -> publishing credentials -+
+  ZIP package build --------------------------+-> zip upload -> deployment
+  list agents (AI Foundry) --------------------------------------------+
+                  deployment -> callback URL -> CustomKeys connection --+
+                                                                       v
+                                                 create / update agent
+
+The upload is asynchronous on the Kudu side; its status URL is polled with
+growing intervals (or as ``Retry-After`` says) for up to --deploy-timeout
+seconds. With --no-wait the callback URL is requested as soon as the
+workflow answers and the tool is registered while the deployment finishes;
+the script then exits without waiting for it and reports its status URL.
+
+With --manifest (a JSON list of workflows, see manifest.example.json)
+every workflow goes into the one package next to the shared host.json (a
+zip deploy replaces the site's content), the agents are listed once, and
+each workflow's callback URL, connection and agent upsert run concurrently,
+at most --max-workers at a time. The output then aggregates the results
+under "workflows" (an "error" entry for each workflow that failed, which
+makes the exit code 1) with "succeeded" / "failed" counts.
+
+Per-step timings are logged to stderr as the steps finish.
+
 Prereqs:
 * Existing Logic App Standard site (name, RG, subscription).
-* Packages: azure-identity, requests, azure-ai-agents.
+* Packages: azure-identity, aiohttp, azure-ai-agents, azure-ai-projects.
 * DefaultAzureCredential must work (login or managed identity).
 
 Example:
@@ -22,12 +51,20 @@ Example:
         --workflow-name AgentHttpWorkflow \
         --ai-foundry-project-endpoint <project_url> \
         --ai-model-deployment-name gpt-4o
+
+    uv run create_default_logicapp_workflow.py \
+        --subscription-id <SUB> \
+        --resource-group <RG> \
+        --logic-app-name <SITE> \
+        --manifest manifest.example.json \
+        --ai-foundry-project-endpoint <project_url> \
+        --ai-model-deployment-name gpt-4o
 """
 # flake8: max-line-length=120
 from __future__ import annotations
 
 import argparse
-import base64
+import asyncio
 import io
 import json
 import logging
@@ -36,24 +73,40 @@ import sys
 import time
 import traceback
 import zipfile
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Tuple
+from typing import Any, Awaitable, Optional, Tuple, TypeVar
 
-import requests
+import aiohttp
+from yarl import URL
+from azure.ai.agents.aio import AgentsClient
 from azure.ai.agents.models import (OpenApiConnectionAuthDetails,
                                     OpenApiConnectionSecurityScheme,
                                     OpenApiFunctionDefinition,
                                     OpenApiToolDefinition)
-from azure.ai.projects import AIProjectClient
+from azure.ai.projects.aio import AIProjectClient
+from azure.core.credentials import AccessToken
 from azure.core.exceptions import AzureError
-from azure.identity import DefaultAzureCredential
+from azure.identity.aio import DefaultAzureCredential
 
 # ---------------------------------------------------------------------------
 # Constants
 # ---------------------------------------------------------------------------
 MGMT_BASE = "https://management.azure.com"
+MGMT_SCOPE = "https://management.azure.com/.default"
 MGMT_API_VERSION_WEB = "2023-01-01"       # publishing credentials
 MGMT_API_VERSION_WORKFLOW = "2022-03-01"  # callback URL
+# Refresh the management token this long before it expires
+TOKEN_REFRESH_MARGIN_S = 300
+# Deployment status polling: first interval, growth factor and ceiling (s)
+POLL_INITIAL_S = 1.0
+POLL_FACTOR = 1.5
+POLL_MAX_S = 15.0
+# Kudu deployment status codes
+KUDU_STATUS_FAILED = 3
+KUDU_STATUS_SUCCESS = 4
+
+T = TypeVar("T")
 
 # ---------------------------------------------------------------------------
 # Logging setup
@@ -67,9 +120,116 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def load_workflow_template() -> dict:
+class StepTimer:
+    """Wall-clock timings of the deployment steps."""
+
+    def __init__(self) -> None:
+        self._started = time.perf_counter()
+        self.steps: dict[str, dict[str, float]] = {}
+
+    async def run(self, name: str, step: Awaitable[T]) -> T:
+        """Await `step`, recording when it started and how long it took."""
+        started = time.perf_counter()
+        cancelled = False
+        try:
+            return await step
+        except asyncio.CancelledError:
+            # Abandoned, not finished: leave it out of the timings
+            cancelled = True
+            raise
+        finally:
+            if not cancelled:
+                duration = time.perf_counter() - started
+                self.steps[name] = {
+                    "start_s": round(started - self._started, 3),
+                    "duration_s": round(duration, 3),
+                }
+                logger.info(f"Step {name} took {duration:.2f}s")
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "total_s": round(time.perf_counter() - self._started, 3),
+            "steps": dict(
+                sorted(self.steps.items(), key=lambda kv: kv[1]["start_s"])
+            ),
+        }
+
+
+class ManagementToken:
+    """Management-plane token from one credential, reused until near expiry."""
+
+    def __init__(self, credential: DefaultAzureCredential) -> None:
+        self._credential = credential
+        self._token: Optional[AccessToken] = None
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> str:
+        # Concurrent callers share one fetch
+        async with self._lock:
+            if (
+                self._token is None
+                or self._token.expires_on - TOKEN_REFRESH_MARGIN_S
+                < time.time()
+            ):
+                self._token = await self._credential.get_token(MGMT_SCOPE)
+                logger.info("Acquired management access token.")
+            return self._token.token
+
+    async def headers(self) -> dict[str, str]:
+        return {"Authorization": f"Bearer {await self.get()}"}
+
+
+@dataclass
+class WorkflowTool:
+    """One workflow to deploy and the tool / agent registered for it."""
+
+    workflow_name: str
+    tool_name: str
+    model_deployment_name: str
+    # Template with a "definition" key; workflow_definition.json if unset
+    definition_file: Optional[Path] = None
+
+
+def load_manifest(path: Path, default_model: str) -> list[WorkflowTool]:
+    """Workflows listed in a JSON manifest.
+
+    The manifest is ``{"workflows": [...]}`` (or just the list); each entry
+    has ``workflow_name`` and optionally ``tool_name`` (default
+    ``<workflow_name>_tool``), ``ai_model_deployment_name`` and
+    ``definition_file`` (relative to the manifest).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    entries = data.get("workflows") if isinstance(data, dict) else data
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"Manifest {path} lists no workflows")
+    workflows: list[WorkflowTool] = []
+    for entry in entries:
+        name = entry.get("workflow_name") if isinstance(entry, dict) else None
+        if not name or not re.fullmatch(r"[A-Za-z0-9_-]+", name):
+            raise ValueError(f"Invalid workflow entry in manifest: {entry}")
+        definition_file = entry.get("definition_file")
+        workflows.append(WorkflowTool(
+            workflow_name=name,
+            tool_name=entry.get("tool_name") or f"{name}_tool",
+            model_deployment_name=(
+                entry.get("ai_model_deployment_name") or default_model
+            ),
+            definition_file=(
+                path.parent / definition_file if definition_file else None
+            ),
+        ))
+    for attr in ("workflow_name", "tool_name"):
+        values = [getattr(w, attr) for w in workflows]
+        duplicates = sorted({v for v in values if values.count(v) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate {attr} in manifest: {duplicates}")
+    return workflows
+
+
+def load_workflow_template(workflow_file: Optional[Path] = None) -> dict:
     script_dir = Path(__file__).parent
-    workflow_file = script_dir / "workflow_definition.json"
+    workflow_file = workflow_file or script_dir / "workflow_definition.json"
     if not workflow_file.exists():
         raise FileNotFoundError(
             f"Workflow definition file not found: {workflow_file}"
@@ -78,8 +238,10 @@ def load_workflow_template() -> dict:
         return json.load(f)
 
 
-def build_workflow_definition(workflow_name: str) -> dict:
-    template = load_workflow_template()
+def build_workflow_definition(
+    workflow_name: str, workflow_file: Optional[Path] = None
+) -> dict:
+    template = load_workflow_template(workflow_file)
     definition = template.get("definition", {})
     try:
         body = definition["actions"]["Respond"]["inputs"]["body"]
@@ -90,7 +252,12 @@ def build_workflow_definition(workflow_name: str) -> dict:
     return definition
 
 
-def build_zip_package(workflow_name: str) -> bytes:
+def build_zip_package(workflows: list[WorkflowTool]) -> bytes:
+    """One package with the shared host.json and every workflow.
+
+    A zip deploy replaces the site's content, so workflows deployed together
+    must be packaged together.
+    """
     host_json = {
         "version": "2.0",
         "extensionBundle": {
@@ -98,10 +265,6 @@ def build_zip_package(workflow_name: str) -> bytes:
             "version": "[1.*, 2.0.0)"
         }
     }
-    workflow_content = {
-        "definition": build_workflow_definition(workflow_name),
-        "kind": "Stateful"
-    }
     mem_file = io.BytesIO()
     with zipfile.ZipFile(
         mem_file, mode="w", compression=zipfile.ZIP_DEFLATED
@@ -109,24 +272,59 @@ def build_zip_package(workflow_name: str) -> bytes:
         zf.writestr(
             "host.json", json.dumps(host_json, indent=2)
         )
-        zf.writestr(
-            f"{workflow_name}/workflow.json",
-            json.dumps(workflow_content, indent=2),
-        )
+        for workflow in workflows:
+            workflow_content = {
+                "definition": build_workflow_definition(
+                    workflow.workflow_name, workflow.definition_file
+                ),
+                "kind": "Stateful"
+            }
+            zf.writestr(
+                f"{workflow.workflow_name}/workflow.json",
+                json.dumps(workflow_content, indent=2),
+            )
     mem_file.seek(0)
     return mem_file.read()
 
 
-def get_access_token() -> str:
-    credential = DefaultAzureCredential()
-    return credential.get_token("https://management.azure.com/.default").token
+class Backoff:
+    """Poll intervals growing geometrically; ``Retry-After`` wins."""
+
+    def __init__(self, deadline: float) -> None:
+        self.deadline = deadline
+        self.interval = POLL_INITIAL_S
+        self.polls = 0
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def next_delay(self, retry_after: Optional[str] = None) -> float:
+        """Seconds until the next poll (never past the deadline)."""
+        delay = self.interval
+        if retry_after:
+            try:
+                delay = max(0.0, float(retry_after))
+            except ValueError:
+                pass
+        self.interval = min(self.interval * POLL_FACTOR, POLL_MAX_S)
+        self.polls += 1
+        return max(0.0, min(delay, self.remaining()))
+
+    async def wait(self, retry_after: Optional[str] = None) -> None:
+        await asyncio.sleep(self.next_delay(retry_after))
 
 
-def get_publishing_credentials(
+async def _raise_for_status(resp: aiohttp.ClientResponse, what: str) -> None:
+    if resp.status >= 300:
+        raise RuntimeError(f"{what}: {resp.status} {await resp.text()}")
+
+
+async def get_publishing_credentials(
+    session: aiohttp.ClientSession,
+    token: ManagementToken,
     subscription_id: str,
     resource_group: str,
     site_name: str,
-    token: str,
 ) -> Tuple[str, str]:
     url = (
         f"{MGMT_BASE}/subscriptions/{subscription_id}/resourceGroups/"
@@ -134,57 +332,103 @@ def get_publishing_credentials(
         "publishingcredentials/list"
         f"?api-version={MGMT_API_VERSION_WEB}"
     )
-    resp = requests.post(
+    async with session.post(
         url,
-        headers={"Authorization": f"Bearer {token}"},
-        timeout=30,
-    )
-    if resp.status_code >= 300:
-        raise RuntimeError(
-            f"Failed publishing credentials: {resp.status_code} {resp.text}"
-        )
-    props = resp.json().get("properties", {})
+        headers=await token.headers(),
+        timeout=aiohttp.ClientTimeout(total=30),
+    ) as resp:
+        await _raise_for_status(resp, "Failed publishing credentials")
+        props = (await resp.json()).get("properties", {})
     user = props.get("publishingUserName")
     pwd = props.get("publishingPassword")
     if not user or not pwd:
         raise RuntimeError("Publishing credentials missing in response")
+    logger.info("Retrieved publishing credentials.")
     return user, pwd
 
 
-def zip_deploy(site_name: str, user: str, pwd: str, zip_bytes: bytes) -> None:
+async def upload_zip(
+    session: aiohttp.ClientSession,
+    site_name: str,
+    auth: aiohttp.BasicAuth,
+    zip_bytes: bytes,
+) -> str:
+    """Start an async Kudu zip deploy; return its status URL."""
     deploy_url = f"https://{site_name}.scm.azurewebsites.net/api/zipdeploy"
-    auth = base64.b64encode(f"{user}:{pwd}".encode()).decode()
-    headers = {"Authorization": f"Basic {auth}"}
     logger.info("Uploading ZIP package via Kudu Zip Deploy...")
-    resp = requests.post(
-        deploy_url, headers=headers, data=zip_bytes, timeout=300
-    )
-    if resp.status_code >= 300:
-        raise RuntimeError(
-            f"Zip Deploy failed: {resp.status_code} {resp.text}"
+    async with session.post(
+        deploy_url,
+        params={"isAsync": "true"},
+        auth=auth,
+        data=zip_bytes,
+        timeout=aiohttp.ClientTimeout(total=300),
+    ) as resp:
+        await _raise_for_status(resp, "Zip Deploy failed")
+        location = resp.headers.get("Location")
+    if not location:
+        # Older Kudu: no status URL, poll the latest deployment instead
+        return (
+            f"https://{site_name}.scm.azurewebsites.net/api/deployments/latest"
         )
-    status_url = (
-        f"https://{site_name}.scm.azurewebsites.net/api/deployments/latest"
-    )
-    for attempt in range(30):
-        time.sleep(2)
-        st = requests.get(status_url, headers=headers, timeout=15)
-        if st.status_code == 200:
-            data = st.json()
-            if data.get("complete") and data.get("status") == 4:
-                logger.info("Deployment completed successfully.")
-                return
-        else:
-            logger.debug(f"Polling attempt {attempt} got {st.status_code}")
-    raise RuntimeError("Deployment did not complete in allotted time.")
+    return str(URL(deploy_url).join(URL(location)))
 
 
-def get_trigger_callback_url(
+async def wait_for_deployment(
+    session: aiohttp.ClientSession,
+    status_url: str,
+    auth: aiohttp.BasicAuth,
+    timeout_s: float,
+) -> dict[str, Any]:
+    """Poll the deployment until it succeeds; return its final status.
+
+    Intervals back off from POLL_INITIAL_S to POLL_MAX_S unless Kudu
+    sends ``Retry-After``; raises when the deployment fails or is still
+    running after `timeout_s`.
+    """
+    backoff = Backoff(time.monotonic() + timeout_s)
+    while True:
+        retry_after = None
+        async with session.get(
+            status_url, auth=auth, timeout=aiohttp.ClientTimeout(total=15)
+        ) as st:
+            if st.status in (200, 202):
+                data = await st.json(content_type=None)
+                status = data.get("status")
+                if data.get("complete") and status == KUDU_STATUS_SUCCESS:
+                    logger.info(
+                        "Deployment completed successfully "
+                        f"({backoff.polls + 1} status polls)."
+                    )
+                    return data
+                if status == KUDU_STATUS_FAILED:
+                    raise RuntimeError(
+                        "Deployment failed: "
+                        f"{data.get('status_text') or data.get('log_url')}"
+                    )
+                logger.debug(
+                    f"Deployment in progress (status {status}, "
+                    f"{data.get('progress') or ''})"
+                )
+            else:
+                logger.debug(
+                    f"Polling attempt {backoff.polls} got {st.status}"
+                )
+            retry_after = st.headers.get("Retry-After")
+        if backoff.remaining() <= 0:
+            raise RuntimeError(
+                f"Deployment did not complete within {timeout_s:.0f}s; "
+                f"check {status_url}"
+            )
+        await backoff.wait(retry_after)
+
+
+async def get_trigger_callback_url(
+    session: aiohttp.ClientSession,
+    token: ManagementToken,
     subscription_id: str,
     resource_group: str,
     site_name: str,
     workflow_name: str,
-    token: str,
 ) -> str:
     url = (
         f"{MGMT_BASE}/subscriptions/{subscription_id}/resourceGroups/"
@@ -194,21 +438,58 @@ def get_trigger_callback_url(
         "listCallbackUrl"
         f"?api-version={MGMT_API_VERSION_WORKFLOW}"
     )
-    resp = requests.post(
+    async with session.post(
         url,
-        headers={"Authorization": f"Bearer {token}"},
-        timeout=30,
-    )
-    if resp.status_code >= 300:
-        raise RuntimeError(
-            f"Failed listing callback URL: {resp.status_code} {resp.text}"
-        )
-    value = resp.json().get("value")
+        headers=await token.headers(),
+        timeout=aiohttp.ClientTimeout(total=30),
+    ) as resp:
+        await _raise_for_status(resp, "Failed listing callback URL")
+        value = (await resp.json()).get("value")
     if not value:
         raise RuntimeError("Callback URL missing in response")
     return value
 
 
+async def wait_for_callback_url(
+    session: aiohttp.ClientSession,
+    token: ManagementToken,
+    subscription_id: str,
+    resource_group: str,
+    site_name: str,
+    workflow_name: str,
+    deployment: asyncio.Future,
+    timeout_s: float,
+) -> str:
+    """The callback URL as soon as the workflow serves it.
+
+    Used with --no-wait: the workflow usually answers before Kudu marks the
+    deployment complete, so the request is retried (with backoff) while
+    `deployment` is still running. Once it has finished its outcome
+    decides: a failed deployment raises, a successful one gets a last try.
+    """
+    backoff = Backoff(time.monotonic() + timeout_s)
+    while True:
+        try:
+            return await get_trigger_callback_url(
+                session,
+                token,
+                subscription_id,
+                resource_group,
+                site_name,
+                workflow_name,
+            )
+        except RuntimeError as exc:
+            if deployment.done():
+                # A failed deployment raises its own error here
+                deployment.result()
+                raise
+            if backoff.remaining() <= 0:
+                raise
+            logger.debug(f"Callback URL not available yet: {exc}")
+        # Wake early when the deployment finishes
+        await asyncio.wait({deployment}, timeout=backoff.next_delay())
+
+
 def load_openapi_template() -> dict:
     script_dir = Path(__file__).parent
     openapi_file = script_dir / "openapi_spec_template.json"
@@ -275,22 +556,28 @@ def parse_project_endpoint(project_endpoint: str) -> tuple[str, str]:
     return account_name, project_name
 
 
-def create_or_update_custom_key_connection(
+def connection_resource_id(
     subscription_id: str,
     resource_group: str,
     account_name: str,
     project_name: str,
     connection_name: str,
-    sig: str,
-    management_token: str,
-) -> None:
-    url = (
-        "https://management.azure.com/subscriptions/"
-        f"{subscription_id}/resourceGroups/{resource_group}/providers/"
-        "Microsoft.CognitiveServices/accounts/"
+) -> str:
+    return (
+        f"/subscriptions/{subscription_id}/resourceGroups/"
+        f"{resource_group}/providers/Microsoft.CognitiveServices/accounts/"
         f"{account_name}/projects/{project_name}/connections/{connection_name}"
-        "?api-version=2025-04-01-preview"
     )
+
+
+async def create_or_update_custom_key_connection(
+    session: aiohttp.ClientSession,
+    token: ManagementToken,
+    connection_id: str,
+    sig: str,
+) -> None:
+    connection_name = connection_id.rsplit("/", 1)[-1]
+    url = f"{MGMT_BASE}{connection_id}?api-version=2025-04-01-preview"
     payload = {
         "properties": {
             "authType": "CustomKeys",
@@ -301,60 +588,34 @@ def create_or_update_custom_key_connection(
             "metadata": {},
         }
     }
-    headers = {
-        "Authorization": f"Bearer {management_token}",
-        "Content-Type": "application/json",
-    }
     logger.info(
         f"Creating/updating CustomKeys connection '{connection_name}'..."
     )
-    resp = requests.put(url, headers=headers, json=payload, timeout=60)
-    if resp.status_code not in (200, 201):
-        raise RuntimeError(
-            f"Conn {connection_name} failed: {resp.status_code} {resp.text}"
-        )
+    async with session.put(
+        url,
+        headers=await token.headers(),
+        json=payload,
+        timeout=aiohttp.ClientTimeout(total=60),
+    ) as resp:
+        if resp.status not in (200, 201):
+            raise RuntimeError(
+                f"Conn {connection_name} failed: {resp.status} "
+                f"{await resp.text()}"
+            )
     logger.info(
         f"Connection '{connection_name}' ready "
-        f"(status {resp.status_code})."
+        f"(status {resp.status})."
     )
 
 
-def register_openapi_tool(
-    project: str,
+def build_openapi_tool(
     workflow_name: str,
     callback_url: str,
     tool_name: str,
-    model_deployment_name: str,
-    subscription_id: str,
-    resource_group: str,
-) -> str:
-    """Register (or update) an agent with an OpenAPI tool; return agent id."""
-    logger.info("Registering OpenAPI tool in AI Foundry...")
-    credential = DefaultAzureCredential()
-    if not project.startswith("https://"):
-        raise ValueError("Invalid project endpoint format")
-    endpoint = project
-    logger.info(f"Using AI Foundry project endpoint: {endpoint}")
-    project_client = AIProjectClient(credential=credential, endpoint=endpoint)
-    client = project_client.agents
-    openapi_spec, params = build_openapi_spec(workflow_name, callback_url)
-    management_token = get_access_token()
-    account_name, project_name = parse_project_endpoint(project)
-    connection_name = f"{tool_name}_connection"
-    create_or_update_custom_key_connection(
-        subscription_id,
-        resource_group,
-        account_name,
-        project_name,
-        connection_name,
-        params["sig"],
-        management_token,
-    )
-    connection_id = (
-        f"/subscriptions/{subscription_id}/resourceGroups/"
-        f"{resource_group}/providers/Microsoft.CognitiveServices/accounts/"
-        f"{account_name}/projects/{project_name}/connections/{connection_name}"
-    )
+    connection_id: str,
+) -> OpenApiToolDefinition:
+    """The workflow as an OpenAPI tool authenticated by the connection."""
+    openapi_spec, _params = build_openapi_spec(workflow_name, callback_url)
     connection_auth = OpenApiConnectionAuthDetails(
         security_scheme=OpenApiConnectionSecurityScheme(
             connection_id=connection_id
@@ -387,22 +648,39 @@ def register_openapi_tool(
         auth=connection_auth,
         default_params=default_params,
     )
-    tool_definition = OpenApiToolDefinition(openapi=openapi_function)
-    logger.info(f"Creating/updating agent with OpenAPI tool: {tool_name}")
-    agents = client.list_agents()
-    agent_name = f"LogicApp-{workflow_name}-Agent"
-    existing_agent = next((a for a in agents if a.name == agent_name), None)
+    return OpenApiToolDefinition(openapi=openapi_function)
+
+
+def agent_name_for(workflow_name: str) -> str:
+    return f"LogicApp-{workflow_name}-Agent"
+
+
+async def list_agents_by_name(client: AgentsClient) -> dict[str, Any]:
+    """The project's agents by name, from one scan (first of each name)."""
+    agents: dict[str, Any] = {}
+    async for agent in client.list_agents():
+        agents.setdefault(agent.name, agent)
+    return agents
+
+
+async def register_openapi_tool(
+    client: AgentsClient,
+    existing_agent: Optional[Any],
+    workflow_name: str,
+    tool_definition: OpenApiToolDefinition,
+    model_deployment_name: str,
+) -> str:
+    """Create or update the agent with the OpenAPI tool; return agent id."""
+    agent_name = agent_name_for(workflow_name)
+    description = f"Agent with access to Logic App workflow {workflow_name}"
+    instructions = f"Invoke workflow {workflow_name} via the registered tool."
     if existing_agent:
         logger.info(f"Updating existing agent: {existing_agent.id}")
-        client.update_agent(
+        await client.update_agent(
             agent_id=existing_agent.id,
             name=agent_name,
-            description=(
-                f"Agent with access to Logic App workflow {workflow_name}"
-            ),
-            instructions=(
-                f"Invoke workflow {workflow_name} via the registered tool."
-            ),
+            description=description,
+            instructions=instructions,
             tools=[tool_definition],
             model=model_deployment_name,
         )
@@ -410,15 +688,11 @@ def register_openapi_tool(
         agent_id = existing_agent.id
     else:
         logger.info(f"Creating new agent: {agent_name}")
-        agent = client.create_agent(
+        agent = await client.create_agent(
             model=model_deployment_name,
             name=agent_name,
-            description=(
-                f"Agent with access to Logic App workflow {workflow_name}"
-            ),
-            instructions=(
-                f"Invoke workflow {workflow_name} via the registered tool."
-            ),
+            description=description,
+            instructions=instructions,
             tools=[tool_definition],
         )
         logger.info(f"Agent created: {agent.id}")
@@ -427,6 +701,221 @@ def register_openapi_tool(
     return agent_id
 
 
+# Errors that fail one workflow of a manifest rather than the whole run
+REGISTRATION_ERRORS = (
+    RuntimeError,
+    ValueError,
+    AzureError,
+    aiohttp.ClientError,
+    asyncio.TimeoutError,
+)
+
+
+async def deploy(
+    args: argparse.Namespace, workflows: list[WorkflowTool]
+) -> dict[str, Any]:
+    """Deploy `workflows` in one package and register a tool for each.
+
+    Returns the aggregated payload. Without --manifest a registration error
+    aborts the run; with it the error is reported in that workflow's entry
+    and the others carry on. At most --max-workers workflows are being
+    registered at a time.
+    """
+    project = args.ai_foundry_project
+    if not project.startswith("https://"):
+        raise ValueError("Invalid project endpoint format")
+    account_name, project_name = parse_project_endpoint(project)
+    bulk = args.manifest is not None
+    timer = StepTimer()
+    pending: list[asyncio.Future] = []
+    semaphore = asyncio.Semaphore(max(1, args.max_workers))
+
+    def start(name: str, step: Awaitable[T]) -> asyncio.Future:
+        task = asyncio.ensure_future(timer.run(name, step))
+        pending.append(task)
+        return task
+
+    logger.info(f"Using AI Foundry project endpoint: {project}")
+    async with DefaultAzureCredential() as credential, aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=max(10, args.max_workers * 2)),
+    ) as session, AIProjectClient(
+        credential=credential, endpoint=project
+    ) as project_client:
+        token = ManagementToken(credential)
+
+        async def register(workflow: WorkflowTool) -> dict[str, Any]:
+            name = workflow.workflow_name
+            suffix = f"[{name}]" if bulk else ""
+            callback_args = (
+                session,
+                token,
+                args.subscription_id,
+                args.resource_group,
+                args.logic_app_name,
+                name,
+            )
+            async with semaphore:
+                if args.no_wait:
+                    # Register the tool while Kudu finishes the deployment
+                    callback = wait_for_callback_url(
+                        *callback_args, deployment_task, args.deploy_timeout
+                    )
+                else:
+                    callback = get_trigger_callback_url(*callback_args)
+                callback_url = await timer.run(
+                    f"callback_url{suffix}", callback
+                )
+                logger.info(
+                    f"Workflow {name} deployed. Manual trigger callback URL:"
+                    f"\n{callback_url}"
+                )
+                _spec, params = build_openapi_spec(name, callback_url)
+                connection_id = connection_resource_id(
+                    args.subscription_id,
+                    args.resource_group,
+                    account_name,
+                    project_name,
+                    f"{workflow.tool_name}_connection",
+                )
+                await timer.run(
+                    f"create_connection{suffix}",
+                    create_or_update_custom_key_connection(
+                        session, token, connection_id, params["sig"]
+                    ),
+                )
+                # One listing serves every workflow
+                existing_agents = await asyncio.shield(agents_task)
+                logger.info(
+                    "Creating/updating agent with OpenAPI tool: "
+                    f"{workflow.tool_name}"
+                )
+                agent_id = await timer.run(
+                    f"register_agent{suffix}",
+                    register_openapi_tool(
+                        project_client.agents,
+                        existing_agents.get(agent_name_for(name)),
+                        name,
+                        build_openapi_tool(
+                            name,
+                            callback_url,
+                            workflow.tool_name,
+                            connection_id,
+                        ),
+                        workflow.model_deployment_name,
+                    ),
+                )
+            return {
+                "workflow_name": name,
+                "tool_name": workflow.tool_name,
+                "ai_model_deployment_name": workflow.model_deployment_name,
+                "ai_foundry_agent_id": agent_id,
+                "callback_url": callback_url,
+            }
+
+        try:
+            start("management_token", token.get())
+            zip_task = start(
+                "build_zip", asyncio.to_thread(build_zip_package, workflows)
+            )
+            credentials_task = start(
+                "publishing_credentials",
+                get_publishing_credentials(
+                    session,
+                    token,
+                    args.subscription_id,
+                    args.resource_group,
+                    args.logic_app_name,
+                ),
+            )
+            agents_task = start(
+                "list_agents", list_agents_by_name(project_client.agents)
+            )
+            zip_bytes, (user, pwd) = await asyncio.gather(
+                zip_task, credentials_task
+            )
+            auth = aiohttp.BasicAuth(user, pwd)
+            status_url = await timer.run(
+                "zip_upload",
+                upload_zip(session, args.logic_app_name, auth, zip_bytes),
+            )
+            deployment_task = start(
+                "deployment",
+                wait_for_deployment(
+                    session, status_url, auth, args.deploy_timeout
+                ),
+            )
+            if not args.no_wait:
+                await deployment_task
+            outcomes = await asyncio.gather(
+                *(register(workflow) for workflow in workflows),
+                return_exceptions=True,
+            )
+            results: list[dict[str, Any]] = []
+            for workflow, outcome in zip(workflows, outcomes):
+                if not isinstance(outcome, BaseException):
+                    results.append(outcome)
+                    continue
+                if not bulk or not isinstance(outcome, REGISTRATION_ERRORS):
+                    raise outcome
+                logger.error(f"Workflow {workflow.workflow_name}: {outcome}")
+                results.append({
+                    "workflow_name": workflow.workflow_name,
+                    "tool_name": workflow.tool_name,
+                    "error": str(outcome),
+                })
+            deployment: dict[str, Any] = {"status_url": status_url}
+            if deployment_task.done():
+                # Raises if it failed while the tools were being registered
+                deployment["id"] = deployment_task.result().get("id")
+                deployment["status"] = "succeeded"
+            else:
+                logger.info(
+                    "Not waiting for the deployment to complete; "
+                    f"check {status_url}"
+                )
+                deployment["status"] = "in_progress"
+        finally:
+            # A failed step leaves its siblings running; stop them before
+            # the session and credential close
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+    timings = timer.summary()
+    for name, step in timings["steps"].items():
+        logger.info(
+            f"  {name:<24} start {step['start_s']:7.2f}s  "
+            f"took {step['duration_s']:7.2f}s"
+        )
+    logger.info(f"Deployment took {timings['total_s']:.2f}s")
+    failed = sum("error" in result for result in results)
+    return {
+        "ai_foundry_project_endpoint": project,
+        "ai_model_deployment_name": args.ai_model_deployment_name,
+        "logic_app_name": args.logic_app_name,
+        "workflows": results,
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "deployment": deployment,
+        "timings": timings,
+    }
+
+
+def single_workflow_payload(payload: dict[str, Any]) -> dict[str, Any]:
+    """The one-workflow output format (without --manifest)."""
+    result = payload["workflows"][0]
+    return {
+        "ai_foundry_project_endpoint": payload["ai_foundry_project_endpoint"],
+        "ai_model_deployment_name": payload["ai_model_deployment_name"],
+        "ai_foundry_agent_id": result["ai_foundry_agent_id"],
+        "logic_app_name": payload["logic_app_name"],
+        "workflow_name": result["workflow_name"],
+        "tool_name": result["tool_name"],
+        "callback_url": result["callback_url"],
+        "deployment": payload["deployment"],
+        "timings": payload["timings"],
+    }
+
+
 def parse_args(argv: list[str]) -> argparse.Namespace:
     p = argparse.ArgumentParser(
         description=(
@@ -466,6 +955,37 @@ def parse_args(argv: list[str]) -> argparse.Namespace:
         default="logicapp_workflow_tool",
         help="Tool name for OpenAPI registration",
     )
+    p.add_argument(
+        "--manifest",
+        type=Path,
+        help=(
+            "JSON manifest of workflows to deploy together (replaces "
+            "--workflow-name / --tool-name); see manifest.example.json"
+        ),
+    )
+    p.add_argument(
+        "--max-workers",
+        type=int,
+        default=4,
+        help=(
+            "Workflows registered concurrently "
+            "(callback URL, connection, agent)"
+        ),
+    )
+    p.add_argument(
+        "--deploy-timeout",
+        type=float,
+        default=600.0,
+        help="Seconds to wait for the zip deployment to complete",
+    )
+    p.add_argument(
+        "--no-wait",
+        action="store_true",
+        help=(
+            "Register the tool while the deployment completes and exit "
+            "without waiting for it (its status URL is in the output)"
+        ),
+    )
     p.add_argument(
         "--debug",
         action="store_true",
@@ -487,65 +1007,23 @@ def main(argv: list[str]) -> int:
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
 
-    subscription_id = args.subscription_id
-    resource_group = args.resource_group
-    logic_app_name = args.logic_app_name
-    ai_foundry_project = args.ai_foundry_project
-    ai_model_deployment_name = args.ai_model_deployment_name
-    workflow_name = args.workflow_name
-    tool_name = args.tool_name
-
     try:
-        # Cast to str to ensure correct types for downstream function calls
-        subscription_id = str(subscription_id)
-        resource_group = str(resource_group)
-        logic_app_name = str(logic_app_name)
-        ai_foundry_project = str(ai_foundry_project)
-        ai_model_deployment_name = str(ai_model_deployment_name)
-        token = get_access_token()
-        logger.info("Acquired management access token.")
-        user, pwd = get_publishing_credentials(
-            subscription_id,
-            resource_group,
-            logic_app_name,
-            token,
-        )
-        logger.info("Retrieved publishing credentials.")
-        zip_bytes = build_zip_package(workflow_name)
-        zip_deploy(logic_app_name, user, pwd, zip_bytes)
-        callback_url = get_trigger_callback_url(
-            subscription_id,
-            resource_group,
-            logic_app_name,
-            workflow_name,
-            token,
-        )
-        logger.info(
-            "Workflow deployed. Manual trigger callback URL:\n"
-            f"{callback_url}"
-        )
-        # Register tool & capture agent id
-        agent_id = register_openapi_tool(
-            project=ai_foundry_project,
-            workflow_name=workflow_name,
-            callback_url=callback_url,
-            tool_name=tool_name,
-            model_deployment_name=ai_model_deployment_name,
-            subscription_id=subscription_id,
-            resource_group=resource_group,
-        )
-        output_payload = {
-            "ai_foundry_project_endpoint": ai_foundry_project,
-            "ai_model_deployment_name": ai_model_deployment_name,
-            "ai_foundry_agent_id": agent_id,
-            "logic_app_name": logic_app_name,
-            "workflow_name": workflow_name,
-            "tool_name": tool_name,
-            "callback_url": callback_url,
-        }
+        if args.manifest is not None:
+            workflows = load_manifest(
+                args.manifest, args.ai_model_deployment_name
+            )
+        else:
+            workflows = [WorkflowTool(
+                workflow_name=args.workflow_name,
+                tool_name=args.tool_name,
+                model_deployment_name=args.ai_model_deployment_name,
+            )]
+        output_payload = asyncio.run(deploy(args, workflows))
+        if args.manifest is None:
+            output_payload = single_workflow_payload(output_payload)
         logger.info("Emitting deployment output JSON")
         print(json.dumps(output_payload, indent=2))
-        return 0
+        return 1 if output_payload.get("failed") else 0
     except AzureError as az_ex:
         logger.error(f"AzureError: {az_ex}")
         if args.debug:
@@ -554,8 +1032,9 @@ def main(argv: list[str]) -> int:
     except (
         RuntimeError,
         ValueError,
-        AzureError,
-        requests.RequestException,
+        OSError,
+        aiohttp.ClientError,
+        asyncio.TimeoutError,
     ) as ex:
         logger.error(f"Error: {ex}")
         if args.debug:
@@ -0,0 +1,6 @@
+"""Performance tooling (benchmarks, load harness). Not shipped in the image.
+
+Run modules from the container project root, e.g.::
+
+    python -m perf.bench_cards
+"""
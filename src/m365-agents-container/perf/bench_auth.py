@@ -0,0 +1,231 @@
+"""Benchmark bearer-token validation on the ``/api/messages`` path.
+
+Mints RS256 tokens locally and serves their signing keys from a local JWKS
+endpoint (in a background thread, with ``--jwks-latency-ms`` added to each
+response to stand in for the real endpoint), then times:
+
+* ``sdk``: the Agents SDK's ``JwtTokenValidator`` (fetches the keys on every
+  call, synchronously);
+* ``keys``: `CachedTokenValidator` with cached keys but no result cache;
+* ``cached``: `CachedTokenValidator` as configured by default.
+
+Requests cycle through ``--tokens`` distinct tokens, as a channel reuses
+its token until it expires. A final check rotates the signing key and sends
+``--burst`` concurrent requests signed with the new key id, reporting how
+many JWKS fetches they caused.
+
+Usage:
+    python -m perf.bench_auth [--requests 500] [--tokens 20] [--json]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+from unittest import mock
+
+import jwt
+from aiohttp import web
+from cryptography.hazmat.primitives.asymmetric import rsa
+from microsoft_agents.hosting.core import AgentAuthConfiguration
+from microsoft_agents.hosting.core.authorization import jwt_token_validator
+
+from perf.bench_server import percentile
+from src.app.auth import (BOT_FRAMEWORK_ISSUER, CachedTokenValidator,
+                          JwksCache)
+
+CLIENT_ID = "00000000-0000-0000-0000-00000000b0t5"
+
+
+class LocalIssuer:
+    """RSA signing keys, a JWKS endpoint and a token minter."""
+
+    def __init__(self, latency_ms: float) -> None:
+        self.latency_s = latency_ms / 1000.0
+        self.keys: List[tuple[str, Any]] = []
+        self.fetches = 0
+        self.port = 0
+        self._ready = threading.Event()
+        self.rotate()
+
+    def rotate(self) -> str:
+        kid = uuid.uuid4().hex[:16]
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.keys.append((kid, key))
+        return kid
+
+    def mint(self, *, lifetime_s: float = 3600.0) -> str:
+        kid, key = self.keys[-1]
+        now = int(time.time())
+        return jwt.encode(
+            {
+                "iss": BOT_FRAMEWORK_ISSUER,
+                "aud": CLIENT_ID,
+                "iat": now,
+                "nbf": now,
+                "exp": now + int(lifetime_s),
+                "serviceurl": "https://smba.trafficmanager.net/amer/",
+                "jti": uuid.uuid4().hex,
+            },
+            key,
+            algorithm="RS256",
+            headers={"kid": kid},
+        )
+
+    def jwks(self) -> Dict[str, Any]:
+        keys = []
+        for kid, key in self.keys:
+            jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key()))
+            keys.append({**jwk, "kid": kid, "use": "sig", "alg": "RS256"})
+        return {"keys": keys}
+
+    @property
+    def uri(self) -> str:
+        return f"http://127.0.0.1:{self.port}/keys"
+
+    def start(self) -> None:
+        threading.Thread(target=self._serve, daemon=True).start()
+        self._ready.wait(10)
+
+    def _serve(self) -> None:
+        async def keys(_request: web.Request) -> web.Response:
+            self.fetches += 1
+            await asyncio.sleep(self.latency_s)
+            return web.json_response(self.jwks())
+
+        async def main() -> None:
+            app = web.Application()
+            app.router.add_get("/keys", keys)
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            self.port = site._server.sockets[0].getsockname()[1]
+            self._ready.set()
+            await asyncio.Event().wait()
+
+        asyncio.run(main())
+
+
+def _configuration() -> AgentAuthConfiguration:
+    return AgentAuthConfiguration(client_id=CLIENT_ID, tenant_id="bench")
+
+
+async def _time(
+    validate: Callable[[str], Any], tokens: List[str], requests: int
+) -> List[float]:
+    samples = []
+    for i in range(requests):
+        started = time.perf_counter()
+        await validate(tokens[i % len(tokens)])
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def _summary(samples: List[float], fetches: int) -> Dict[str, Any]:
+    ordered = sorted(samples)
+    return {
+        "requests": len(samples),
+        "mean_ms": round(sum(ordered) / len(ordered), 3),
+        "p50_ms": round(percentile(ordered, 50), 3),
+        "p99_ms": round(percentile(ordered, 99), 3),
+        "jwks_fetches": fetches,
+    }
+
+
+async def _bench(args: argparse.Namespace, issuer: LocalIssuer) -> Dict[str, Any]:
+    tokens = [issuer.mint() for _ in range(args.tokens)]
+    results: Dict[str, Any] = {}
+
+    if "sdk" in args.modes:
+        real_client = jwt.PyJWKClient
+        validator = jwt_token_validator.JwtTokenValidator(_configuration())
+
+        async def sdk(token: str) -> Any:
+            return validator.validate_token(token)
+
+        before = issuer.fetches
+        with mock.patch.object(
+            jwt_token_validator,
+            "PyJWKClient",
+            lambda _uri: real_client(issuer.uri),
+        ):
+            samples = await _time(sdk, tokens, args.requests)
+        results["sdk"] = _summary(samples, issuer.fetches - before)
+
+    for mode, max_entries in (("keys", 0), ("cached", 10_000)):
+        if mode not in args.modes:
+            continue
+        cached = CachedTokenValidator(
+            _configuration(),
+            # No refetch floor, so the rotation check measures single flight
+            JwksCache(min_refresh_interval_s=0.0),
+            max_entries=max_entries,
+            jwks_uri=issuer.uri,
+        )
+        before = issuer.fetches
+        samples = await _time(cached.validate, tokens, args.requests)
+        results[mode] = _summary(samples, issuer.fetches - before)
+        results[mode]["validator"] = cached.snapshot()
+
+        if mode == "cached":
+            issuer.rotate()
+            rotated = [issuer.mint() for _ in range(args.burst)]
+            before = issuer.fetches
+            outcomes = await asyncio.gather(
+                *(cached.validate(token) for token in rotated),
+                return_exceptions=True,
+            )
+            results["rotation"] = {
+                "requests": args.burst,
+                "failed": sum(isinstance(o, Exception) for o in outcomes),
+                "jwks_fetches": issuer.fetches - before,
+            }
+        await cached.close()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--tokens", type=int, default=20)
+    parser.add_argument("--burst", type=int, default=100)
+    parser.add_argument("--jwks-latency-ms", type=float, default=20.0)
+    parser.add_argument(
+        "--modes", default="sdk,keys,cached",
+        help="comma-separated subset of sdk,keys,cached",
+    )
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+    args.modes = set(args.modes.split(","))
+
+    issuer = LocalIssuer(args.jwks_latency_ms)
+    issuer.start()
+    results = asyncio.run(_bench(args, issuer))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    for mode in ("sdk", "keys", "cached"):
+        if mode in results:
+            r = results[mode]
+            print(
+                f"{mode:<7} {r['requests']} requests: mean {r['mean_ms']} ms, "
+                f"p50 {r['p50_ms']} ms, p99 {r['p99_ms']} ms, "
+                f"{r['jwks_fetches']} JWKS fetch(es)"
+            )
+    if "rotation" in results:
+        r = results["rotation"]
+        print(
+            f"rotation: {r['requests']} concurrent requests with a new key id "
+            f"-> {r['jwks_fetches']} JWKS fetch(es), {r['failed']} failed"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
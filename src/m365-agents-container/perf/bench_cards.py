@@ -0,0 +1,76 @@
+"""Benchmark size-budgeted card building on huge code-interpreter outputs.
+
+Builds response cards for synthetic outputs from a few KB up to tens of MB
+and reports build time, card count and the largest serialized card. Exits
+non-zero if any card exceeds the configured byte budget.
+
+Usage:
+    python -m perf.bench_cards [--sizes 10000,1000000,20000000] [--repeat 3]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from src.api.cards import build_response_adaptive_cards
+from src.app.config import CARD_MAX_BYTES
+
+DEFAULT_SIZES = "10000,100000,1000000,10000000"
+
+
+def make_code_output(size: int) -> str:
+    """Return roughly `size` characters of code with quotes/escapes/unicode."""
+    line = 'print(f"row {i:>6}: value=\\"{i * 3.14:.2f}\\"\\t→ ok")\n'
+    return (line * (size // len(line) + 1))[:size]
+
+
+def bench(size: int, repeat: int) -> dict:
+    code_blocks = [{"code": make_code_output(size), "type": "CodeContent"}]
+    metadata = {"response_time_ms": 1234.0, "total_tokens": 999,
+                "thread_id": "thread_x", "run_id": "run_x"}
+    timings = []
+    cards: list = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cards = build_response_adaptive_cards("", metadata, code_blocks, None)
+        timings.append((time.perf_counter() - start) * 1000)
+    largest = max(len(json.dumps(card)) for card in cards)
+    return {
+        "input_chars": size,
+        "cards": len(cards),
+        "largest_card_bytes": largest,
+        "build_ms_median": round(statistics.median(timings), 2),
+        "build_ms_max": round(max(timings), 2),
+    }
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="Emit JSON")
+    args = parser.parse_args(argv)
+
+    results = [
+        bench(int(size), args.repeat) for size in args.sizes.split(",") if size
+    ]
+    if args.json:
+        print(json.dumps({"budget_bytes": CARD_MAX_BYTES, "results": results},
+                         indent=2))
+    else:
+        print(f"card budget: {CARD_MAX_BYTES} bytes")
+        print(f"{'input chars':>12} {'cards':>6} {'largest':>8} "
+              f"{'median ms':>10} {'max ms':>8}")
+        for r in results:
+            print(f"{r['input_chars']:>12} {r['cards']:>6} "
+                  f"{r['largest_card_bytes']:>8} {r['build_ms_median']:>10} "
+                  f"{r['build_ms_max']:>8}")
+    over = [r for r in results if r["largest_card_bytes"] > CARD_MAX_BYTES]
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,118 @@
+"""Replay a recorded code-interpreter delta stream through chunk processing.
+
+Feeds ``perf/data/code_interpreter_deltas.jsonl`` (optionally repeated as
+several runs) through ``_process_chunk_content`` using real agent framework
+update objects, then builds the response cards. Reports the number of
+deltas, the resulting code block count and processing/build time, and exits
+non-zero if the block count does not match the recorded number of cells.
+
+Usage:
+    python -m perf.bench_code_assembly [--runs 50] [--repeat 5]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from agent_framework import (AgentRunResponseUpdate, HostedFileContent,
+                             TextContent, UsageContent, UsageDetails)
+
+from perf.mock_agent import code_delta, code_outputs, make_update
+from src.api.cards import build_response_adaptive_cards
+from src.api.code_blocks import CodeBlockAssembler
+from src.api.handlers import _process_chunk_content
+
+DEFAULT_RECORDING = (
+    Path(__file__).parent / "data" / "code_interpreter_deltas.jsonl"
+)
+
+
+def load_updates(path: Path, runs: int) -> tuple[List[AgentRunResponseUpdate], int]:
+    """Build update objects for `runs` replays of the recording."""
+    events = [json.loads(line) for line in path.read_text().splitlines() if line]
+    header = events[0]
+    updates: List[AgentRunResponseUpdate] = []
+    for n in range(runs):
+        run_id = f"{header['run_id']}_{n}"
+        for event in events[1:]:
+            kind = event["kind"]
+            if kind == "ci_delta":
+                updates.append(
+                    make_update(run_id, [], code_delta(event["input"]))
+                )
+            elif kind == "ci_outputs":
+                updates.append(make_update(
+                    run_id,
+                    [TextContent(text=event["logs"])],
+                    code_outputs(event["logs"]),
+                ))
+            elif kind == "ci_image":
+                updates.append(
+                    make_update(
+                        run_id, [HostedFileContent(file_id=event["file_id"])]
+                    )
+                )
+            elif kind == "text":
+                updates.append(
+                    make_update(run_id, [TextContent(text=event["text"])])
+                )
+            elif kind == "usage":
+                usage = UsageDetails(
+                    input_token_count=event["input"],
+                    output_token_count=event["output"],
+                    total_token_count=event["total"],
+                )
+                updates.append(make_update(run_id, [UsageContent(usage)]))
+    return updates, header["cells"] * runs
+
+
+def run_once(updates: List[AgentRunResponseUpdate]) -> Dict[str, Any]:
+    code_blocks = CodeBlockAssembler()
+    images: List[Dict[str, Any]] = []
+    token_counts: Dict[str, Optional[int]] = {
+        "total_tokens": None, "prompt_tokens": None, "completion_tokens": None,
+    }
+    start = time.perf_counter()
+    for update in updates:
+        _process_chunk_content(update, code_blocks, images, token_counts)
+    blocks = code_blocks.blocks()
+    process_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    cards = build_response_adaptive_cards("", None, blocks, images)
+    build_ms = (time.perf_counter() - start) * 1000
+    return {"blocks": len(blocks), "cards": len(cards),
+            "process_ms": process_ms, "build_ms": build_ms}
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recording", type=Path, default=DEFAULT_RECORDING)
+    parser.add_argument("--runs", type=int, default=1,
+                        help="Replay the recording as this many runs")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    updates, expected_blocks = load_updates(args.recording, args.runs)
+    results = [run_once(updates) for _ in range(args.repeat)]
+    blocks = results[0]["blocks"]
+    summary = {
+        "deltas": len(updates),
+        "blocks": blocks,
+        "expected_blocks": expected_blocks,
+        "cards": results[0]["cards"],
+        "process_ms_median": round(
+            statistics.median(r["process_ms"] for r in results), 3),
+        "build_ms_median": round(
+            statistics.median(r["build_ms"] for r in results), 3),
+    }
+    print(json.dumps(summary, indent=2))
+    return 0 if blocks == expected_blocks else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,158 @@
+"""Compare aiohttp server settings by requests/second and latency percentiles.
+
+Each profile starts the real service (``python -m src.main``) in a child
+process with the profile's environment overrides, drives it with
+concurrent keep-alive clients for a fixed duration and records RPS and
+p50/p95/p99 latency. By default the unauthenticated ``/healthz`` route is
+used, which isolates server/loop overhead from agent latency; pass
+``--path``/``--method`` to target another route.
+
+Usage:
+    python -m perf.bench_server [--duration 10] [--concurrency 64]
+                                [--profiles default,uvloop] [--output out.json]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import aiohttp
+
+PROFILES: Dict[str, Dict[str, str]] = {
+    "default": {},
+    "uvloop": {"SERVER_USE_UVLOOP": "true"},
+    "no-access-log": {"SERVER_ACCESS_LOG": "false"},
+    "uvloop-no-access-log": {
+        "SERVER_USE_UVLOOP": "true",
+        "SERVER_ACCESS_LOG": "false",
+    },
+    "tuned": {
+        "SERVER_USE_UVLOOP": "true",
+        "SERVER_ACCESS_LOG": "false",
+        "SERVER_BACKLOG": "2048",
+        "SERVER_KEEPALIVE_TIMEOUT": "120",
+    },
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = int(round(pct / 100 * (len(sorted_values) - 1)))
+    idx = min(len(sorted_values) - 1, rank)
+    return sorted_values[idx]
+
+
+async def wait_ready(url: str, timeout_s: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(url) as resp:
+                    if resp.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server did not become ready: {url}")
+
+
+async def drive(url: str, method: str, body: bytes | None,
+                concurrency: int, duration_s: float) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors = 0
+    stop_at = time.perf_counter() + duration_s
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def worker() -> None:
+            nonlocal errors
+            while time.perf_counter() < stop_at:
+                start = time.perf_counter()
+                try:
+                    async with session.request(method, url, data=body) as resp:
+                        await resp.read()
+                        if resp.status >= 500:
+                            errors += 1
+                except aiohttp.ClientError:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+def run_profile(name: str, args: argparse.Namespace) -> Dict[str, object]:
+    env = dict(os.environ)
+    env.update(PROFILES[name])
+    env["PORT"] = str(args.port)
+    env.setdefault("LOG_LEVEL", "WARNING")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "src.main"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{args.port}"
+    try:
+        asyncio.run(wait_ready(f"{base}/healthz"))
+        body = args.body.encode() if args.body else None
+        result = asyncio.run(
+            drive(f"{base}{args.path}", args.method, body,
+                  args.concurrency, args.duration)
+        )
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return {"profile": name, "settings": PROFILES[name], **result}
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--port", type=int, default=3990)
+    parser.add_argument("--path", default="/healthz")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--body", default="")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.profiles.split(","):
+        if name not in PROFILES:
+            parser.error(f"unknown profile {name!r}")
+        result = run_profile(name, args)
+        results.append(result)
+        print(f"{name:>22}: {result['rps']:>9} rps  p50 {result['p50_ms']:>7} ms"
+              f"  p99 {result['p99_ms']:>7} ms  errors {result['errors']}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
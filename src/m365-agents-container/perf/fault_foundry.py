@@ -0,0 +1,529 @@
+"""Fault-injecting local stand-in for the Azure AI Foundry Agents API.
+
+Serves the REST calls the service makes through the real Agent Framework
+and Azure AI Agents SDKs:
+
+* ``get_agent``       GET  /assistants/{id}
+* ``create_thread``   POST /threads
+* ``create_message``  POST /threads/{id}/messages
+* ``list_runs``       GET  /threads/{id}/runs
+* ``run_stream``      POST /threads/{id}/runs (server-sent events)
+* ``cancel_run``      POST /threads/{id}/runs/{run_id}/cancel
+* ``delete_thread``   DELETE /threads/{id}
+
+A scenario (JSON file) sets per-operation latency distributions, the
+shape and pace of the streamed answer, and per-operation fault rates:
+
+* ``408``, ``429``, ``500``, ``502``, ``503``, ``504``: error responses
+  (``408`` with an HTML gateway page, ``429`` with ``Retry-After``);
+* ``html_200``: a 200 response whose body is an HTML page, not JSON;
+* ``truncate``: the stream ends cleanly part-way, without completion;
+* ``malformed``: a delta event with cut-off JSON, then the stream ends;
+* ``disconnect``: the connection is dropped part-way through the stream;
+* ``drip``: the whole answer streams at ``drip_tokens_per_s``;
+* ``stall``: the first token is held back ``stall_ms``.
+
+Threads keep their history size, so reported prompt tokens grow with every
+turn like the real service's; ``prompt_ms_per_1k_tokens`` adds matching
+time to first token.
+
+Example scenario::
+
+    {
+      "name": "throttled",
+      "latency": {"*": {"dist": "lognormal", "ms": 80, "sigma": 0.6}},
+      "stream": {"first_token_ms": 400, "tokens_per_s": 40, "text_chars": 600},
+      "faults": {"run_stream": {"429": 0.2, "disconnect": 0.05}}
+    }
+
+``python -m perf.loadtest --foundry-scenario FILE`` runs the service
+against the stand-in; run this module directly to serve it on its own:
+
+    python -m perf.fault_foundry SCENARIO.json [--port 3987]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+from perf.mock_agent import MockAgentOptions
+
+OPERATIONS = (
+    "get_agent", "create_thread", "create_message", "list_runs", "run_stream",
+    "cancel_run", "delete_thread",
+)
+HTTP_FAULTS = {"408", "429", "500", "502", "503", "504"}
+STREAM_FAULTS = {"truncate", "malformed", "disconnect", "drip", "stall"}
+FAULTS = HTTP_FAULTS | STREAM_FAULTS | {"html_200"}
+PROJECT_PATH = "/api/projects/fault-injection"
+
+_GATEWAY_PAGE = (
+    "<html><head><title>408 Request Timeout</title></head><body>"
+    "<h1>Request Timeout</h1><p>The gateway timed out.</p></body></html>"
+)
+_FILLER = (
+    "Revenue grew in every region this quarter, led by cloud services, "
+    "while hardware sales softened slightly. "
+)
+_CODE_LINE = "totals = df.groupby('region')['revenue'].sum()  # {n}\n"
+
+
+@dataclass
+class Latency:
+    """Added response latency: fixed, uniform(ms..max_ms) or lognormal."""
+
+    dist: str = "fixed"
+    ms: float = 0.0  # fixed value, uniform lower bound or lognormal median
+    max_ms: float = 0.0
+    sigma: float = 0.5
+
+    def sample(self, rng: random.Random) -> float:
+        if self.dist == "uniform":
+            value = rng.uniform(self.ms, max(self.ms, self.max_ms))
+        elif self.dist == "lognormal":
+            value = self.ms * math.exp(rng.gauss(0.0, self.sigma))
+            if self.max_ms:
+                value = min(value, self.max_ms)
+        else:
+            value = self.ms
+        return max(0.0, value) / 1000.0
+
+
+@dataclass
+class FaultScenario:
+    """Latency, stream shape and fault rates for the stand-in."""
+
+    name: str = "default"
+    seed: Optional[int] = None
+    latency: Dict[str, Latency] = field(default_factory=dict)
+    faults: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    stream: MockAgentOptions = field(default_factory=MockAgentOptions)
+    drip_tokens_per_s: float = 1.0
+    retry_after_s: float = 1.0
+    stall_ms: float = 10000.0
+    prompt_ms_per_1k_tokens: float = 0.0
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FaultScenario":
+        faults = {
+            op: {str(k): float(v) for k, v in rates.items()}
+            for op, rates in (data.get("faults") or {}).items()
+        }
+        unknown = {
+            kind for rates in faults.values() for kind in rates
+        } - FAULTS
+        if unknown:
+            raise ValueError(f"unknown fault kinds: {sorted(unknown)}")
+        return cls(
+            name=data.get("name", "default"),
+            seed=data.get("seed"),
+            latency={
+                op: Latency(**spec)
+                for op, spec in (data.get("latency") or {}).items()
+            },
+            faults=faults,
+            stream=MockAgentOptions.from_dict(data.get("stream") or {}),
+            drip_tokens_per_s=float(data.get("drip_tokens_per_s", 1.0)),
+            retry_after_s=float(data.get("retry_after_s", 1.0)),
+            stall_ms=float(data.get("stall_ms", 10000.0)),
+            prompt_ms_per_1k_tokens=float(
+                data.get("prompt_ms_per_1k_tokens", 0.0)
+            ),
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "FaultScenario":
+        return cls.from_dict(json.loads(Path(path).read_text()))
+
+    def latency_for(self, op: str) -> Optional[Latency]:
+        return self.latency.get(op) or self.latency.get("*")
+
+    def pick_fault(self, op: str, rng: random.Random) -> Optional[str]:
+        """Draw at most one fault for a call to `op`."""
+        rates = {**self.faults.get("*", {}), **self.faults.get(op, {})}
+        if op != "run_stream":
+            rates = {k: v for k, v in rates.items() if k not in STREAM_FAULTS}
+        roll = rng.random()
+        for kind, rate in rates.items():
+            if roll < rate:
+                return kind
+            roll -= rate
+        return None
+
+
+def _now() -> int:
+    return int(time.time())
+
+
+def _sse(event: str, data: Any) -> bytes:
+    payload = data if isinstance(data, str) else json.dumps(data)
+    return f"event: {event}\ndata: {payload}\n\n".encode()
+
+
+def _pieces(text: str, size: int) -> List[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class FaultFoundry:
+    """aiohttp application implementing the stand-in."""
+
+    def __init__(self, scenario: FaultScenario) -> None:
+        self.scenario = scenario
+        self.rng = random.Random(scenario.seed)
+        self.counts: Counter = Counter()
+        # Characters of history per thread, for prompt token counts
+        self.thread_chars: Counter = Counter()
+
+    # -- helpers -------------------------------------------------------
+    async def _begin(self, op: str) -> Tuple[Optional[str], Optional[web.Response]]:
+        """Apply latency, draw a fault; return (fault, error response)."""
+        latency = self.scenario.latency_for(op)
+        if latency is not None:
+            await asyncio.sleep(latency.sample(self.rng))
+        fault = self.scenario.pick_fault(op, self.rng)
+        self.counts[(op, fault or "ok")] += 1
+        if fault == "408":
+            return fault, web.Response(
+                status=408, text=_GATEWAY_PAGE, content_type="text/html"
+            )
+        if fault in HTTP_FAULTS:
+            headers = {}
+            if fault == "429":
+                headers["Retry-After"] = f"{self.scenario.retry_after_s:g}"
+            return fault, web.json_response(
+                {"error": {"code": f"fault_{fault}",
+                           "message": f"Injected {fault} ({op})"}},
+                status=int(fault),
+                headers=headers,
+            )
+        if fault == "html_200":
+            return fault, web.Response(
+                text=_GATEWAY_PAGE, content_type="text/html"
+            )
+        return fault, None
+
+    def _run(self, thread_id: str, run_id: str, agent_id: str,
+             status: str) -> Dict[str, Any]:
+        return {
+            "id": run_id, "object": "thread.run", "created_at": _now(),
+            "thread_id": thread_id, "assistant_id": agent_id,
+            "status": status, "model": "gpt-4o", "instructions": "",
+            "tools": [], "metadata": {},
+        }
+
+    def _step(self, thread_id: str, run_id: str, agent_id: str,
+              status: str, usage: Optional[Dict[str, int]] = None
+              ) -> Dict[str, Any]:
+        return {
+            "id": f"step_{run_id}", "object": "thread.run.step",
+            "created_at": _now(), "assistant_id": agent_id,
+            "thread_id": thread_id, "run_id": run_id, "type": "tool_calls",
+            "status": status, "step_details": {"type": "tool_calls",
+                                               "tool_calls": []},
+            "usage": usage, "metadata": {},
+        }
+
+    # -- routes --------------------------------------------------------
+    async def get_agent(self, request: web.Request) -> web.Response:
+        _, error = await self._begin("get_agent")
+        if error is not None:
+            return error
+        return web.json_response({
+            "id": request.match_info["agent_id"], "object": "assistant",
+            "created_at": _now(), "name": "Fault-injection agent",
+            "description": None, "model": "gpt-4o",
+            "instructions": "Answer questions.", "tools": [],
+            "tool_resources": {}, "temperature": 1.0, "top_p": 1.0,
+            "metadata": {},
+        })
+
+    async def create_thread(self, request: web.Request) -> web.Response:
+        _, error = await self._begin("create_thread")
+        if error is not None:
+            return error
+        return web.json_response({
+            "id": f"thread_{uuid.uuid4().hex[:12]}", "object": "thread",
+            "created_at": _now(), "metadata": {}, "tool_resources": {},
+        })
+
+    async def create_message(self, request: web.Request) -> web.Response:
+        _, error = await self._begin("create_message")
+        if error is not None:
+            return error
+        body = await request.json()
+        self.thread_chars[request.match_info["thread_id"]] += len(
+            str(body.get("content", ""))
+        )
+        return web.json_response({
+            "id": f"msg_{uuid.uuid4().hex[:12]}", "object": "thread.message",
+            "created_at": _now(),
+            "thread_id": request.match_info["thread_id"],
+            "status": "completed", "role": body.get("role", "user"),
+            "content": [{"type": "text", "text": {
+                "value": str(body.get("content", "")), "annotations": []}}],
+            "attachments": [], "metadata": {},
+        })
+
+    async def list_runs(self, request: web.Request) -> web.Response:
+        _, error = await self._begin("list_runs")
+        if error is not None:
+            return error
+        return web.json_response({
+            "object": "list", "data": [], "first_id": None,
+            "last_id": None, "has_more": False,
+        })
+
+    async def run_stream(self, request: web.Request) -> web.StreamResponse:
+        fault, error = await self._begin("run_stream")
+        if error is not None:
+            return error
+        body = await request.json()
+        thread_id = request.match_info["thread_id"]
+        agent_id = body.get("assistant_id") or body.get("agent_id") or "agent"
+        run_id = f"run_{uuid.uuid4().hex[:12]}"
+        opts = self.scenario.stream
+        token = max(1, opts.chars_per_token)
+        self.thread_chars[thread_id] += len(
+            json.dumps(body.get("additional_messages") or [])
+        )
+        prompt = 50 + self.thread_chars[thread_id] // token
+
+        events: List[bytes] = []
+        if opts.code_chars:
+            code = "".join(
+                _CODE_LINE.format(n=n)
+                for n in range(opts.code_chars // len(_CODE_LINE) + 1)
+            )[: opts.code_chars]
+            for piece in _pieces(code, token):
+                events.append(_sse("thread.run.step.delta", {
+                    "id": f"step_{run_id}", "object": "thread.run.step.delta",
+                    "delta": {"step_details": {
+                        "type": "tool_calls",
+                        "tool_calls": [{
+                            "index": 0, "type": "code_interpreter",
+                            "id": f"call_{run_id}",
+                            "code_interpreter": {"input": piece},
+                        }],
+                    }},
+                }))
+        text = (_FILLER * (opts.text_chars // len(_FILLER) + 1))[: opts.text_chars]
+        message_id = f"msg_{uuid.uuid4().hex[:12]}"
+        for piece in _pieces(text, token):
+            events.append(_sse("thread.message.delta", {
+                "id": message_id, "object": "thread.message.delta",
+                "delta": {"role": "assistant", "content": [{
+                    "index": 0, "type": "text",
+                    "text": {"value": piece, "annotations": []},
+                }]},
+            }))
+
+        response = web.StreamResponse(headers={
+            "Content-Type": "text/event-stream", "Cache-Control": "no-cache",
+        })
+        await response.prepare(request)
+        await response.write(_sse(
+            "thread.run.created",
+            self._run(thread_id, run_id, agent_id, "queued"),
+        ))
+        await response.write(_sse(
+            "thread.run.step.created",
+            self._step(thread_id, run_id, agent_id, "in_progress"),
+        ))
+        first_token_ms = (
+            opts.first_token_ms
+            + prompt / 1000.0 * self.scenario.prompt_ms_per_1k_tokens
+        )
+        if fault == "stall":
+            first_token_ms += self.scenario.stall_ms
+        await asyncio.sleep(first_token_ms / 1000.0)
+
+        rate = opts.tokens_per_s
+        if fault == "drip":
+            rate = self.scenario.drip_tokens_per_s
+        interval = 1.0 / rate if rate > 0 else 0.0
+        cut = len(events)
+        if fault in {"truncate", "malformed", "disconnect"}:
+            cut = int(len(events) * self.rng.uniform(0.2, 0.8))
+
+        next_at = time.monotonic()
+        for event in events[:cut]:
+            await response.write(event)
+            next_at += interval
+            delay = next_at - time.monotonic()
+            await asyncio.sleep(delay if delay > 0 else 0)
+
+        if fault == "disconnect":
+            if request.transport is not None:
+                request.transport.close()
+            return response
+        if fault == "malformed":
+            await response.write(
+                b'event: thread.message.delta\ndata: {"id": "'
+                + message_id.encode() + b'", "delta": {"content": [{"ind\n\n'
+            )
+        if fault in {"truncate", "malformed"}:
+            await response.write_eof()
+            return response
+
+        chunks = len(events)
+        self.thread_chars[thread_id] += len(text) + opts.code_chars
+        usage = None
+        if opts.usage:
+            usage = {"prompt_tokens": prompt, "completion_tokens": chunks,
+                     "total_tokens": prompt + chunks}
+        await response.write(_sse(
+            "thread.run.step.completed",
+            self._step(thread_id, run_id, agent_id, "completed", usage),
+        ))
+        await response.write(_sse(
+            "thread.run.completed",
+            self._run(thread_id, run_id, agent_id, "completed"),
+        ))
+        await response.write(_sse("done", "[DONE]"))
+        await response.write_eof()
+        return response
+
+    async def cancel_run(self, request: web.Request) -> web.Response:
+        _, error = await self._begin("cancel_run")
+        if error is not None:
+            return error
+        return web.json_response(self._run(
+            request.match_info["thread_id"], request.match_info["run_id"],
+            "agent", "cancelling",
+        ))
+
+    async def delete_thread(self, request: web.Request) -> web.Response:
+        _, error = await self._begin("delete_thread")
+        if error is not None:
+            return error
+        thread_id = request.match_info["thread_id"]
+        self.thread_chars.pop(thread_id, None)
+        return web.json_response(
+            {"id": thread_id, "object": "thread.deleted", "deleted": True}
+        )
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats_dict())
+
+    def stats_dict(self) -> Dict[str, Dict[str, int]]:
+        result: Dict[str, Dict[str, int]] = {}
+        for (op, outcome), count in sorted(self.counts.items()):
+            result.setdefault(op, {})[outcome] = count
+        return result
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        base = PROJECT_PATH
+        app.router.add_get(base + "/assistants/{agent_id}", self.get_agent)
+        app.router.add_post(base + "/threads", self.create_thread)
+        app.router.add_post(
+            base + "/threads/{thread_id}/messages", self.create_message
+        )
+        app.router.add_get(base + "/threads/{thread_id}/runs", self.list_runs)
+        app.router.add_post(base + "/threads/{thread_id}/runs", self.run_stream)
+        app.router.add_post(
+            base + "/threads/{thread_id}/runs/{run_id}/cancel", self.cancel_run
+        )
+        app.router.add_delete(
+            base + "/threads/{thread_id}", self.delete_thread
+        )
+        app.router.add_get("/_faults/stats", self.stats)
+        return app
+
+
+async def start_fault_foundry(
+    scenario: FaultScenario, port: int
+) -> Tuple[web.AppRunner, FaultFoundry]:
+    """Serve the stand-in on 127.0.0.1:`port`; clean up the runner when done."""
+    foundry = FaultFoundry(scenario)
+    runner = web.AppRunner(foundry.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner, foundry
+
+
+class _StaticCredential:
+    """Async token credential returning a fixed token (never expires)."""
+
+    async def get_token(self, *scopes: str, **_: Any) -> Any:
+        from azure.core.credentials import AccessToken
+
+        return AccessToken("fault-injection", _now() + 3600)
+
+    async def close(self) -> None:
+        return None
+
+    async def __aenter__(self) -> "_StaticCredential":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        return None
+
+
+def fault_foundry_agent_factory(endpoint: str):
+    """Agent factory running the real Foundry client against `endpoint`.
+
+    The stand-in speaks plain HTTP, which the SDK's bearer-token policy
+    refuses, so the project client sends a fixed Authorization header
+    instead; everything else is the production code path.
+    """
+    from src.agents import create_chat_agent_from_foundry
+    from src.app.lifecycle import register_closeable
+
+    async def factory(**kwargs: Any) -> Tuple[Any, object | None]:
+        from azure.ai.projects.aio import AIProjectClient
+        from azure.core.pipeline.policies import HeadersPolicy
+
+        client = register_closeable(AIProjectClient(
+            endpoint=endpoint,
+            credential=_StaticCredential(),
+            authentication_policy=HeadersPolicy(
+                {"Authorization": "Bearer fault-injection"}
+            ),
+        ))
+        kwargs.update(project_endpoint=endpoint, project_client=client)
+        return await create_chat_agent_from_foundry(**kwargs)
+
+    return factory
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenario", type=Path)
+    parser.add_argument("--port", type=int, default=3987)
+    args = parser.parse_args(argv)
+
+    scenario = FaultScenario.load(args.scenario)
+    print(f"Scenario {scenario.name!r}: endpoint "
+          f"http://127.0.0.1:{args.port}{PROJECT_PATH}")
+    web.run_app(FaultFoundry(scenario).app(), host="127.0.0.1",
+                port=args.port, access_log=None, print=None)
+    return 0
+
+
+__all__ = [
+    "FAULTS",
+    "FaultFoundry",
+    "FaultScenario",
+    "Latency",
+    "OPERATIONS",
+    "PROJECT_PATH",
+    "fault_foundry_agent_factory",
+    "start_fault_foundry",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,98 @@
+"""Import-time budget check for the service entry point.
+
+Runs ``python -X importtime -c "import src.app.bootstrap"`` in fresh
+interpreters and fails (exit 1) if the best cumulative import time exceeds
+the budget, or if any module that must stay lazy (the Agent Framework,
+Azure identity / AI Projects SDKs) is imported at startup.
+
+Usage:
+    python -m perf.import_time [--budget-ms 1200] [--runs 5] [--top 15]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+TARGET_MODULE = "src.app.bootstrap"
+DEFAULT_BUDGET_MS = 1200.0
+# Must only be imported on first use (see agents.factory.AGENT_SDK_MODULES)
+LAZY_MODULES = (
+    "agent_framework",
+    "azure.identity",
+    "azure.ai.projects",
+    "azure.ai.agents",
+    "mcp",
+)
+
+
+def measure(module: str) -> Tuple[float, Dict[str, float]]:
+    """Import `module` once; return (total ms, {module: cumulative ms})."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative: Dict[str, float] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cum, name = (part.strip() for part in line.split("|", 2))
+        if cum.isdigit():
+            cumulative[name] = int(cum) / 1000.0
+    return cumulative.get(module, 0.0), cumulative
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default=TARGET_MODULE)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15,
+                        help="show the slowest N modules of the best run")
+    parser.add_argument("--json", action="store_true",
+                        help="print the result as JSON")
+    args = parser.parse_args(argv)
+
+    runs = [measure(args.module) for _ in range(max(1, args.runs))]
+    best_ms, modules = min(runs, key=lambda run: run[0])
+    eager = sorted(
+        name for name in modules
+        if any(name == lazy or name.startswith(lazy + ".")
+               for lazy in LAZY_MODULES)
+    )
+    top = sorted(modules.items(), key=lambda item: item[1], reverse=True)
+    # Top-level packages only, so parents do not hide their children
+    top = [(n, ms) for n, ms in top if "." not in n][: args.top]
+    ok = best_ms <= args.budget_ms and not eager
+
+    if args.json:
+        print(json.dumps({
+            "module": args.module,
+            "best_ms": round(best_ms, 1),
+            "runs_ms": [round(run[0], 1) for run in runs],
+            "budget_ms": args.budget_ms,
+            "eager_lazy_modules": eager,
+            "top": [{"module": n, "ms": round(ms, 1)} for n, ms in top],
+            "ok": ok,
+        }, indent=2))
+    else:
+        print(f"import {args.module}: best {best_ms:.0f} ms over "
+              f"{len(runs)} runs (budget {args.budget_ms:.0f} ms)")
+        for name, ms in top:
+            print(f"  {ms:8.1f} ms  {name}")
+        if eager:
+            print("Imported at startup but must stay lazy:")
+            for name in eager[:20]:
+                print(f"  {name}")
+    if not ok:
+        print("FAIL: import-time budget exceeded", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,623 @@
+"""End-to-end load test of ``/api/messages`` without Foundry or Teams.
+
+Starts the real service in a child process with a mock Foundry agent
+installed through ``configure_agent_factory`` and Bot Framework auth
+stubbed (no client id configured, so the SDK accepts anonymous requests
+and replies without tokens). The driver plays both ends of the channel:
+
+* a Bot Connector stub that receives the agent's replies and streaming
+  updates (``/v3/conversations/...``), and
+* simulated users that post message activities whose ``serviceUrl``
+  points at the stub.
+
+Each virtual user holds one conversation and sends turns back to back.
+The report covers turns/s, time to first streamed token, turn latency
+percentiles and the service's resident memory, and can be written as JSON
+to compare releases.
+
+Usage:
+    python -m perf.loadtest [--users 20] [--duration 30] [--channel msteams]
+                            [--tokens-per-s 50] [--text-chars 800]
+                            [--code-chars 0] [--first-token-ms 300]
+                            [--replay DIR [--replay-speed 1]]
+                            [--foundry-scenario perf/scenarios/x.json]
+                            [--output results.json]
+
+With ``--replay`` the service streams recorded turns (``STREAM_RECORD_DIR``
+recordings, see ``perf.replay``) instead of synthetic ones, at the recorded
+pace divided by ``--replay-speed`` (0 = as fast as possible).
+
+With ``--foundry-scenario`` the service runs the real Foundry client
+against ``perf.fault_foundry`` (latency, 408/429/5xx, broken streams) and
+the report breaks turns down by outcome (ok, timeout, error, ...) together
+with the faults the stand-in injected.
+
+``--tenants noisy=16,a=2,b=2`` sends each user's turns from a tenant (16
+users in ``noisy``, 2 each in ``a`` and ``b``) and breaks the report down
+by tenant; combine with ``--env TENANT_SCHEDULER=true`` to see how the
+tenant scheduler shares a tight ``TENANT_MAX_CONCURRENT_TURNS``.
+
+``--connector-429-rate`` makes the Bot Connector stand-in throttle that
+fraction of replies (with ``--connector-retry-after``); the report then
+counts the connector's requests, 429s and client connections, and the
+service's outbound pool metrics (``OUTBOUND_POOL``).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import signal
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+
+from perf.bench_server import percentile, wait_ready
+
+MOCK_OPTIONS_ENV = "LOADTEST_MOCK_AGENT"
+REPLAY_ENV = "LOADTEST_REPLAY"
+FOUNDRY_ENV = "LOADTEST_FOUNDRY"
+# Blank service connection settings: anonymous auth (overrides any .env)
+_AUTH_STUB_ENV = {
+    "CONNECTIONS__SERVICE_CONNECTION__SETTINGS__CLIENTID": "",
+    "CONNECTIONS__SERVICE_CONNECTION__SETTINGS__CLIENTSECRET": "",
+    "CONNECTIONS__SERVICE_CONNECTION__SETTINGS__TENANTID": "",
+}
+
+
+# ----------------------------------------------------------------------
+# Service side (runs in the child process)
+# ----------------------------------------------------------------------
+def serve() -> None:
+    """Run the service with the mock agent from $LOADTEST_MOCK_AGENT.
+
+    $LOADTEST_REPLAY (``{"paths": [...], "speed": 1.0}``) selects the
+    replay agent instead, and $LOADTEST_FOUNDRY (an endpoint URL) the real
+    Foundry client pointed at the fault-injecting stand-in.
+    """
+    from perf.mock_agent import MockAgentOptions, mock_agent_factory
+    from src.agents import configure_agent_factory
+    from src.app.bootstrap import main as service_main
+
+    replay = json.loads(os.environ.get(REPLAY_ENV, "null"))
+    foundry_endpoint = os.environ.get(FOUNDRY_ENV)
+    if foundry_endpoint:
+        from perf.fault_foundry import fault_foundry_agent_factory
+
+        configure_agent_factory(fault_foundry_agent_factory(foundry_endpoint))
+    elif replay:
+        from perf.replay import replay_agent_factory
+
+        configure_agent_factory(
+            replay_agent_factory(replay["paths"], replay["speed"])
+        )
+    else:
+        options = MockAgentOptions.from_dict(
+            json.loads(os.environ.get(MOCK_OPTIONS_ENV, "{}"))
+        )
+        configure_agent_factory(mock_agent_factory(options))
+    service_main()
+
+
+# ----------------------------------------------------------------------
+# Driver side
+# ----------------------------------------------------------------------
+@dataclass
+class Turn:
+    started: float
+    first_token: Optional[float] = None
+    activities: int = 0
+    reply_bytes: int = 0
+    outcome: str = "ok"
+
+
+@dataclass
+class Stats:
+    latencies_ms: List[float] = field(default_factory=list)
+    ttft_ms: List[float] = field(default_factory=list)
+    errors: int = 0
+    activities: int = 0
+    reply_bytes: int = 0
+    outcomes: Counter = field(default_factory=Counter)
+
+
+# Service replies that mark a degraded turn (see api.handlers / lifecycle)
+_DEGRADED_REPLIES = (
+    ("The request timed out", "timeout"),
+    ("An error occurred", "error"),
+    ("An unexpected error", "error"),
+    ("The service is busy", "shed"),
+    ("The service is restarting", "draining"),
+    ("We're handling a lot of requests", "over_budget"),
+)
+
+
+def _reply_outcome(activity: Dict[str, Any]) -> Optional[str]:
+    text = activity.get("text") or ""
+    for prefix, outcome in _DEGRADED_REPLIES:
+        if text.startswith(prefix):
+            return outcome
+    return None
+
+
+def _is_token_activity(activity: Dict[str, Any]) -> bool:
+    """True for streamed text or a final message (not informative updates)."""
+    stream_types = {
+        entity.get("streamType")
+        for entity in activity.get("entities") or []
+        if isinstance(entity, dict)
+    }
+    stream_types.add((activity.get("channelData") or {}).get("streamType"))
+    if "informative" in stream_types:
+        return False
+    return bool(activity.get("text") or activity.get("attachments"))
+
+
+class ConnectorStub:
+    """Minimal Bot Connector: records replies per conversation.
+
+    With ``throttle_rate`` that fraction of requests gets a 429 with
+    ``Retry-After: retry_after_s``; ``latency_ms`` delays every response.
+    """
+
+    def __init__(
+        self,
+        *,
+        throttle_rate: float = 0.0,
+        retry_after_s: float = 1.0,
+        latency_ms: float = 0.0,
+    ) -> None:
+        self.pending: Dict[str, Turn] = {}
+        self.throttle_rate = throttle_rate
+        self.retry_after_s = retry_after_s
+        self.latency_s = latency_ms / 1000.0
+        self.requests = 0
+        self.throttled = 0
+        self._connections: set = set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "connections": len(self._connections),
+        }
+
+    async def _on_activity(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if request.transport is not None:
+            self._connections.add(request.transport.get_extra_info("peername"))
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        if self.throttle_rate and random.random() < self.throttle_rate:
+            self.throttled += 1
+            return web.json_response(
+                {"error": {"code": "Throttled"}},
+                status=429,
+                headers={"Retry-After": f"{self.retry_after_s:g}"},
+            )
+        body = await request.read()
+        activity = json.loads(body or b"{}")
+        turn = self.pending.get(request.match_info["conversation_id"])
+        if turn is not None:
+            turn.activities += 1
+            turn.reply_bytes += len(body)
+            outcome = _reply_outcome(activity)
+            if outcome is not None:
+                turn.outcome = outcome
+            if turn.first_token is None and _is_token_activity(activity):
+                turn.first_token = time.perf_counter()
+        return web.json_response({"id": uuid.uuid4().hex})
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=16 * 1024**2)
+        base = "/v3/conversations/{conversation_id}/activities"
+        app.router.add_post(base, self._on_activity)
+        app.router.add_post(base + "/{activity_id}", self._on_activity)
+        app.router.add_put(base + "/{activity_id}", self._on_activity)
+        return app
+
+
+def _message(conversation_id: str, user: int, text: str,
+             channel: str, service_url: str,
+             activity_type: str = "message",
+             tenant: Optional[str] = None) -> Dict[str, Any]:
+    activity = {
+        "type": activity_type,
+        "id": uuid.uuid4().hex,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "channelId": channel,
+        "serviceUrl": service_url,
+        "from": {"id": f"user-{user}", "name": f"Load User {user}"},
+        "recipient": {"id": "bot", "name": "bot"},
+        "conversation": {"id": conversation_id},
+        "text": text,
+        "locale": "en-US",
+    }
+    if tenant:
+        activity["conversation"]["tenantId"] = tenant
+        activity["channelData"] = {"tenant": {"id": tenant}}
+    return activity
+
+
+def _parse_tenants(spec: str) -> List[str]:
+    """``"noisy=16,a=2"`` -> the tenant of each user (16 noisy, 2 a)."""
+    tenants: List[str] = []
+    for item in spec.split(","):
+        name, _, users = item.partition("=")
+        tenants.extend([name.strip()] * int(users or 1))
+    return tenants
+
+
+def _summarize(stats: Stats, elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(stats.latencies_ms)
+    ttft = sorted(stats.ttft_ms)
+    turns = len(latencies)
+
+    def pct(values: List[float], p: float) -> float:
+        return round(percentile(values, p), 1)
+
+    return {
+        "turns": turns,
+        "errors": stats.errors,
+        "elapsed_s": round(elapsed, 2),
+        "turns_per_s": round(turns / elapsed, 2) if elapsed else 0.0,
+        "ttft_ms": {"p50": pct(ttft, 50), "p95": pct(ttft, 95),
+                    "p99": pct(ttft, 99)},
+        "latency_ms": {"p50": pct(latencies, 50), "p95": pct(latencies, 95),
+                       "p99": pct(latencies, 99)},
+        "activities_per_turn": (
+            round(stats.activities / turns, 1) if turns else 0.0
+        ),
+        "reply_kb_per_turn": (
+            round(stats.reply_bytes / turns / 1024, 1) if turns else 0.0
+        ),
+        "outcomes": dict(stats.outcomes),
+    }
+
+
+async def run_users(args: argparse.Namespace, service_url: str,
+                    stub: ConnectorStub) -> Dict[str, Any]:
+    stats = Stats()
+    tenants = _parse_tenants(args.tenants) if args.tenants else []
+    by_tenant: Dict[str, Stats] = {t: Stats() for t in tenants}
+    users = len(tenants) or args.users
+    url = f"http://127.0.0.1:{args.port}/api/messages"
+    stop_at = time.perf_counter() + args.duration
+    timeout = aiohttp.ClientTimeout(total=args.turn_timeout)
+    connector = aiohttp.TCPConnector(limit=users)
+
+    async with aiohttp.ClientSession(connector=connector,
+                                     timeout=timeout) as session:
+        async def user(n: int) -> None:
+            tenant = tenants[n] if tenants else None
+            conversation_id = f"loadtest-{uuid.uuid4().hex[:8]}-{n}"
+            turn_no = 0
+            while time.perf_counter() < stop_at:
+                if turn_no == args.turns_per_conversation:
+                    conversation_id = f"loadtest-{uuid.uuid4().hex[:8]}-{n}"
+                    turn_no = 0
+                turn_no += 1
+                if args.typing_ms:
+                    typing_activity = _message(conversation_id, n, "",
+                                               args.channel, service_url,
+                                               "typing", tenant)
+                    try:
+                        async with session.post(
+                            url, json=typing_activity
+                        ) as resp:
+                            await resp.read()
+                    except (aiohttp.ClientError, asyncio.TimeoutError):
+                        pass
+                    await asyncio.sleep(args.typing_ms / 1000.0)
+                payload = _message(conversation_id, n,
+                                   f"{args.prompt} (turn {turn_no})",
+                                   args.channel, service_url,
+                                   tenant=tenant)
+                turn = Turn(started=time.perf_counter())
+                stub.pending[conversation_id] = turn
+                try:
+                    async with session.post(url, json=payload) as resp:
+                        await resp.read()
+                        ok = resp.status < 400
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    ok = False
+                finished = time.perf_counter()
+                stub.pending.pop(conversation_id, None)
+                targets = [stats]
+                if tenant is not None:
+                    targets.append(by_tenant[tenant])
+                if not ok or turn.first_token is None:
+                    for target in targets:
+                        target.errors += 1
+                        target.outcomes["no_reply"] += 1
+                    continue
+                for target in targets:
+                    target.outcomes[turn.outcome] += 1
+                if turn.outcome != "ok":
+                    continue
+                for target in targets:
+                    target.latencies_ms.append(
+                        (finished - turn.started) * 1000
+                    )
+                    target.ttft_ms.append(
+                        (turn.first_token - turn.started) * 1000
+                    )
+                    target.activities += turn.activities
+                    target.reply_bytes += turn.reply_bytes
+                if args.think_ms:
+                    await asyncio.sleep(args.think_ms / 1000.0)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user(n) for n in range(users)))
+        elapsed = time.perf_counter() - started
+
+    results = _summarize(stats, elapsed)
+    if by_tenant:
+        results["tenants"] = {
+            tenant: {"users": tenants.count(tenant),
+                     **_summarize(tenant_stats, elapsed)}
+            for tenant, tenant_stats in by_tenant.items()
+        }
+    return results
+
+
+def _process_tree(pid: int) -> List[int]:
+    """`pid` and its descendants (Linux /proc)."""
+    pids, queue = [], [pid]
+    while queue:
+        current = queue.pop()
+        pids.append(current)
+        try:
+            children = Path(
+                f"/proc/{current}/task/{current}/children"
+            ).read_text().split()
+        except OSError:
+            continue
+        queue.extend(int(child) for child in children)
+    return pids
+
+
+def _rss_kb(pid: int) -> Dict[str, int]:
+    """Sum VmRSS / VmHWM (peak) over the process tree, in KiB."""
+    totals = {"VmRSS": 0, "VmHWM": 0}
+    for member in _process_tree(pid):
+        try:
+            lines = Path(f"/proc/{member}/status").read_text().splitlines()
+        except OSError:
+            continue
+        for line in lines:
+            key, _, value = line.partition(":")
+            if key in totals:
+                totals[key] += int(value.split()[0])
+    return totals
+
+
+async def _scrape_metrics(url: str) -> Optional[Dict[str, Any]]:
+    """The service's ``/metrics`` (one worker's) after the run."""
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url) as resp:
+                return await resp.json()
+    except (aiohttp.ClientError, ValueError):
+        return None
+
+
+async def drive(args: argparse.Namespace, server_pid: int) -> Dict[str, Any]:
+    stub = ConnectorStub(
+        throttle_rate=args.connector_429_rate,
+        retry_after_s=args.connector_retry_after,
+        latency_ms=args.connector_latency_ms,
+    )
+    runner = web.AppRunner(stub.app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", args.connector_port)
+    await site.start()
+    service_url = f"http://127.0.0.1:{args.connector_port}/"
+
+    foundry_runner = foundry = None
+    if args.foundry_scenario:
+        from perf.fault_foundry import FaultScenario, start_fault_foundry
+
+        foundry_runner, foundry = await start_fault_foundry(
+            FaultScenario.load(args.foundry_scenario), args.foundry_port
+        )
+
+    samples: List[int] = []
+
+    async def sample_memory() -> None:
+        while True:
+            samples.append(_rss_kb(server_pid)["VmRSS"])
+            await asyncio.sleep(0.5)
+
+    try:
+        await wait_ready(f"http://127.0.0.1:{args.port}/healthz")
+        idle = _rss_kb(server_pid)
+        sampler = asyncio.ensure_future(sample_memory())
+        try:
+            results = await run_users(args, service_url, stub)
+        finally:
+            sampler.cancel()
+        results["server_metrics"] = await _scrape_metrics(
+            f"http://127.0.0.1:{args.port}/metrics"
+        )
+        results["connector"] = stub.stats()
+        final = _rss_kb(server_pid)
+    finally:
+        await runner.cleanup()
+        if foundry_runner is not None:
+            await foundry_runner.cleanup()
+
+    if foundry is not None:
+        results["foundry"] = {
+            "scenario": foundry.scenario.name,
+            "calls": foundry.stats_dict(),
+        }
+    results["memory_mb"] = {
+        "idle_rss": round(idle["VmRSS"] / 1024, 1),
+        "max_rss_sampled": round(max(samples or [0]) / 1024, 1),
+        "final_rss": round(final["VmRSS"] / 1024, 1),
+        "peak_hwm": round(final["VmHWM"] / 1024, 1),
+    }
+    return results
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--users", type=int, default=20,
+                        help="concurrent conversations")
+    parser.add_argument("--tenants", metavar="NAME=USERS,...",
+                        help="spread users over tenants, e.g. noisy=16,a=2 "
+                             "(overrides --users)")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--think-ms", type=float, default=0.0,
+                        help="pause between a user's turns")
+    parser.add_argument("--turn-timeout", type=float, default=120.0)
+    parser.add_argument("--typing-ms", type=float, default=0.0,
+                        help="send a typing activity this long before "
+                             "each message (0 = none)")
+    parser.add_argument("--turns-per-conversation", type=int, default=0,
+                        help="start a new conversation after N turns "
+                             "(0 = one conversation per user)")
+    parser.add_argument("--channel", default="msteams",
+                        help="channelId to send (msteams, directline, test)")
+    parser.add_argument("--prompt", default="Summarize the quarterly report")
+    parser.add_argument("--port", type=int, default=3989)
+    parser.add_argument("--connector-port", type=int, default=3988)
+    parser.add_argument("--connector-429-rate", type=float, default=0.0,
+                        help="fraction of connector requests answered 429")
+    parser.add_argument("--connector-retry-after", type=float, default=1.0,
+                        help="Retry-After seconds sent with those 429s")
+    parser.add_argument("--connector-latency-ms", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--tokens-per-s", type=float, default=50.0)
+    parser.add_argument("--text-chars", type=int, default=800)
+    parser.add_argument("--code-chars", type=int, default=0)
+    parser.add_argument("--no-usage", action="store_true")
+    parser.add_argument("--replay", action="append", default=[],
+                        metavar="PATH",
+                        help="replay recorded streams (file or directory)")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                        help="replay pace multiplier (0 = max speed)")
+    parser.add_argument("--foundry-scenario", type=Path,
+                        help="run against the fault-injecting Foundry "
+                             "stand-in with this scenario file")
+    parser.add_argument("--foundry-port", type=int, default=3987)
+    parser.add_argument("--env", action="append", default=[],
+                        metavar="KEY=VALUE",
+                        help="extra environment for the service")
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve()
+        return 0
+
+    mock = {
+        "first_token_ms": args.first_token_ms,
+        "tokens_per_s": args.tokens_per_s,
+        "text_chars": args.text_chars,
+        "code_chars": args.code_chars,
+        "usage": not args.no_usage,
+    }
+    replay = None
+    if args.replay:
+        from perf.replay import find_recordings
+
+        paths = [str(p.resolve()) for p in find_recordings(args.replay)]
+        if not paths:
+            parser.error("--replay: no recordings found")
+        replay = {"paths": paths, "speed": args.replay_speed}
+    if args.foundry_scenario and replay:
+        parser.error("--foundry-scenario and --replay are exclusive")
+    project_endpoint = "http://127.0.0.1:9/mock-project"
+    if args.foundry_scenario:
+        from perf.fault_foundry import PROJECT_PATH
+
+        project_endpoint = (
+            f"http://127.0.0.1:{args.foundry_port}{PROJECT_PATH}"
+        )
+    env = dict(os.environ)
+    env.update(_AUTH_STUB_ENV)
+    env.update({
+        MOCK_OPTIONS_ENV: json.dumps(mock),
+        REPLAY_ENV: json.dumps(replay),
+        FOUNDRY_ENV: project_endpoint if args.foundry_scenario else "",
+        "PORT": str(args.port),
+        "WEB_WORKERS": str(args.workers),
+        "AZURE_AI_PROJECT_ENDPOINT": project_endpoint,
+        "AZURE_AI_FOUNDRY_AGENT_ID": "mock-agent",
+        "ENABLE_INLINE_IMAGES": "false",
+        "SERVER_ACCESS_LOG": "false",
+        "METRICS_ENDPOINT": "true",
+        "LOG_LEVEL": env.get("LOG_LEVEL", "WARNING"),
+    })
+    if args.workers > 1:
+        env.setdefault("CONVERSATION_STATE_BACKEND", "sqlite")
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "perf.loadtest", "--serve"], env=env
+    )
+    try:
+        results = asyncio.run(drive(args, proc.pid))
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "config": {
+            "users": args.users,
+            "tenants": args.tenants,
+            "duration_s": args.duration,
+            "think_ms": args.think_ms,
+            "channel": args.channel,
+            "workers": args.workers,
+            "mock_agent": None if replay or args.foundry_scenario else mock,
+            "replay": replay,
+            "foundry_scenario": (
+                str(args.foundry_scenario) if args.foundry_scenario else None
+            ),
+            "env": args.env,
+        },
+        "results": results,
+    }
+    print(json.dumps(report["results"], indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    return 0 if results["turns"] and not results["errors"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,167 @@
+"""Local stand-in for an Azure AI Foundry agent.
+
+`MockFoundryAgent` mimics the parts of ``ChatAgent`` the handlers use
+(``get_new_thread`` and ``run_stream``) and streams real agent framework
+update objects: text tokens at a configurable rate, optional
+code-interpreter input deltas and a final usage chunk. Install it with
+``configure_agent_factory(mock_agent_factory(options))``.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from agent_framework import (AgentRunResponseUpdate, ChatResponseUpdate,
+                             TextContent, UsageContent, UsageDetails)
+from azure.ai.agents.models import (
+    RunStepDeltaCodeInterpreterDetailItemObject,
+    RunStepDeltaCodeInterpreterLogOutput)
+
+_FILLER = (
+    "The quarterly numbers show steady growth across all regions, with the "
+    "strongest gains in cloud services and a modest decline in hardware. "
+)
+_CODE_LINE = "df['total'] = df['price'] * df['quantity']  # row {n}\n"
+
+
+@dataclass
+class MockAgentOptions:
+    """Shape and pace of a mock agent response."""
+
+    first_token_ms: float = 300.0
+    tokens_per_s: float = 50.0  # 0 streams as fast as possible
+    chars_per_token: int = 4
+    text_chars: int = 800
+    code_chars: int = 0
+    usage: bool = True
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MockAgentOptions":
+        known = {k: v for k, v in data.items() if k in cls.__dataclass_fields__}
+        return cls(**known)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def make_update(
+    run_id: str, contents: list, raw: Any = None
+) -> AgentRunResponseUpdate:
+    """Wrap contents like ``ChatAgent.run_stream`` does (raw delta nested)."""
+    chat_update = ChatResponseUpdate(
+        contents=contents, response_id=run_id, raw_representation=raw
+    )
+    return AgentRunResponseUpdate(
+        contents=contents, response_id=run_id, raw_representation=chat_update
+    )
+
+
+def code_delta(fragment: str) -> RunStepDeltaCodeInterpreterDetailItemObject:
+    return RunStepDeltaCodeInterpreterDetailItemObject(input=fragment)
+
+
+def code_outputs(logs: str) -> RunStepDeltaCodeInterpreterDetailItemObject:
+    return RunStepDeltaCodeInterpreterDetailItemObject(
+        outputs=[RunStepDeltaCodeInterpreterLogOutput(index=0, logs=logs)]
+    )
+
+
+def _repeat_to(text: str, size: int) -> str:
+    return (text * (size // max(1, len(text)) + 1))[:size]
+
+
+def _pieces(text: str, size: int) -> List[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class MockThread:
+    """Minimal ``AgentThread`` stand-in."""
+
+    def __init__(self, service_thread_id: Optional[str] = None) -> None:
+        self.service_thread_id = service_thread_id
+        self.id = service_thread_id or f"mock_thread_{uuid.uuid4().hex[:12]}"
+
+
+class MockFoundryAgent:
+    """Streams a synthetic response shaped by `MockAgentOptions`."""
+
+    def __init__(self, options: MockAgentOptions) -> None:
+        self.options = options
+
+    def get_new_thread(self, service_thread_id: Optional[str] = None) -> MockThread:
+        return MockThread(service_thread_id)
+
+    async def run_stream(
+        self, messages: Any, *, thread: MockThread, **_: Any
+    ) -> AsyncIterator[AgentRunResponseUpdate]:
+        opts = self.options
+        run_id = f"run_{uuid.uuid4().hex[:12]}"
+        if thread.service_thread_id is None:
+            thread.service_thread_id = thread.id
+        await asyncio.sleep(opts.first_token_ms / 1000.0)
+
+        token = max(1, opts.chars_per_token)
+        interval = 1.0 / opts.tokens_per_s if opts.tokens_per_s > 0 else 0.0
+        next_at = time.monotonic()
+
+        async def pace() -> None:
+            nonlocal next_at
+            if interval:
+                next_at += interval
+                delay = next_at - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                await asyncio.sleep(0)
+
+        chunks = 0
+        if opts.code_chars:
+            code = "".join(
+                _CODE_LINE.format(n=n)
+                for n in range(opts.code_chars // len(_CODE_LINE) + 1)
+            )[: opts.code_chars]
+            for piece in _pieces(code, token):
+                yield make_update(run_id, [], code_delta(piece))
+                chunks += 1
+                await pace()
+            yield make_update(
+                run_id, [TextContent(text="")], code_outputs("ok\n")
+            )
+
+        text = _repeat_to(_FILLER, opts.text_chars)
+        for piece in _pieces(text, token):
+            yield make_update(run_id, [TextContent(text=piece)])
+            chunks += 1
+            await pace()
+
+        if opts.usage:
+            prompt = len(str(messages)) // token + 50
+            completion = chunks
+            yield make_update(run_id, [UsageContent(UsageDetails(
+                input_token_count=prompt,
+                output_token_count=completion,
+                total_token_count=prompt + completion,
+            ))])
+
+
+def mock_agent_factory(options: MockAgentOptions):
+    """Return an agent factory (see ``configure_agent_factory``)."""
+
+    async def factory(**_: Any) -> Tuple[MockFoundryAgent, None]:
+        return MockFoundryAgent(options), None
+
+    return factory
+
+
+__all__ = [
+    "MockAgentOptions",
+    "MockFoundryAgent",
+    "MockThread",
+    "code_delta",
+    "code_outputs",
+    "make_update",
+    "mock_agent_factory",
+]
@@ -0,0 +1,220 @@
+"""Replay recorded agent streams (see ``src.api.recording``).
+
+`ReplayAgent` mimics the parts of ``ChatAgent`` the handlers use, like
+``perf.mock_agent.MockFoundryAgent``, but yields the updates of recorded
+turns with their original inter-arrival times divided by ``speed``
+(``0`` replays as fast as possible). Each call to ``run_stream`` plays the
+next recording, cycling through the set. Install it with
+``configure_agent_factory(replay_agent_factory(paths, speed))``, or use
+``python -m perf.loadtest --replay DIR`` to drive the full handler
+pipeline over HTTP.
+
+Run as a script to summarise recordings:
+
+    python -m perf.replay RECORDING_OR_DIR [...]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import itertools
+import json
+import statistics
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, List, Tuple
+
+from agent_framework import (AgentRunResponseUpdate, HostedFileContent,
+                             TextContent, UsageContent, UsageDetails)
+from azure.ai.agents.models import (
+    RunStepDeltaCodeInterpreterDetailItemObject,
+    RunStepDeltaCodeInterpreterLogOutput)
+
+from perf.mock_agent import MockThread, make_update
+from src.api.recording import RECORDING_SUFFIX
+
+
+@dataclass
+class Recording:
+    path: Path
+    header: Dict[str, Any]
+    events: List[Dict[str, Any]]
+
+    @property
+    def duration_ms(self) -> float:
+        return sum(event.get("dt_ms", 0.0) for event in self.events)
+
+
+def load_recording(path: Path) -> Recording:
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as fh:
+        lines = [json.loads(line) for line in fh if line.strip()]
+    if not lines or lines[0].get("kind") != "header":
+        raise ValueError(f"{path}: not a stream recording")
+    return Recording(path, lines[0], lines[1:])
+
+
+def find_recordings(paths: Iterable[str]) -> List[Path]:
+    """Expand directories to the recordings they contain."""
+    found: List[Path] = []
+    for raw in paths:
+        path = Path(raw)
+        if path.is_dir():
+            found.extend(sorted(path.glob(f"*{RECORDING_SUFFIX}")))
+        else:
+            found.append(path)
+    return found
+
+
+def _code_interpreter(data: Dict[str, Any]) -> Any:
+    outputs = [
+        RunStepDeltaCodeInterpreterLogOutput(index=n, logs=logs)
+        for n, logs in enumerate(data.get("logs") or [])
+    ]
+    return RunStepDeltaCodeInterpreterDetailItemObject(
+        input=data.get("input"), outputs=outputs or None
+    )
+
+
+def event_update(run_id: str, event: Dict[str, Any]) -> AgentRunResponseUpdate:
+    """Rebuild the update object for one recorded chunk."""
+    contents: List[Any] = []
+    for content in event.get("contents", []):
+        kind = content["type"]
+        if kind == "text":
+            contents.append(TextContent(text=content["text"]))
+        elif kind == "usage":
+            contents.append(UsageContent(UsageDetails(
+                input_token_count=content["input"],
+                output_token_count=content["output"],
+                total_token_count=content["total"],
+            )))
+        elif kind == "file" and content.get("file_id"):
+            contents.append(HostedFileContent(file_id=content["file_id"]))
+    raw = None
+    if "code_interpreter" in event:
+        raw = _code_interpreter(event["code_interpreter"])
+    return make_update(run_id, contents, raw)
+
+
+def recording_updates(
+    recording: Recording, run_id: str | None = None
+) -> List[Tuple[float, AgentRunResponseUpdate]]:
+    """(delay seconds, update) pairs for `recording`."""
+    run_id = run_id or recording.header.get("run_id") or "run_replay"
+    return [
+        (event.get("dt_ms", 0.0) / 1000.0, event_update(run_id, event))
+        for event in recording.events
+        if event.get("kind") == "chunk"
+    ]
+
+
+class ReplayAgent:
+    """Streams recorded turns in rotation."""
+
+    def __init__(self, recordings: List[Recording], speed: float = 1.0) -> None:
+        if not recordings:
+            raise ValueError("no recordings to replay")
+        self.speed = speed
+        self._recordings = itertools.cycle(recordings)
+
+    def get_new_thread(self, service_thread_id: str | None = None) -> MockThread:
+        return MockThread(service_thread_id)
+
+    async def run_stream(
+        self, messages: Any, *, thread: MockThread, **_: Any
+    ) -> AsyncIterator[AgentRunResponseUpdate]:
+        recording = next(self._recordings)
+        if thread.service_thread_id is None:
+            thread.service_thread_id = thread.id
+        # Fresh run id per replay so code blocks never merge across turns
+        updates = recording_updates(
+            recording, f"run_replay_{uuid.uuid4().hex[:12]}"
+        )
+        due = time.monotonic()
+        for delay, update in updates:
+            if self.speed > 0:
+                due += delay / self.speed
+                wait = due - time.monotonic()
+                await asyncio.sleep(wait if wait > 0 else 0)
+            else:
+                await asyncio.sleep(0)
+            yield update
+
+
+def replay_agent_factory(paths: Iterable[str], speed: float = 1.0):
+    """Return an agent factory (see ``configure_agent_factory``)."""
+    recordings = [load_recording(path) for path in find_recordings(paths)]
+    # One agent shared by all turns so the rotation spans conversations
+    agent = ReplayAgent(recordings, speed)
+
+    async def factory(**_: Any) -> Tuple[ReplayAgent, None]:
+        return agent, None
+
+    return factory
+
+
+def summarize(recording: Recording) -> Dict[str, Any]:
+    gaps = [e.get("dt_ms", 0.0) for e in recording.events]
+    kinds: Dict[str, int] = {}
+    chars = 0
+    for event in recording.events:
+        for content in event.get("contents", []):
+            kinds[content["type"]] = kinds.get(content["type"], 0) + 1
+            chars += len(content.get("text") or "")
+        if "code_interpreter" in event:
+            kinds["code_interpreter"] = kinds.get("code_interpreter", 0) + 1
+            chars += len(event["code_interpreter"].get("input") or "")
+    return {
+        "file": recording.path.name,
+        "status": recording.header.get("status"),
+        "channel": recording.header.get("channel"),
+        "chunks": len(recording.events),
+        "duration_ms": round(recording.duration_ms, 1),
+        "first_chunk_ms": gaps[0] if gaps else None,
+        "median_gap_ms": (
+            round(statistics.median(gaps[1:]), 2) if len(gaps) > 1 else None
+        ),
+        "chars": chars,
+        "kinds": kinds,
+    }
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+",
+                        help="recording files or directories")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    summaries = [summarize(load_recording(p))
+                 for p in find_recordings(args.paths)]
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+        return 0
+    for s in summaries:
+        kinds = ", ".join(f"{k}={v}" for k, v in sorted(s["kinds"].items()))
+        print(f"{s['file']}: {s['chunks']} chunks over "
+              f"{s['duration_ms']:.0f} ms (first {s['first_chunk_ms']} ms, "
+              f"median gap {s['median_gap_ms']} ms), {s['chars']} chars "
+              f"[{kinds}] {s['status']}")
+    return 0 if summaries else 1
+
+
+__all__ = [
+    "Recording",
+    "ReplayAgent",
+    "event_update",
+    "find_recordings",
+    "load_recording",
+    "recording_updates",
+    "replay_agent_factory",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,154 @@
+"""Latency and token percentiles from run records (``src.api.run_records``).
+
+Reads JSONL files (rotated ``.1``, ``.2`` … files included when a
+directory or glob is given) or a SQLite database written with
+``RUN_RECORD_BACKEND=sqlite``:
+
+    python -m perf.run_stats run_records.jsonl [--since 2025-01-01T00:00]
+    python -m perf.run_stats runs.db --by channel --json
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import sqlite3
+import sys
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from perf.bench_server import percentile
+
+METRICS = (
+    "response_time_ms", "first_token_ms", "prompt_tokens",
+    "completion_tokens", "total_tokens", "chunks",
+)
+PERCENTILES = (50, 90, 95, 99)
+
+
+def _is_sqlite(path: Path) -> bool:
+    with open(path, "rb") as fh:
+        return fh.read(16) == b"SQLite format 3\x00"
+
+
+def _read_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _read_sqlite(path: Path) -> Iterator[Dict[str, Any]]:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        for row in conn.execute("SELECT * FROM run_records"):
+            yield dict(row)
+    finally:
+        conn.close()
+
+
+def _expand(paths: Iterable[str]) -> List[Path]:
+    found: List[Path] = []
+    for raw in paths:
+        path = Path(raw)
+        if path.is_dir():
+            found.extend(sorted(p for p in path.iterdir() if p.is_file()))
+        elif path.exists():
+            found.append(path)
+        else:
+            found.extend(Path(p) for p in sorted(glob.glob(raw)))
+    return found
+
+
+def load_records(
+    paths: Iterable[str], since: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    records: List[Dict[str, Any]] = []
+    for path in _expand(paths):
+        reader = _read_sqlite if _is_sqlite(path) else _read_jsonl
+        records.extend(
+            r for r in reader(path) if since is None or r.get("ts", "") >= since
+        )
+    return records
+
+
+def summarize(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Outcome counts, and percentiles over successful turns."""
+    ok = [r for r in records if r.get("status") == "ok"]
+    summary: Dict[str, Any] = {
+        "turns": len(records),
+        "status": dict(Counter(r.get("status") for r in records)),
+    }
+    for metric in METRICS:
+        values = sorted(
+            float(r[metric]) for r in ok if r.get(metric) is not None
+        )
+        if not values:
+            continue
+        summary[metric] = {
+            "n": len(values),
+            **{f"p{p}": round(percentile(values, p), 1) for p in PERCENTILES},
+            "max": round(values[-1], 1),
+            "mean": round(sum(values) / len(values), 1),
+        }
+    tokens = [r["total_tokens"] for r in ok if r.get("total_tokens")]
+    summary["tokens_total"] = sum(tokens)
+    return summary
+
+
+def _print(name: str, summary: Dict[str, Any]) -> None:
+    status = ", ".join(f"{k}={v}" for k, v in sorted(
+        summary["status"].items(), key=lambda kv: str(kv[0])
+    ))
+    print(f"{name}: {summary['turns']} turns ({status}), "
+          f"{summary['tokens_total']} tokens")
+    if not any(metric in summary for metric in METRICS):
+        return
+    header = "  {:<18}{:>7}".format("metric", "n") + "".join(
+        f"{'p' + str(p):>10}" for p in PERCENTILES
+    ) + f"{'max':>10}{'mean':>10}"
+    print(header)
+    for metric in METRICS:
+        stats = summary.get(metric)
+        if stats is None:
+            continue
+        print(f"  {metric:<18}{stats['n']:>7}" + "".join(
+            f"{stats['p' + str(p)]:>10}" for p in PERCENTILES
+        ) + f"{stats['max']:>10}{stats['mean']:>10}")
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+",
+                        help="JSONL files, SQLite databases, dirs or globs")
+    parser.add_argument("--since", help="ISO timestamp (UTC) lower bound")
+    parser.add_argument("--by", help="group by a record field, e.g. channel")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    records = load_records(args.paths, args.since)
+    if not records:
+        print("no run records found", file=sys.stderr)
+        return 1
+    groups: Dict[str, List[Dict[str, Any]]] = {"all": records}
+    if args.by:
+        by: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for record in records:
+            by[str(record.get(args.by))].append(record)
+        groups.update(sorted(by.items()))
+    summaries = {name: summarize(group) for name, group in groups.items()}
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+        return 0
+    for name, summary in summaries.items():
+        _print(name, summary)
+    return 0
+
+
+__all__ = ["load_records", "summarize"]
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -2,20 +2,48 @@
 
 Contains:
   factory.py  – Create ChatAgent instances from Foundry definitions.
-  state.py    – In-memory conversation state helpers.
+  state.py    – Conversation state helpers and shared thread-id store.
+  compaction.py – Summarise long threads into fresh ones.
+  hedging.py  – Race a second run against a slow first turn.
 """
-from .factory import (SUPPORTED_PASSTHROUGH_TOOL_TYPES,
-                      create_chat_agent_from_foundry)
-from .state import (conversation_agents, conversation_last_activity,
+from .compaction import (CompactionPolicy, ThreadCompactor,
+                         configure_thread_compactor, get_thread_compactor)
+from .factory import (AGENT_SDK_MODULES, SUPPORTED_PASSTHROUGH_TOOL_TYPES,
+                      AgentFactory, configure_agent_factory,
+                      create_chat_agent_from_foundry, ensure_agent_sdk_loaded,
+                      get_agent_factory, load_agent_sdk)
+from .hedging import (HedgedStream, RunHedger, configure_run_hedger,
+                      get_run_hedger)
+from .state import (ConversationStore, configure_conversation_store,
+                    conversation_agents, conversation_last_activity,
                     conversation_threads, conversation_tool_resources,
+                    create_conversation_store, get_conversation_store,
                     reset_conversation)
 
 __all__ = [
     "create_chat_agent_from_foundry",
+    "AgentFactory",
+    "configure_agent_factory",
+    "get_agent_factory",
+    "ensure_agent_sdk_loaded",
+    "load_agent_sdk",
+    "AGENT_SDK_MODULES",
     "SUPPORTED_PASSTHROUGH_TOOL_TYPES",
     "conversation_agents",
     "conversation_threads",
     "conversation_tool_resources",
     "conversation_last_activity",
     "reset_conversation",
+    "ConversationStore",
+    "configure_conversation_store",
+    "create_conversation_store",
+    "get_conversation_store",
+    "CompactionPolicy",
+    "ThreadCompactor",
+    "configure_thread_compactor",
+    "get_thread_compactor",
+    "HedgedStream",
+    "RunHedger",
+    "configure_run_hedger",
+    "get_run_hedger",
 ]
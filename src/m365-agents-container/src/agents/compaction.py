@@ -0,0 +1,284 @@
+"""Automatic compaction of long conversation threads.
+
+Threads are reused for the whole conversation, so every turn re-sends the
+growing history and `prompt_tokens` (with latency and cost) grows with it.
+When a turn's prompt tokens or the number of turns on the current thread
+reach the configured threshold, the conversation is compacted after the
+reply has been sent: the agent summarises the old thread, the summary
+seeds a fresh Foundry thread, and the conversation is rebound to it. The
+old thread id is kept in the conversation store for auditing.
+
+Compaction runs in the background; the conversation's next turn waits for
+it (bounded by a timeout) so it never races the rebinding. Turns are
+counted in the conversation store, so with a shared store the turn
+trigger holds however turns are spread across workers.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Set
+
+from .state import conversation_threads, get_conversation_store
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = (
+    "Summarize our conversation so far for your own future reference. "
+    "Keep every fact, decision, number, file name and open question the "
+    "user may refer back to; omit pleasantries. Reply with the summary only."
+)
+SEED_PREFIX = "Summary of the earlier conversation (thread {thread_id}):\n\n"
+
+
+@dataclass
+class CompactionPolicy:
+    """When to compact: 0 disables a trigger."""
+
+    prompt_tokens: int = 0
+    turns: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.prompt_tokens > 0 or self.turns > 0
+
+    def reason(self, prompt_tokens: Optional[int], turns: int) -> Optional[str]:
+        if self.prompt_tokens and (prompt_tokens or 0) >= self.prompt_tokens:
+            return "prompt_tokens"
+        if self.turns and turns >= self.turns:
+            return "turns"
+        return None
+
+
+@dataclass
+class _Baseline:
+    """The last turn before a compaction, compared with the first after."""
+
+    prompt_tokens: Optional[int]
+    response_time_ms: float
+
+
+async def _create_seeded_thread(agent: Any, summary: str, old_thread_id: str) -> Any:
+    """Create a Foundry thread holding `summary`; None if unsupported."""
+    project_client = getattr(
+        getattr(agent, "chat_client", None), "project_client", None
+    )
+    if project_client is None:
+        return None
+    agents = project_client.agents
+    thread = await agents.threads.create()
+    await agents.messages.create(
+        thread_id=thread.id,
+        role="assistant",
+        content=SEED_PREFIX.format(thread_id=old_thread_id) + summary,
+    )
+    return agent.get_new_thread(service_thread_id=thread.id)
+
+
+class ThreadCompactor:
+    """Apply a `CompactionPolicy` and report its effect."""
+
+    def __init__(self, policy: CompactionPolicy, *, timeout_s: float = 60.0) -> None:
+        self.policy = policy
+        self.timeout_s = timeout_s
+        self.compactions = 0
+        self.failures = 0
+        self.prompt_tokens_before = 0
+        self.prompt_tokens_after = 0
+        self.latency_ms_before = 0.0
+        self.latency_ms_after = 0.0
+        self.measured = 0
+        self._baselines: Dict[str, _Baseline] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._all_tasks: Set[asyncio.Task] = set()
+
+    async def observe(
+        self, conversation_id: str, thread_id: str, run_metadata: Dict[str, Any]
+    ) -> Optional[str]:
+        """Record a finished turn; return why it should be compacted, if so."""
+        prompt_tokens = run_metadata.get("prompt_tokens")
+        baseline = self._baselines.pop(conversation_id, None)
+        if baseline is not None and prompt_tokens is not None:
+            # First turn on the compacted thread: measure the reduction
+            self.measured += 1
+            self.prompt_tokens_before += baseline.prompt_tokens or 0
+            self.prompt_tokens_after += prompt_tokens
+            self.latency_ms_before += baseline.response_time_ms
+            self.latency_ms_after += run_metadata.get("response_time_ms", 0.0)
+
+        turns = 0
+        if self.policy.turns:
+            try:
+                turns = await asyncio.to_thread(
+                    get_conversation_store().count_turn,
+                    conversation_id,
+                    thread_id or "",
+                )
+            except Exception as exc:  # noqa: BLE001
+                logger.warning(
+                    "Failed to count turn - Conversation ID: %s, Error: %s",
+                    conversation_id,
+                    exc,
+                )
+        if conversation_id in self._tasks:
+            return None
+        return self.policy.reason(prompt_tokens, turns)
+
+    def schedule(
+        self,
+        agent: Any,
+        conversation_id: str,
+        thread: Any,
+        run_metadata: Dict[str, Any],
+        reason: str,
+    ) -> None:
+        """Compact `thread` in the background."""
+        self._baselines[conversation_id] = _Baseline(
+            run_metadata.get("prompt_tokens"),
+            run_metadata.get("response_time_ms", 0.0),
+        )
+        task = asyncio.ensure_future(
+            self._compact(agent, conversation_id, thread, reason)
+        )
+        self._tasks[conversation_id] = task
+        self._all_tasks.add(task)
+
+        def _done(done: asyncio.Task) -> None:
+            self._all_tasks.discard(done)
+            if self._tasks.get(conversation_id) is done:
+                del self._tasks[conversation_id]
+
+        task.add_done_callback(_done)
+
+    async def wait(self, conversation_id: str) -> None:
+        """Wait for a pending compaction of `conversation_id` to finish."""
+        task = self._tasks.get(conversation_id)
+        if task is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(task), self.timeout_s)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Thread compaction still running after %.0f s; cancelling - "
+                "Conversation ID: %s",
+                self.timeout_s,
+                conversation_id,
+            )
+            task.cancel()
+
+    async def _compact(
+        self, agent: Any, conversation_id: str, thread: Any, reason: str
+    ) -> None:
+        old_thread_id = getattr(thread, "service_thread_id", None)
+        if not old_thread_id:
+            return
+        try:
+            response = await agent.run(SUMMARY_PROMPT, thread=thread)
+            summary = (getattr(response, "text", "") or "").strip()
+            if not summary:
+                raise ValueError("empty summary")
+            new_thread = await _create_seeded_thread(
+                agent, summary, old_thread_id
+            )
+            if new_thread is None:
+                logger.debug("Agent does not support thread compaction")
+                self._baselines.pop(conversation_id, None)
+                return
+            new_thread_id = new_thread.service_thread_id
+            # The rebind goes through the store so every worker follows it
+            # (they check their cached thread against the store each turn);
+            # it is dropped if the conversation moved on meanwhile
+            rebound = await asyncio.to_thread(
+                get_conversation_store().replace_thread_id,
+                conversation_id,
+                old_thread_id,
+                new_thread_id,
+            )
+            if not rebound:
+                self._baselines.pop(conversation_id, None)
+                logger.info(
+                    "Thread compaction superseded (conversation reset or "
+                    "rebound elsewhere) - Conversation ID: %s, Old thread: %s",
+                    conversation_id,
+                    old_thread_id,
+                )
+                return
+            cached = conversation_threads.get(conversation_id)
+            if getattr(cached, "service_thread_id", None) == old_thread_id:
+                conversation_threads[conversation_id] = new_thread
+            self.compactions += 1
+            logger.info(
+                "Thread compacted (%s) - Conversation ID: %s, Old thread: %s, "
+                "New thread: %s, Summary: %d chars",
+                reason,
+                conversation_id,
+                old_thread_id,
+                new_thread_id,
+                len(summary),
+            )
+        except asyncio.CancelledError:
+            self.failures += 1
+            self._baselines.pop(conversation_id, None)
+            raise
+        except Exception as exc:  # noqa: BLE001
+            self.failures += 1
+            self._baselines.pop(conversation_id, None)
+            logger.warning(
+                "Thread compaction failed - Conversation ID: %s, Error: %s",
+                conversation_id,
+                exc,
+            )
+
+    async def close(self) -> None:
+        """Cancel compactions still running (at shutdown)."""
+        tasks = list(self._all_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        measured = self.measured
+
+        def _avg(total: float) -> Optional[float]:
+            return round(total / measured, 1) if measured else None
+
+        before = self.prompt_tokens_before
+        return {
+            "compactions": self.compactions,
+            "failures": self.failures,
+            "in_flight": len(self._tasks),
+            "measured": measured,
+            "prompt_tokens_before_avg": _avg(before),
+            "prompt_tokens_after_avg": _avg(self.prompt_tokens_after),
+            "prompt_token_reduction": (
+                round(1 - self.prompt_tokens_after / before, 3)
+                if before else None
+            ),
+            "response_time_ms_before_avg": _avg(self.latency_ms_before),
+            "response_time_ms_after_avg": _avg(self.latency_ms_after),
+        }
+
+
+_compactor: Optional[ThreadCompactor] = None
+
+
+def get_thread_compactor() -> Optional[ThreadCompactor]:
+    return _compactor
+
+
+def configure_thread_compactor(compactor: Optional[ThreadCompactor]) -> None:
+    """Install `compactor` (None, or a disabled policy, turns it off)."""
+    global _compactor
+    if compactor is not None and not compactor.policy.enabled:
+        compactor = None
+    _compactor = compactor
+
+
+__all__ = [
+    "CompactionPolicy",
+    "SUMMARY_PROMPT",
+    "ThreadCompactor",
+    "configure_thread_compactor",
+    "get_thread_compactor",
+]
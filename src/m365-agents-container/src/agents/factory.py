@@ -1,18 +1,56 @@
 """Factory utilities for creating ChatAgents backed by Azure AI Foundry agents.
 
-Moved from top-level `foundry_agent_factory.py`.
+Moved from top-level `foundry_agent_factory.py`. The Agent Framework and
+Azure SDKs take over a second to import, so they are loaded on first use
+(off the event loop via `ensure_agent_sdk_loaded`) rather than at startup.
 """
 from __future__ import annotations
 
+import asyncio
+import importlib
 import logging
-from typing import Any, Tuple
+import sys
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional, Tuple
 
-from agent_framework import ChatAgent  # type: ignore
-from agent_framework.azure import AzureAIAgentClient  # type: ignore
-from azure.core.credentials_async import AsyncTokenCredential
+if TYPE_CHECKING:
+    from agent_framework import ChatAgent  # type: ignore
+    from azure.core.credentials_async import AsyncTokenCredential
 
 logger = logging.getLogger(__name__)
 
+# Heavy SDK modules needed to run a turn
+AGENT_SDK_MODULES: Tuple[str, ...] = (
+    "agent_framework",
+    "agent_framework.azure",
+    "azure.identity.aio",
+)
+
+# Async callable with the signature of `create_chat_agent_from_foundry`
+AgentFactory = Callable[..., Awaitable[Tuple[Any, object | None]]]
+
+_sdk_loading: Optional[asyncio.Task] = None
+_agent_factory: Optional[AgentFactory] = None
+
+
+def load_agent_sdk() -> None:
+    """Import the agent SDK modules in the calling thread."""
+    for name in AGENT_SDK_MODULES:
+        importlib.import_module(name)
+
+
+async def ensure_agent_sdk_loaded() -> None:
+    """Import the agent SDK in a worker thread, once per process.
+
+    Concurrent callers share the same import; the event loop keeps serving
+    other requests meanwhile.
+    """
+    global _sdk_loading
+    if all(name in sys.modules for name in AGENT_SDK_MODULES):
+        return
+    if _sdk_loading is None:
+        _sdk_loading = asyncio.ensure_future(asyncio.to_thread(load_agent_sdk))
+    await asyncio.shield(_sdk_loading)
+
 SUPPORTED_PASSTHROUGH_TOOL_TYPES: set[str] = {
     "code_interpreter",
     "file_search",
@@ -28,8 +66,9 @@ async def create_chat_agent_from_foundry(
     *,
     project_endpoint: str,
     agent_id: str,
-    async_credential: AsyncTokenCredential,
-) -> Tuple[ChatAgent, object | None]:
+    async_credential: "AsyncTokenCredential",
+    project_client: Any | None = None,
+) -> Tuple["ChatAgent", object | None]:
     """Create a `ChatAgent` mirroring an existing Azure AI Foundry agent.
 
     Per Microsoft Agent Framework documentation, pass credentials directly
@@ -39,13 +78,21 @@ async def create_chat_agent_from_foundry(
         project_endpoint: Azure AI Foundry project endpoint
         agent_id: Agent ID in Azure AI Foundry
         async_credential: Async credential for authentication
+        project_client: Existing ``AIProjectClient`` to use instead of one
+            built from the endpoint and credential (e.g. with a custom
+            transport or auth policy); the caller owns and closes it
     """
 
+    await ensure_agent_sdk_loaded()
+    from agent_framework import ChatAgent  # type: ignore
+    from agent_framework.azure import AzureAIAgentClient  # type: ignore
+
     # Create Azure AI Agent client - SDK handles token acquisition
     chat_client = AzureAIAgentClient(
         async_credential=async_credential,
         project_endpoint=project_endpoint,
         agent_id=agent_id,
+        project_client=project_client,
     )
 
     fetched_agent: Any | None = None
@@ -127,7 +174,28 @@ async def create_chat_agent_from_foundry(
     agent = ChatAgent(**chat_agent_kwargs)
     return agent, tool_resources
 
+
+def configure_agent_factory(factory: Optional[AgentFactory]) -> None:
+    """Replace how turn handlers create agents (None restores the default).
+
+    Used by the load-test harness (``perf/``) to run the full handler
+    pipeline against a local stand-in instead of Azure AI Foundry.
+    """
+    global _agent_factory
+    _agent_factory = factory
+
+
+def get_agent_factory() -> AgentFactory:
+    return _agent_factory or create_chat_agent_from_foundry
+
+
 __all__ = [
     "create_chat_agent_from_foundry",
     "SUPPORTED_PASSTHROUGH_TOOL_TYPES",
+    "AGENT_SDK_MODULES",
+    "AgentFactory",
+    "configure_agent_factory",
+    "ensure_agent_sdk_loaded",
+    "get_agent_factory",
+    "load_agent_sdk",
 ]
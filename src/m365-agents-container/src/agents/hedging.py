@@ -0,0 +1,331 @@
+"""Hedged agent runs for a conversation's first turn.
+
+Some runs sit queued for a long time before their first token while a
+fresh run would answer quickly. On a conversation's first turn the thread
+holds no history yet, so a second run on another new thread is safe: when
+the first run has produced no token after the hedge delay (a percentile
+of recent time-to-first-token, with a floor), a hedge run is started.
+Whichever produces a token first is streamed to the user; the other is
+cancelled, and its service run and thread are cleaned up in the
+background.
+
+Metadata updates (run created, step created) are not tokens: they are
+buffered and replayed ahead of the winner's first token.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Time-to-first-token samples kept for the hedge delay percentile
+_WINDOW = 200
+# Samples needed before the percentile replaces the default delay
+_MIN_SAMPLES = 20
+
+_END = object()
+# Rough output size of streamed text when no usage update arrived
+_CHARS_PER_TOKEN = 4
+
+
+def _is_token(chunk: Any) -> bool:
+    """True for updates carrying output (text, files, code, usage)."""
+    if getattr(chunk, "contents", None):
+        return True
+    raw = getattr(
+        getattr(chunk, "raw_representation", None), "raw_representation", None
+    )
+    raw = getattr(raw, "code_interpreter", None) or raw
+    return type(raw).__name__ == "RunStepDeltaCodeInterpreterDetailItemObject"
+
+
+def _usage_tokens(chunk: Any, field: str) -> int:
+    total = 0
+    for content in getattr(chunk, "contents", None) or []:
+        if type(content).__name__ == "UsageContent":
+            details = getattr(content, "details", None)
+            total += getattr(details, field, None) or 0
+    return total
+
+
+def _prompt_tokens(chunk: Any) -> int:
+    return _usage_tokens(chunk, "input_token_count")
+
+
+class _Attempt:
+    """One `run_stream` pumped into a queue by a background task."""
+
+    def __init__(
+        self, label: str, agent: Any, messages: Any, thread: Any,
+        run_kwargs: Dict[str, Any],
+    ) -> None:
+        self.label = label
+        self.thread = thread
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.ready = asyncio.get_running_loop().create_future()
+        self.token = False
+        self.error: Optional[BaseException] = None
+        self.output_tokens = 0
+        self.output_chars = 0
+        self.run_id: Optional[str] = None
+        self.thread_id: Optional[str] = None
+        self.started = time.monotonic()
+        self.first_token_s: Optional[float] = None
+        self.task = asyncio.ensure_future(
+            self._pump(agent, messages, run_kwargs)
+        )
+
+    async def _pump(
+        self, agent: Any, messages: Any, run_kwargs: Dict[str, Any]
+    ) -> None:
+        stream = agent.run_stream(messages, thread=self.thread, **run_kwargs)
+        try:
+            async for chunk in stream:
+                self.output_tokens += _usage_tokens(
+                    chunk, "output_token_count"
+                )
+                self.output_chars += len(getattr(chunk, "text", None) or "")
+                self.run_id = self.run_id or getattr(chunk, "response_id", None)
+                self.thread_id = self.thread_id or getattr(
+                    getattr(chunk, "raw_representation", None),
+                    "conversation_id",
+                    None,
+                )
+                self.queue.put_nowait(chunk)
+                if not self.token and _is_token(chunk):
+                    self.token = True
+                    self.first_token_s = time.monotonic() - self.started
+                    if not self.ready.done():
+                        self.ready.set_result(None)
+        except Exception as exc:  # noqa: BLE001 - re-raised to the reader
+            self.error = exc
+        finally:
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                try:
+                    await aclose()
+                except Exception:  # noqa: BLE001
+                    pass
+            self.queue.put_nowait(_END)
+            if not self.ready.done():
+                self.ready.set_result(None)
+
+    def completion_tokens(self) -> int:
+        """Output tokens streamed so far, estimated from text without usage."""
+        if self.output_tokens:
+            return self.output_tokens
+        return -(-self.output_chars // _CHARS_PER_TOKEN)
+
+    async def stream(self) -> AsyncIterator[Any]:
+        while True:
+            chunk = await self.queue.get()
+            if chunk is _END:
+                if self.error is not None:
+                    raise self.error
+                return
+            yield chunk
+
+
+class HedgedStream:
+    """Async iterator over a hedged run; `thread` is the winner's thread."""
+
+    def __init__(
+        self, hedger: "RunHedger", agent: Any, messages: Any, thread: Any,
+        run_kwargs: Dict[str, Any],
+    ) -> None:
+        self.hedger = hedger
+        self.agent = agent
+        self.messages = messages
+        self.thread = thread
+        self.run_kwargs = run_kwargs
+        self.hedged = False
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        return self._stream()
+
+    def _start(self, label: str, thread: Any) -> _Attempt:
+        return _Attempt(
+            label, self.agent, self.messages, thread, self.run_kwargs
+        )
+
+    async def _race(self) -> tuple[_Attempt, Optional[_Attempt]]:
+        """Return (winner, loser); loser is None when no hedge fired."""
+        primary = self._start("primary", self.thread)
+        attempts = [primary]
+        try:
+            delay = self.hedger.delay_s()
+            done, _ = await asyncio.wait({primary.ready}, timeout=delay)
+            if done:
+                return primary, None
+
+            self.hedged = True
+            self.hedger.fired += 1
+            logger.info(
+                "No first token after %.0f ms; starting hedge run",
+                delay * 1000,
+            )
+            hedge = self._start("hedge", self.agent.get_new_thread())
+            attempts.append(hedge)
+            pending = {primary.ready, hedge.ready}
+            while pending:
+                await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for attempt, other in ((primary, hedge), (hedge, primary)):
+                    if attempt.token:
+                        return attempt, other
+                pending = {a.ready for a in attempts if not a.ready.done()}
+            # Both ended without a token: surface the primary's outcome
+            return primary, hedge
+        except asyncio.CancelledError:
+            for attempt in attempts:
+                attempt.task.cancel()
+            raise
+
+    async def _stream(self) -> AsyncIterator[Any]:
+        winner, loser = await self._race()
+        if loser is not None:
+            # Stop the loser now, not when the winner's stream ends
+            self.hedger.discard(self.agent, loser)
+            self.hedger.settle(winner)
+        try:
+            if winner.first_token_s is not None:
+                self.hedger.record_first_token(winner.first_token_s)
+            self.thread = winner.thread
+            async for chunk in winner.stream():
+                if loser is not None:
+                    # The loser sent the same prompt
+                    self.hedger.extra_tokens += _prompt_tokens(chunk)
+                yield chunk
+        finally:
+            winner.task.cancel()
+
+
+class RunHedger:
+    """Hedge first-turn runs and count how it pays off."""
+
+    def __init__(
+        self,
+        *,
+        percentile: float = 95.0,
+        min_delay_ms: float = 1000.0,
+        default_delay_ms: float = 4000.0,
+    ) -> None:
+        self.percentile = percentile
+        self.min_delay_s = min_delay_ms / 1000.0
+        self.default_delay_s = default_delay_ms / 1000.0
+        self.runs = 0
+        self.fired = 0
+        self.hedge_won = 0
+        self.primary_won = 0
+        self.both_failed = 0
+        self.extra_tokens = 0
+        self._samples: Deque[float] = deque(maxlen=_WINDOW)
+        self._cleanup: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def eligible(thread: Any) -> bool:
+        """Only threads without service history (first turns) are hedged."""
+        return getattr(thread, "service_thread_id", None) is None
+
+    def record_first_token(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def delay_s(self) -> float:
+        if len(self._samples) < _MIN_SAMPLES:
+            return max(self.default_delay_s, self.min_delay_s)
+        ordered = sorted(self._samples)
+        index = min(
+            len(ordered) - 1, int(len(ordered) * self.percentile / 100.0)
+        )
+        return max(ordered[index], self.min_delay_s)
+
+    def run_stream(
+        self, agent: Any, messages: Any, thread: Any, **run_kwargs: Any
+    ) -> HedgedStream:
+        self.runs += 1
+        return HedgedStream(self, agent, messages, thread, run_kwargs)
+
+    def settle(self, winner: _Attempt) -> None:
+        """Count the outcome of a race that fired a hedge."""
+        if not winner.token:
+            self.both_failed += 1
+        elif winner.label == "hedge":
+            self.hedge_won += 1
+        else:
+            self.primary_won += 1
+
+    def discard(self, agent: Any, loser: _Attempt) -> None:
+        """Cancel the losing attempt and its service run in the background."""
+        loser.task.cancel()
+        task = asyncio.ensure_future(self._cleanup_service(agent, loser))
+        self._cleanup.add(task)
+        task.add_done_callback(self._cleanup.discard)
+
+    async def _cleanup_service(self, agent: Any, loser: _Attempt) -> None:
+        await asyncio.gather(loser.task, return_exceptions=True)
+        # Output the loser streamed before it stopped (its prompt is counted
+        # from the winner's usage)
+        self.extra_tokens += loser.completion_tokens()
+        thread_id = loser.thread_id or getattr(
+            loser.thread, "service_thread_id", None
+        )
+        project_client = getattr(
+            getattr(agent, "chat_client", None), "project_client", None
+        )
+        if project_client is None or not thread_id:
+            return
+        agents = project_client.agents
+        try:
+            if loser.run_id:
+                await agents.runs.cancel(thread_id=thread_id, run_id=loser.run_id)
+            await agents.threads.delete(thread_id)
+        except Exception as exc:  # noqa: BLE001
+            logger.debug(
+                "Failed to clean up hedged run - Thread ID: %s, Error: %s",
+                thread_id,
+                exc,
+            )
+
+    async def close(self) -> None:
+        """Wait briefly for cleanups still running (at shutdown)."""
+        tasks: List[asyncio.Task] = list(self._cleanup)
+        if tasks:
+            await asyncio.wait(tasks, timeout=5.0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "fired": self.fired,
+            "hedge_won": self.hedge_won,
+            "primary_won": self.primary_won,
+            "both_failed": self.both_failed,
+            "extra_tokens": self.extra_tokens,
+            "delay_ms": round(self.delay_s() * 1000, 1),
+            "samples": len(self._samples),
+        }
+
+
+_hedger: Optional[RunHedger] = None
+
+
+def get_run_hedger() -> Optional[RunHedger]:
+    return _hedger
+
+
+def configure_run_hedger(hedger: Optional[RunHedger]) -> None:
+    """Install `hedger` (None turns hedging off)."""
+    global _hedger
+    _hedger = hedger
+
+
+__all__ = [
+    "HedgedStream",
+    "RunHedger",
+    "configure_run_hedger",
+    "get_run_hedger",
+]
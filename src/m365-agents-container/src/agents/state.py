@@ -1,25 +1,241 @@
-"""In-memory conversation state utilities (moved from conversation_state.py).
+"""Conversation state utilities (moved from conversation_state.py).
 
-For production use, replace with a persistent store (Redis, Cosmos DB, etc.).
+Live `ChatAgent`/`AgentThread` objects are cached per process in the dicts
+below. The mapping conversation -> Foundry service thread id is also kept
+in a `ConversationStore`, which can be shared between processes (SQLite
+file) so any worker can resume any conversation. For multi-replica
+production use, back the store with Redis, Cosmos DB, etc.
 """
 from __future__ import annotations
 
+import asyncio
 import logging
+import os
+import sqlite3
+import threading
+import time
 from datetime import datetime
-from typing import Dict
+from typing import TYPE_CHECKING, Dict, List, Optional, Protocol, Tuple
 
-from agent_framework import ChatAgent  # type: ignore
-from agent_framework._threads import AgentThread  # type: ignore
+if TYPE_CHECKING:  # agent_framework is imported on first use, not here
+    from agent_framework import ChatAgent  # type: ignore
+    from agent_framework._threads import AgentThread  # type: ignore
 
 logger = logging.getLogger(__name__)
 
-conversation_agents: Dict[str, ChatAgent] = {}
-conversation_threads: Dict[str, AgentThread] = {}
+conversation_agents: Dict[str, "ChatAgent"] = {}
+conversation_threads: Dict[str, "AgentThread"] = {}
 conversation_tool_resources: Dict[str, object] = {}
 conversation_last_activity: Dict[str, datetime] = {}
 
 
-def reset_conversation(conversation_id: str) -> None:
+class ConversationStore(Protocol):
+    """Shared conversation -> service thread id mapping."""
+
+    def get_thread_id(self, conversation_id: str) -> Optional[str]: ...
+
+    def set_thread_id(self, conversation_id: str, thread_id: str) -> None: ...
+
+    def delete(self, conversation_id: str) -> None: ...
+
+    def replace_thread_id(
+        self, conversation_id: str, thread_id: str, replaced_by: str
+    ) -> bool: ...
+
+    def retired_thread_ids(self, conversation_id: str) -> List[str]: ...
+
+    def count_turn(self, conversation_id: str, thread_id: str) -> int: ...
+
+
+class MemoryConversationStore:
+    """Process-local store (default; state is not shared across workers)."""
+
+    def __init__(self) -> None:
+        self._thread_ids: Dict[str, str] = {}
+        self._retired: Dict[str, List[Tuple[str, str, float]]] = {}
+        self._turns: Dict[str, Tuple[str, int]] = {}
+
+    def get_thread_id(self, conversation_id: str) -> Optional[str]:
+        return self._thread_ids.get(conversation_id)
+
+    def set_thread_id(self, conversation_id: str, thread_id: str) -> None:
+        self._thread_ids[conversation_id] = thread_id
+
+    def delete(self, conversation_id: str) -> None:
+        self._thread_ids.pop(conversation_id, None)
+        self._turns.pop(conversation_id, None)
+
+    def replace_thread_id(
+        self, conversation_id: str, thread_id: str, replaced_by: str
+    ) -> bool:
+        """Swap `thread_id` for `replaced_by` if it is still current."""
+        if self._thread_ids.get(conversation_id) != thread_id:
+            return False
+        self._thread_ids[conversation_id] = replaced_by
+        self._retired.setdefault(conversation_id, []).append(
+            (thread_id, replaced_by, time.time())
+        )
+        return True
+
+    def retired_thread_ids(self, conversation_id: str) -> List[str]:
+        return [row[0] for row in self._retired.get(conversation_id, [])]
+
+    def count_turn(self, conversation_id: str, thread_id: str) -> int:
+        """Count a turn on `thread_id`; return the turns on that thread."""
+        current, turns = self._turns.get(conversation_id, (thread_id, 0))
+        turns = turns + 1 if current == thread_id else 1
+        self._turns[conversation_id] = (thread_id, turns)
+        return turns
+
+
+class SqliteConversationStore:
+    """SQLite-backed store shared by every worker process on the host.
+
+    Uses WAL mode so readers never block the single writer. Connections are
+    per thread and per process (never reused across a fork).
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversation_threads ("
+                "conversation_id TEXT PRIMARY KEY, thread_id TEXT NOT NULL, "
+                "updated_at REAL NOT NULL)"
+            )
+            # Threads replaced by compaction, kept for auditing
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS retired_threads ("
+                "conversation_id TEXT NOT NULL, thread_id TEXT NOT NULL, "
+                "replaced_by TEXT NOT NULL, retired_at REAL NOT NULL)"
+            )
+            # Turns on each conversation's current thread, counted by every
+            # worker (drives turn-based compaction)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS thread_turns ("
+                "conversation_id TEXT PRIMARY KEY, thread_id TEXT NOT NULL, "
+                "turns INTEGER NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        pid = os.getpid()
+        if getattr(self._local, "pid", None) != pid:
+            conn = sqlite3.connect(self._path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = pid
+        return self._local.conn
+
+    def get_thread_id(self, conversation_id: str) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT thread_id FROM conversation_threads "
+            "WHERE conversation_id = ?",
+            (conversation_id,),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_thread_id(self, conversation_id: str, thread_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO conversation_threads "
+                "(conversation_id, thread_id, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(conversation_id) DO UPDATE SET "
+                "thread_id = excluded.thread_id, "
+                "updated_at = excluded.updated_at",
+                (conversation_id, thread_id, time.time()),
+            )
+
+    def delete(self, conversation_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM conversation_threads WHERE conversation_id = ?",
+                (conversation_id,),
+            )
+            conn.execute(
+                "DELETE FROM thread_turns WHERE conversation_id = ?",
+                (conversation_id,),
+            )
+
+    def replace_thread_id(
+        self, conversation_id: str, thread_id: str, replaced_by: str
+    ) -> bool:
+        """Swap `thread_id` for `replaced_by` if it is still current.
+
+        Compare-and-set in one transaction, so a reset or another rebind
+        made by a different worker is never overwritten.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE conversation_threads SET thread_id = ?, "
+                "updated_at = ? WHERE conversation_id = ? AND thread_id = ?",
+                (replaced_by, now, conversation_id, thread_id),
+            )
+            if cursor.rowcount != 1:
+                return False
+            conn.execute(
+                "INSERT INTO retired_threads "
+                "(conversation_id, thread_id, replaced_by, retired_at) "
+                "VALUES (?, ?, ?, ?)",
+                (conversation_id, thread_id, replaced_by, now),
+            )
+        return True
+
+    def retired_thread_ids(self, conversation_id: str) -> List[str]:
+        rows = self._connect().execute(
+            "SELECT thread_id FROM retired_threads WHERE conversation_id = ? "
+            "ORDER BY retired_at",
+            (conversation_id,),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def count_turn(self, conversation_id: str, thread_id: str) -> int:
+        """Count a turn on `thread_id`; return the turns on that thread."""
+        with self._connect() as conn:
+            # The upsert takes the write lock, so the read sees our own count
+            conn.execute(
+                "INSERT INTO thread_turns (conversation_id, thread_id, turns) "
+                "VALUES (?, ?, 1) "
+                "ON CONFLICT(conversation_id) DO UPDATE SET "
+                "turns = CASE WHEN thread_turns.thread_id = excluded.thread_id "
+                "THEN thread_turns.turns + 1 ELSE 1 END, "
+                "thread_id = excluded.thread_id",
+                (conversation_id, thread_id),
+            )
+            row = conn.execute(
+                "SELECT turns FROM thread_turns WHERE conversation_id = ?",
+                (conversation_id,),
+            ).fetchone()
+        return row[0] if row else 1
+
+
+_conversation_store: ConversationStore = MemoryConversationStore()
+
+
+def create_conversation_store(backend: str, path: str) -> ConversationStore:
+    """Create a store for `backend` ("memory" or "sqlite")."""
+    backend = (backend or "memory").lower()
+    if backend == "sqlite":
+        return SqliteConversationStore(path)
+    if backend != "memory":
+        raise ValueError(f"Unknown conversation state backend: {backend}")
+    return MemoryConversationStore()
+
+
+def configure_conversation_store(store: ConversationStore) -> None:
+    global _conversation_store
+    _conversation_store = store
+    logger.info("Conversation store: %s", type(store).__name__)
+
+
+def get_conversation_store() -> ConversationStore:
+    return _conversation_store
+
+
+async def reset_conversation(conversation_id: str) -> None:
+    await asyncio.to_thread(_conversation_store.delete, conversation_id)
     removed_agent = conversation_agents.pop(conversation_id, None)
     removed_thread = conversation_threads.pop(conversation_id, None)
     conversation_tool_resources.pop(conversation_id, None)
@@ -33,6 +249,12 @@ def reset_conversation(conversation_id: str) -> None:
 
 
 __all__ = [
+    "ConversationStore",
+    "MemoryConversationStore",
+    "SqliteConversationStore",
+    "configure_conversation_store",
+    "create_conversation_store",
+    "get_conversation_store",
     "conversation_agents",
     "conversation_threads",
     "conversation_tool_resources",
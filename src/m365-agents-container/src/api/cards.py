@@ -1,9 +1,11 @@
 """Adaptive Card builders extracted from the legacy agent module."""
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+import json
+from typing import Any, Callable, Dict, List, Optional
 
-from ..app.config import RESET_COMMAND_KEYWORDS
+from ..app.config import (CARD_MAX_BYTES, CARD_MAX_CONTINUATIONS,
+                          RESET_COMMAND_KEYWORDS)
 
 
 def build_reset_adaptive_card(title: str, message: str) -> dict:
@@ -40,94 +42,104 @@ def build_reset_adaptive_card(title: str, message: str) -> dict:
     }
 
 
-def build_response_adaptive_card(
-    markdown_text: Optional[str] = None,
-    metadata: Optional[Dict[str, Any]] = None,
-    code_blocks: Optional[list] = None,
-    images: Optional[list] = None,
-) -> dict:
-    body_elements = []
+def _text_element(text: str) -> dict:
+    return {"type": "TextBlock", "text": text, "wrap": True}
 
-    # Add main text response
-    if markdown_text:
-        body_elements.append({
-            "type": "TextBlock",
-            "text": markdown_text,
-            "wrap": True,
-        })
 
-    # Add code blocks
-    if code_blocks:
-        for code_block in code_blocks:
-            body_elements.append({
-                "type": "TextBlock",
-                "text": f"```\n{code_block.get('code', '')}\n```",
-                "wrap": True,
-                "fontType": "Monospace",
-                "separator": True,
-            })
-
-    # Add images
-    if images:
-        for img in images:
-            # Note: file_id would need to be resolved to URL
-            # For now, we'll add a placeholder
-            body_elements.append({
-                "type": "TextBlock",
-                "text": f"[Image: {img.get('file_id')}]",
-                "separator": True,
-                "color": "Accent",
-            })
-    if metadata:
-        # Extract values from metadata
-        response_time = metadata.get("response_time_ms")
-        total_tokens = metadata.get("total_tokens")
-        prompt_tokens = metadata.get("prompt_tokens")
-        completion_tokens = metadata.get("completion_tokens")
-        tool_calls = metadata.get("tool_calls")
-        thread_id = metadata.get("thread_id")
-
-        # Format debug information for compact display
-        debug_items = []
-
-        # Always show response time (or N/A)
-        if response_time is not None:
-            debug_items.append(f"{response_time:.0f}ms")
-        else:
-            debug_items.append("time: N/A")
-
-        # Always show token info (or N/A)
-        if total_tokens is not None:
-            token_parts = [f"{total_tokens} tokens"]
-            if prompt_tokens is not None:
-                token_parts.append(f"prompt: {prompt_tokens}")
-            if completion_tokens is not None:
-                token_parts.append(f"completion: {completion_tokens}")
-            debug_items.append(", ".join(token_parts))
-        else:
-            debug_items.append("tokens: N/A")
-
-        if tool_calls:
-            debug_items.append(f"tools: {', '.join(tool_calls)}")
-
-        debug_text = " • ".join(debug_items)
-
-        # Add thread ID and run ID on second line
-        thread_info = thread_id or 'N/A'
-        run_info = metadata.get('run_id') or 'N/A'
-        debug_text += f"\nthread: {thread_info} | run: {run_info}"
-
-        # Add debug info as always-visible, thin text block
-        body_elements.append({
-            "type": "TextBlock",
-            "text": debug_text,
-            "size": "Small",
-            "color": "Accent",
-            "wrap": True,
-            "isSubtle": True,
+def _code_element(code: str) -> dict:
+    return {
+        "type": "TextBlock",
+        "text": f"```\n{code}\n```",
+        "wrap": True,
+        "fontType": "Monospace",
+        "separator": True,
+    }
+
+
+def _note_element(text: str) -> dict:
+    return {
+        "type": "TextBlock",
+        "text": text,
+        "size": "Small",
+        "isSubtle": True,
+        "wrap": True,
+        "spacing": "Small",
+    }
+
+
+def _image_element(img: Dict[str, Any]) -> dict:
+    if img.get("url"):
+        return {
+            "type": "Image",
+            "url": img["url"],
+            "altText": f"Image {img.get('file_id')}",
             "separator": True,
-            "spacing": "Small"
-        })
+        }
+    return _image_placeholder_element(img)
+
+
+def _image_placeholder_element(img: Dict[str, Any]) -> dict:
+    return {
+        "type": "TextBlock",
+        "text": f"[Image: {img.get('file_id')}]",
+        "separator": True,
+        "color": "Accent",
+    }
+
+
+def _metadata_element(metadata: Dict[str, Any]) -> dict:
+    # Extract values from metadata
+    response_time = metadata.get("response_time_ms")
+    total_tokens = metadata.get("total_tokens")
+    prompt_tokens = metadata.get("prompt_tokens")
+    completion_tokens = metadata.get("completion_tokens")
+    tool_calls = metadata.get("tool_calls")
+    thread_id = metadata.get("thread_id")
+
+    # Format debug information for compact display
+    debug_items = []
+
+    # Always show response time (or N/A)
+    if response_time is not None:
+        debug_items.append(f"{response_time:.0f}ms")
+    else:
+        debug_items.append("time: N/A")
+
+    # Always show token info (or N/A)
+    if total_tokens is not None:
+        token_parts = [f"{total_tokens} tokens"]
+        if prompt_tokens is not None:
+            token_parts.append(f"prompt: {prompt_tokens}")
+        if completion_tokens is not None:
+            token_parts.append(f"completion: {completion_tokens}")
+        debug_items.append(", ".join(token_parts))
+    else:
+        debug_items.append("tokens: N/A")
+
+    if tool_calls:
+        debug_items.append(f"tools: {', '.join(tool_calls)}")
+
+    debug_text = " • ".join(debug_items)
+
+    # Add thread ID and run ID on second line
+    thread_info = thread_id or 'N/A'
+    run_info = metadata.get('run_id') or 'N/A'
+    debug_text += f"\nthread: {thread_info} | run: {run_info}"
+
+    # Add debug info as always-visible, thin text block
+    return {
+        "type": "TextBlock",
+        "text": debug_text,
+        "size": "Small",
+        "color": "Accent",
+        "wrap": True,
+        "isSubtle": True,
+        "separator": True,
+        "spacing": "Small"
+    }
+
+
+def _wrap_card(body_elements: list) -> dict:
     card_content = {
         "$schema": "http://adaptivecards.io/schemas/adaptive-card.json",
         "type": "AdaptiveCard",
@@ -145,4 +157,212 @@ def build_response_adaptive_card(
     }
 
 
-__all__ = ["build_reset_adaptive_card", "build_response_adaptive_card"]
+def _json_len(value: Any) -> int:
+    """Serialized size in bytes (default ensure_ascii output is pure ASCII)."""
+    return len(json.dumps(value))
+
+
+# Room kept free on every page for the "continued" / "truncated" notes.
+_NOTE_RESERVE_BYTES = 256
+_EMPTY_CARD_BYTES = _json_len(_wrap_card([]))
+_CODE_FRAME_BYTES = _json_len(_code_element(""))
+_TEXT_FRAME_BYTES = _json_len(_text_element(""))
+# Room assumed for the metadata footer when sizing inline images.
+_METADATA_ALLOWANCE_BYTES = 512
+# Frame of an inline image element: longest data URI prefix, generous file id.
+_IMAGE_FRAME_BYTES = _json_len(
+    _image_element({"url": "data:image/jpeg;base64,", "file_id": "x" * 64})
+)
+
+
+def inline_image_max_bytes(max_bytes: Optional[int] = None) -> int:
+    """Largest raw image whose data URI still fits on a continuation card.
+
+    Anything bigger is rendered as a placeholder, so it is not worth
+    downloading.
+    """
+    max_bytes = CARD_MAX_BYTES if max_bytes is None else max_bytes
+    available = (
+        max_bytes
+        - _EMPTY_CARD_BYTES
+        - _NOTE_RESERVE_BYTES
+        - _METADATA_ALLOWANCE_BYTES
+        - _json_len(_note_element("Continued (part 00)"))
+        - _IMAGE_FRAME_BYTES
+        - 4  # ", " separators
+    )
+    # base64 emits 4 characters per 3 bytes
+    return max(0, available // 4 * 3)
+
+
+class _CardPager:
+    """Accumulate body elements into pages that stay under a byte budget.
+
+    Every element is serialized exactly once to learn its size; the running
+    total per page is the empty-card envelope plus element sizes and the
+    separating commas, so the full card is never re-dumped while building.
+    """
+
+    def __init__(self, max_bytes: int, max_cards: int, reserve: int) -> None:
+        self.capacity = max_bytes - _EMPTY_CARD_BYTES - reserve
+        self.max_cards = max(1, max_cards)
+        self.pages: List[List[dict]] = [[]]
+        self.used = 0
+        self.truncated = False
+        self.omitted_chars = 0
+        self.omitted_images = 0
+
+    def remaining(self) -> int:
+        return self.capacity - self.used
+
+    def add(self, element: dict, size: int) -> None:
+        self.pages[-1].append(element)
+        self.used += size + 2  # ", " separator
+
+    def next_page(self) -> bool:
+        if len(self.pages) >= self.max_cards:
+            self.truncated = True
+            return False
+        self.pages.append([])
+        self.used = 0
+        header = _note_element(f"Continued (part {len(self.pages)})")
+        self.add(header, _json_len(header))
+        return True
+
+    def fits(self, size: int) -> bool:
+        return size + 2 <= self.remaining()
+
+    def add_element(self, element: dict, size: Optional[int] = None) -> bool:
+        """Add an indivisible element, moving to a new page if needed."""
+        size = _json_len(element) if size is None else size
+        if self.truncated:
+            return False
+        if not self.fits(size) and not (self.next_page() and self.fits(size)):
+            return False
+        self.add(element, size)
+        return True
+
+    def add_lines(
+        self, text: str, frame_bytes: int, make_element: Callable[[str], dict]
+    ) -> None:
+        """Add `text` as one element, split on line boundaries across pages."""
+        if self.truncated:
+            self.omitted_chars += len(text)
+            return
+        pending: List[str] = []
+        pending_size = frame_bytes
+        consumed = 0
+        piece_limit = self.capacity - frame_bytes - _json_len(
+            _note_element("Continued (part 00)")
+        ) - 4
+        for line in text.split("\n"):
+            for piece, size in _split_to_fit(line, piece_limit):
+                size += 2  # escaped "\n" joining the lines
+                if not self.fits(pending_size + size):
+                    if pending:
+                        self.add(make_element("\n".join(pending)), pending_size)
+                        pending, pending_size = [], frame_bytes
+                    if not self.next_page():
+                        # Budget exhausted: count the rest without escaping it
+                        self.omitted_chars += len(text) - consumed
+                        return
+                pending.append(piece)
+                pending_size += size
+                consumed += len(piece)
+            consumed += 1
+        if pending:
+            self.add(make_element("\n".join(pending)), pending_size)
+
+
+def _split_to_fit(line: str, limit: int) -> List[tuple[str, int]]:
+    """Split a single line into pieces whose escaped size is <= `limit`."""
+    size = _json_len(line) - 2
+    if size <= limit or len(line) <= 1:
+        return [(line, size)]
+    mid = len(line) // 2
+    return _split_to_fit(line[:mid], limit) + _split_to_fit(line[mid:], limit)
+
+
+def build_response_adaptive_cards(
+    markdown_text: Optional[str] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    code_blocks: Optional[list] = None,
+    images: Optional[list] = None,
+    *,
+    max_bytes: Optional[int] = None,
+    max_cards: Optional[int] = None,
+) -> List[dict]:
+    """Build the response as one or more cards, each under `max_bytes`.
+
+    Content that does not fit is carried over to continuation cards (up to
+    `max_cards` in total); anything beyond that is truncated with a note.
+    The metadata footer, if any, goes on the last card.
+    """
+    max_bytes = CARD_MAX_BYTES if max_bytes is None else max_bytes
+    max_cards = (
+        CARD_MAX_CONTINUATIONS + 1 if max_cards is None else max_cards
+    )
+    metadata_element = _metadata_element(metadata) if metadata else None
+    metadata_size = _json_len(metadata_element) if metadata_element else 0
+    pager = _CardPager(
+        max_bytes, max_cards, _NOTE_RESERVE_BYTES + metadata_size
+    )
+
+    # Add main text response
+    if markdown_text:
+        pager.add_lines(markdown_text, _TEXT_FRAME_BYTES, _text_element)
+
+    # Add code blocks
+    if code_blocks:
+        for code_block in code_blocks:
+            pager.add_lines(
+                code_block.get("code", ""), _CODE_FRAME_BYTES, _code_element
+            )
+
+    # Add images (inline when resolved to a data URI, placeholder otherwise)
+    if images:
+        for img in images:
+            element = _image_element(img)
+            size = _json_len(element)
+            if size > pager.capacity:
+                element = _image_placeholder_element(img)
+                size = _json_len(element)
+            if not pager.add_element(element, size):
+                pager.omitted_images += 1
+
+    pages = pager.pages
+    for page in pages[:-1]:
+        page.append(_note_element("Continued in the next message…"))
+    if pager.truncated:
+        omitted = []
+        if pager.omitted_chars:
+            omitted.append(f"{pager.omitted_chars} characters")
+        if pager.omitted_images:
+            omitted.append(f"{pager.omitted_images} image(s)")
+        note = "Output truncated to fit the message size limit"
+        if omitted:
+            note += f" ({' and '.join(omitted)} not shown)"
+        pages[-1].append(_note_element(note + "."))
+    if metadata_element:
+        pages[-1].append(metadata_element)
+    return [_wrap_card(page) for page in pages]
+
+
+def build_response_adaptive_card(
+    markdown_text: Optional[str] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    code_blocks: Optional[list] = None,
+    images: Optional[list] = None,
+) -> dict:
+    """Build a single response card, truncated to the card size budget."""
+    return build_response_adaptive_cards(
+        markdown_text, metadata, code_blocks, images, max_cards=1
+    )[0]
+
+
+__all__ = [
+    "build_reset_adaptive_card",
+    "build_response_adaptive_card",
+    "build_response_adaptive_cards",
+    "inline_image_max_bytes",
+]
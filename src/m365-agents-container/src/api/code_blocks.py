@@ -0,0 +1,58 @@
+"""Incremental assembly of streamed code fragments into whole code blocks.
+
+Code-interpreter input is streamed as many small deltas. Rather than
+emitting one block per delta, fragments are buffered per tool call (or per
+run when the stream carries no call id) and joined once when the blocks are
+read, so assembly stays linear in the size of the output.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+
+class CodeBlockAssembler:
+    """Collect code fragments keyed by tool call into one block per cell.
+
+    A key stays open until `close()` is called for it (or for all keys);
+    fragments arriving for a closed key start a new logical cell.
+    """
+
+    def __init__(self) -> None:
+        self._types: List[str] = []
+        self._parts: List[List[str]] = []
+        self._open: Dict[str, int] = {}
+        self._joined: Optional[List[Dict[str, Any]]] = None
+
+    def append(self, key: str, fragment: str, ctype: str) -> None:
+        if not fragment:
+            return
+        idx = self._open.get(key)
+        if idx is None:
+            idx = len(self._parts)
+            self._types.append(ctype)
+            self._parts.append([])
+            self._open[key] = idx
+        self._parts[idx].append(fragment)
+        self._joined = None
+
+    def close(self, key: Optional[str] = None) -> None:
+        """End the cell for `key` (or every open cell when key is None)."""
+        if key is None:
+            self._open.clear()
+        else:
+            self._open.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._parts)
+
+    def blocks(self) -> List[Dict[str, Any]]:
+        """Return ``[{"code": ..., "type": ...}]`` with fragments joined."""
+        if self._joined is None:
+            self._joined = [
+                {"code": "".join(parts), "type": ctype}
+                for parts, ctype in zip(self._parts, self._types)
+            ]
+        return self._joined
+
+
+__all__ = ["CodeBlockAssembler"]
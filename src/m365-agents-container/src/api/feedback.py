@@ -0,0 +1,192 @@
+"""Buffered persistence of feedback-loop submissions.
+
+Responses are sent with Teams' feedback loop enabled (see
+``finalize_stream_with_card``); a thumbs up/down arrives as an ``invoke``
+whose value has ``actionName == "feedback"``. The invoke handler parses it
+with `parse_feedback` and hands the record to a `FeedbackBuffer`, which
+never blocks the turn: records go into a bounded in-memory queue (new
+records are dropped, and counted, when it is full) and a background task
+writes them to a `FeedbackSink` in batches once ``batch_size`` records are
+pending or ``flush_interval_s`` has passed (see ``app.batch_writer``).
+Pending records are flushed at shutdown.
+
+Sinks write synchronously in a worker thread: `SqliteFeedbackSink` (one
+row per record, safe to share between workers) and `JsonlFeedbackSink`
+(one JSON object per line).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from ..app.batch_writer import BatchSink, BatchWriter
+
+logger = logging.getLogger(__name__)
+
+FEEDBACK_ACTION = "feedback"
+
+
+def _value_dict(value: Any) -> Dict[str, Any]:
+    if isinstance(value, dict):
+        return value
+    if hasattr(value, "model_dump"):
+        return value.model_dump(by_alias=True, exclude_none=True)
+    return {}
+
+
+def parse_feedback(activity: Any) -> Optional[Dict[str, Any]]:
+    """Return a feedback record for a feedback invoke, else None."""
+    value = _value_dict(getattr(activity, "value", None))
+    if value.get("actionName") != FEEDBACK_ACTION:
+        return None
+    action = _value_dict(value.get("actionValue"))
+    feedback: Any = action.get("feedback")
+    if isinstance(feedback, str):
+        # Teams sends the form as a JSON string ({"feedbackText": ...})
+        try:
+            feedback = json.loads(feedback)
+        except ValueError:
+            pass
+    sender = getattr(activity, "from_property", None)
+    conversation = getattr(activity, "conversation", None)
+    return {
+        "received_at": datetime.now(timezone.utc).isoformat(),
+        "conversation_id": getattr(conversation, "id", None),
+        "reply_to_id": getattr(activity, "reply_to_id", None),
+        "user_id": getattr(sender, "id", None),
+        "tenant_id": getattr(conversation, "tenant_id", None),
+        "channel": getattr(activity, "channel_id", None),
+        "invoke": getattr(activity, "name", None),
+        "reaction": action.get("reaction"),
+        "feedback": feedback,
+    }
+
+
+FeedbackSink = BatchSink
+
+
+class JsonlFeedbackSink:
+    """Appends one JSON object per line to `path`."""
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        data = "".join(
+            json.dumps(record, separators=(",", ":"), default=str) + "\n"
+            for record in records
+        )
+        # One append per batch keeps workers' lines from interleaving
+        with open(self._path, "a", encoding="utf-8") as fh:
+            fh.write(data)
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteFeedbackSink:
+    """Inserts records into a ``feedback`` table (WAL mode).
+
+    Batches are written one at a time, so one connection per process is
+    enough; it is opened lazily so forked workers never share it.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS feedback ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "received_at TEXT NOT NULL, conversation_id TEXT, "
+                "reply_to_id TEXT, user_id TEXT, tenant_id TEXT, "
+                "channel TEXT, invoke TEXT, reaction TEXT, feedback TEXT)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(
+                self._path, timeout=5.0, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO feedback (received_at, conversation_id, "
+                "reply_to_id, user_id, tenant_id, channel, invoke, "
+                "reaction, feedback) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        r["received_at"], r["conversation_id"],
+                        r["reply_to_id"], r["user_id"], r["tenant_id"],
+                        r["channel"], r["invoke"], r["reaction"],
+                        json.dumps(r["feedback"], default=str),
+                    )
+                    for r in records
+                ],
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+def create_feedback_sink(backend: str, path: str) -> Optional[FeedbackSink]:
+    """Create a sink for `backend` ("sqlite", "jsonl" or "none")."""
+    backend = (backend or "none").lower()
+    if backend == "none":
+        return None
+    if backend == "sqlite":
+        return SqliteFeedbackSink(path)
+    if backend == "jsonl":
+        return JsonlFeedbackSink(path)
+    raise ValueError(f"Unknown feedback backend: {backend}")
+
+
+class FeedbackBuffer(BatchWriter):
+    """Bounded queue of feedback records flushed to a sink in batches."""
+
+    def __init__(self, sink: FeedbackSink, **kwargs: Any) -> None:
+        super().__init__(sink, name="feedback", **kwargs)
+
+
+_buffer: Optional[FeedbackBuffer] = None
+
+
+def get_feedback_buffer() -> Optional[FeedbackBuffer]:
+    return _buffer
+
+
+def configure_feedback_buffer(buffer: Optional[FeedbackBuffer]) -> None:
+    """Install `buffer` (None keeps feedback invokes unrecorded)."""
+    global _buffer
+    _buffer = buffer
+
+
+__all__ = [
+    "FeedbackBuffer",
+    "FeedbackSink",
+    "JsonlFeedbackSink",
+    "SqliteFeedbackSink",
+    "configure_feedback_buffer",
+    "create_feedback_sink",
+    "get_feedback_buffer",
+    "parse_feedback",
+]
@@ -1,23 +1,42 @@
 """Bot activity handlers (refactored from legacy agent.py)."""
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+import math
 import re
 import time
 from typing import Any, Dict, List, Optional
 
-from azure.identity.aio import DefaultAzureCredential
 from microsoft_agents.activity import Activity, ActivityTypes, Attachment
-from microsoft_agents.hosting.core import TurnContext, TurnState
+from microsoft_agents.hosting.core import (AgentApplication, TurnContext,
+                                           TurnState)
 
 from ..agents import (conversation_threads, conversation_tool_resources,
-                      create_chat_agent_from_foundry, reset_conversation)
-from ..app.config import (AGENT_APP, AZURE_AI_FOUNDRY_AGENT_ID,
+                      ensure_agent_sdk_loaded, get_agent_factory,
+                      get_conversation_store, get_run_hedger,
+                      get_thread_compactor, reset_conversation)
+from ..app.config import (AZURE_AI_FOUNDRY_AGENT_ID,
                           AZURE_AI_PROJECT_ENDPOINT,
+                          ENABLE_INLINE_IMAGES,
                           ENABLE_RESPONSE_METADATA_CARD,
-                          RESET_COMMAND_KEYWORDS)
-from .cards import build_response_adaptive_card
+                          LOOP_LAG_DEFER_SECONDS, RESET_COMMAND_KEYWORDS,
+                          TPM_QUEUE_SECONDS)
+from ..app.lifecycle import (DRAIN_NOTICE, DRAIN_REFUSAL, TURN_DRAIN,
+                             register_closeable)
+from ..app.loop_monitor import get_loop_monitor
+from ..app.tenant_scheduler import get_tenant_scheduler
+from ..app.token_budget import (TokenReservation, get_token_budget,
+                                is_throttle_error)
+from .cards import (build_response_adaptive_card,
+                    build_response_adaptive_cards)
+from .code_blocks import CodeBlockAssembler
+from .feedback import get_feedback_buffer, parse_feedback
+from .images import get_image_resolver
+from .prewarm import get_prewarmer
+from .recording import stream_recorder
+from .run_records import build_run_record, get_run_record_writer
 from .streaming import finalize_stream_with_card, queue_informative, queue_text
 
 logger = logging.getLogger(__name__)
@@ -45,42 +64,192 @@ def _extract_conversation_context(context: TurnContext) -> Dict[str, str]:
     }
 
 
+def _tenant_id(context: TurnContext) -> Optional[str]:
+    """Azure AD tenant of the conversation (Teams / M365), if known."""
+    conversation = context.activity.conversation
+    tenant_id = getattr(conversation, "tenant_id", None)
+    if tenant_id:
+        return tenant_id
+    channel_data = context.activity.channel_data or {}
+    if isinstance(channel_data, dict):
+        return (channel_data.get("tenant") or {}).get("id")
+    return None
+
+
+async def _reserve_token_budget(
+    context: TurnContext, conv_ctx: Dict[str, str]
+) -> tuple[bool, Optional[TokenReservation]]:
+    """Reserve the turn's estimated token cost.
+
+    Returns (admitted, reservation); the reservation is None when no limit
+    is configured. A refused user is told when to try again.
+    """
+    budget = get_token_budget()
+    if budget is None:
+        return True, None
+
+    async def _notify_wait(wait_s: float) -> None:
+        queue_informative(context, "Waiting for capacity...")
+
+    reservation, retry_after_s = await budget.acquire(
+        conv_ctx["conversation_id"],
+        user_id=conv_ctx["user_id"],
+        tenant_id=_tenant_id(context),
+        max_wait_s=TPM_QUEUE_SECONDS,
+        on_wait=_notify_wait,
+    )
+    if reservation is None:
+        await context.send_activity(
+            "We're handling a lot of requests right now. Please try again "
+            f"in about {max(1, math.ceil(retry_after_s))} seconds."
+        )
+        return False, None
+    return True, reservation
+
+
+def _runs_agent(user_content: str) -> bool:
+    """True when the message starts an agent run (not empty or a reset)."""
+    return bool(user_content) and (
+        user_content.lower() not in RESET_COMMAND_KEYWORDS
+    )
+
+
+def _record_run(
+    context: TurnContext,
+    conversation_id: str,
+    status: str,
+    run_metadata: Optional[Dict[str, Any]] = None,
+    started: Optional[float] = None,
+) -> None:
+    """Queue the turn's run record (never blocks the turn)."""
+    writer = get_run_record_writer()
+    if writer is None:
+        return
+    writer.submit(build_run_record(
+        conversation_id=conversation_id,
+        channel=getattr(context.activity, "channel_id", None),
+        tenant_id=_tenant_id(context),
+        status=status,
+        run_metadata=run_metadata,
+        response_time_ms=(
+            (time.time() - started) * 1000 if started is not None else None
+        ),
+    ))
+
+
 async def _handle_reset_command(
     context: TurnContext, conversation_id: str
 ) -> None:
     """Reset conversation state and notify user."""
-    reset_conversation(conversation_id)
+    await reset_conversation(conversation_id)
     await context.send_activity(
         "Conversation reset! Welcome back. Ask me anything to get started."
     )
 
 
-async def _create_agent_and_thread(
-    conversation_id: str,
-) -> tuple[Any, Any, str]:
-    """Create or reuse agent and conversation thread.
+async def _create_agent(conversation_id: str) -> tuple[Any, Any]:
+    """Create a ChatAgent with fresh credentials.
 
     Returns:
-        Tuple of (agent, thread, thread_id)
+        Tuple of (agent, credential)
     """
+    await ensure_agent_sdk_loaded()
+    from azure.identity.aio import DefaultAzureCredential
+
     # Always create fresh credentials to avoid token expiration
-    fresh_credential = DefaultAzureCredential()
+    fresh_credential = register_closeable(DefaultAzureCredential())
 
-    agent, tool_resources = await create_chat_agent_from_foundry(
+    agent, tool_resources = await get_agent_factory()(
         project_endpoint=AZURE_AI_PROJECT_ENDPOINT,
         agent_id=AZURE_AI_FOUNDRY_AGENT_ID,
         async_credential=fresh_credential,
     )
+    register_closeable(getattr(agent, "chat_client", None))
     if tool_resources is not None:
         conversation_tool_resources[conversation_id] = tool_resources
     logger.info(
         "Created ChatAgent with fresh credentials for conversation %s",
         conversation_id,
     )
+    return agent, fresh_credential
+
+
+async def _warm_conversation(conversation_id: str) -> tuple[Any, Any]:
+    """Create the conversation's agent and resume its stored thread."""
+    agent, credential = await _create_agent(conversation_id)
+    if conversation_id not in conversation_threads:
+        stored_thread_id = await asyncio.to_thread(
+            get_conversation_store().get_thread_id, conversation_id
+        )
+        if stored_thread_id and conversation_id not in conversation_threads:
+            conversation_threads[conversation_id] = agent.get_new_thread(
+                service_thread_id=stored_thread_id
+            )
+    return agent, credential
+
 
-    # Reuse thread if it exists
+async def _dispose_warm_agent(warmed: tuple[Any, Any]) -> None:
+    """Close an unused pre-warmed agent's client and credential."""
+    agent, credential = warmed
+    for resource in (getattr(agent, "chat_client", None), credential):
+        close = getattr(resource, "close", None)
+        if close is None:
+            continue
+        try:
+            await close()
+        except Exception as exc:  # noqa: BLE001
+            logger.debug("Failed to close pre-warmed resource: %s", exc)
+
+
+async def _create_agent_and_thread(
+    conversation_id: str,
+) -> tuple[Any, Any, str]:
+    """Create or reuse agent and conversation thread.
+
+    Returns:
+        Tuple of (agent, thread, thread_id)
+    """
+    prewarmer = get_prewarmer()
+    warmed = None
+    if prewarmer is not None:
+        warmed = await prewarmer.take(conversation_id)
+    if warmed is not None:
+        agent = warmed[0]
+        logger.info(
+            "Using pre-warmed ChatAgent for conversation %s", conversation_id
+        )
+    else:
+        agent, _ = await _create_agent(conversation_id)
+
+    # The store is authoritative: another worker may have reset the
+    # conversation or compacted it onto a new thread since this process last
+    # served it, so a cached thread is only reused while it matches the store
     thread = conversation_threads.get(conversation_id)
-    if not thread:
+    stored_thread_id = await asyncio.to_thread(
+        get_conversation_store().get_thread_id, conversation_id
+    )
+    cached_thread_id = getattr(thread, "service_thread_id", None)
+    if thread and cached_thread_id and cached_thread_id != stored_thread_id:
+        logger.info(
+            "Dropping stale AgentThread - Conversation ID: %s, Cached: %s, "
+            "Stored: %s",
+            conversation_id,
+            cached_thread_id,
+            stored_thread_id,
+        )
+        conversation_threads.pop(conversation_id, None)
+        thread = None
+    if not thread and stored_thread_id:
+        thread = agent.get_new_thread(service_thread_id=stored_thread_id)
+        conversation_threads[conversation_id] = thread
+        thread_id = stored_thread_id
+        logger.info(
+            "Resumed AgentThread from store - Conversation ID: %s, "
+            "Thread ID: %s",
+            conversation_id,
+            thread_id,
+        )
+    elif not thread:
         thread = agent.get_new_thread()
         conversation_threads[conversation_id] = thread
         thread_id = getattr(thread, "id", "unknown")
@@ -100,16 +269,84 @@ async def _create_agent_and_thread(
     return agent, thread, thread_id
 
 
+def _code_interpreter_delta(chunk: Any) -> tuple[Any, Optional[str]]:
+    """Return the raw code-interpreter delta behind a chunk and its call key.
+
+    The agent framework only logs code-interpreter input, but keeps the
+    service delta on ``chunk.raw_representation.raw_representation``. When
+    that is the whole tool-call delta, its index (or id) tells concurrent
+    calls of the same run apart; the key is None when it is not provided.
+    """
+    raw = getattr(
+        getattr(chunk, "raw_representation", None), "raw_representation", None
+    )
+    call_key: Optional[str] = None
+    detail = getattr(raw, "code_interpreter", None)
+    if detail is not None:
+        index = getattr(raw, "index", None)
+        call_id = getattr(raw, "id", None)
+        if index is not None:
+            call_key = str(index)
+        elif call_id:
+            call_key = str(call_id)
+        raw = detail
+    if type(raw).__name__ == "RunStepDeltaCodeInterpreterDetailItemObject":
+        return raw, call_key
+    return None, None
+
+
+async def _persist_thread_id(
+    conversation_id: str, thread: Any, previous_thread_id: Optional[str]
+) -> None:
+    """Record the service thread id so any worker can resume the thread.
+
+    Only a changed id is written: rewriting the id the turn started with
+    could undo a reset or compaction another worker made meanwhile.
+    """
+    service_thread_id = getattr(thread, "service_thread_id", None)
+    if not service_thread_id or service_thread_id == previous_thread_id:
+        return
+    try:
+        await asyncio.to_thread(
+            get_conversation_store().set_thread_id,
+            conversation_id,
+            service_thread_id,
+        )
+    except Exception as exc:  # noqa: BLE001
+        logger.warning(
+            "Failed to persist thread id - Conversation ID: %s, Error: %s",
+            conversation_id,
+            exc,
+        )
+
+
 def _process_chunk_content(
     chunk: Any,
-    code_blocks: List[Dict[str, Any]],
+    code_blocks: CodeBlockAssembler,
     images: List[Dict[str, Any]],
     token_counts: Dict[str, Optional[int]],
 ) -> None:
     """Process content from a single agent stream chunk.
 
-    Extracts code blocks, images, and token usage information.
+    Extracts code blocks, images, and token usage information. Code
+    fragments are accumulated per tool call so a streamed script becomes a
+    single block.
     """
+    run_key = getattr(chunk, "response_id", None) or "run"
+    ci_delta, ci_call = _code_interpreter_delta(chunk)
+    if ci_delta is not None:
+        ci_key = f"{run_key}:code_interpreter"
+        if ci_call is not None:
+            ci_key = f"{ci_key}:{ci_call}"
+        code_blocks.append(
+            ci_key,
+            getattr(ci_delta, "input", None) or "",
+            "CodeInterpreterInput",
+        )
+        if getattr(ci_delta, "outputs", None):
+            # Outputs mark the end of the cell; later input is a new cell
+            code_blocks.close(ci_key)
+
     if not hasattr(chunk, "contents") or not chunk.contents:
         return
 
@@ -122,11 +359,17 @@ def _process_chunk_content(
                 content, "text", None
             )
             if code_text:
-                code_blocks.append({"code": code_text, "type": ctype})
-                logger.info("Code block detected: %s", ctype)
-
-        # Handle image content
-        elif "Image" in ctype or "ImageFile" in ctype:
+                call_id = getattr(content, "call_id", None)
+                code_blocks.append(
+                    call_id or f"{run_key}:{ctype}", code_text, ctype
+                )
+                logger.debug(
+                    "Code fragment: %s (%d chars)", ctype, len(code_text)
+                )
+
+        # Handle image content (code-interpreter images arrive as
+        # HostedFileContent; non-image files are filtered when resolved)
+        elif "Image" in ctype or ctype == "HostedFileContent":
             image_file_id = getattr(content, "file_id", None)
             if image_file_id:
                 images.append({"file_id": image_file_id, "type": ctype})
@@ -203,9 +446,10 @@ async def _stream_agent_response(
     queue_informative(context, "Starting agent run...")
 
     start_time = time.time()
+    first_token_ms: Optional[float] = None
     chunk_count = 0
     run_id = None
-    code_blocks: List[Dict[str, Any]] = []
+    code_blocks = CodeBlockAssembler()
     images: List[Dict[str, Any]] = []
     token_counts: Dict[str, Optional[int]] = {
         "total_tokens": None,
@@ -213,26 +457,48 @@ async def _stream_agent_response(
         "completion_tokens": None,
     }
 
-    async for chunk in agent.run_stream(
-        user_content, thread=thread, **run_kwargs
-    ):
-        chunk_count += 1
-
-        if run_id is None and getattr(chunk, "response_id", None):
-            run_id = chunk.response_id
-            logger.info(
-                "Run started - ConvID:%s Thread:%s Run:%s",
-                conversation_id,
-                thread_id,
-                run_id,
-            )
-
-        _process_chunk_content(chunk, code_blocks, images, token_counts)
+    # First turns may be hedged with a second run on another fresh thread
+    hedger = get_run_hedger()
+    if hedger is not None and hedger.eligible(thread):
+        stream = hedger.run_stream(agent, user_content, thread, **run_kwargs)
+    else:
+        stream = agent.run_stream(user_content, thread=thread, **run_kwargs)
 
-        if getattr(chunk, "text", None):
-            queue_text(context, chunk.text)
+    recorder = stream_recorder(getattr(context.activity, "channel_id", None))
+    status = "error"
+    try:
+        async for chunk in stream:
+            chunk_count += 1
+            if recorder is not None:
+                recorder.record(chunk, _code_interpreter_delta(chunk)[0])
+
+            if run_id is None and getattr(chunk, "response_id", None):
+                run_id = chunk.response_id
+                logger.info(
+                    "Run started - ConvID:%s Thread:%s Run:%s",
+                    conversation_id,
+                    thread_id,
+                    run_id,
+                )
+
+            _process_chunk_content(chunk, code_blocks, images, token_counts)
+
+            if getattr(chunk, "text", None):
+                if first_token_ms is None:
+                    first_token_ms = (time.time() - start_time) * 1000
+                queue_text(context, chunk.text)
+        status = "ok"
+    finally:
+        if recorder is not None:
+            await recorder.save(status)
 
     response_time_ms = (time.time() - start_time) * 1000
+    winning_thread = getattr(stream, "thread", thread)
+    if winning_thread is not thread:
+        thread = winning_thread
+        conversation_threads[conversation_id] = thread
+    if len(code_blocks):
+        logger.info("Code blocks assembled: %d", len(code_blocks))
 
     # Update thread_id if service_thread_id is available
     if thread and hasattr(thread, "service_thread_id"):
@@ -251,14 +517,56 @@ async def _stream_agent_response(
 
     return {
         "run_id": run_id,
+        "thread": thread,
         "thread_id": thread_id,
         "response_time_ms": response_time_ms,
-        "code_blocks": code_blocks,
+        "first_token_ms": first_token_ms,
+        "chunks": chunk_count,
+        "code_blocks": code_blocks.blocks(),
         "images": images,
         **token_counts,
     }
 
 
+async def _resolve_inline_images(images: List[Dict[str, Any]]) -> None:
+    """Embed code-interpreter images in place of their file id placeholders.
+
+    Bounded by the resolver's per-turn concurrency cap and time budget; the
+    resolver creates its credential only when something has to be fetched.
+    """
+    if not ENABLE_INLINE_IMAGES or not images:
+        return
+    try:
+        resolved = await get_image_resolver().resolve(images)
+        logger.info("Inline images resolved: %d/%d", resolved, len(images))
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("Inline image resolution failed: %s", exc)
+
+
+def _content_card_activity(card_dict: Dict[str, Any], sender: Any) -> Activity:
+    """Wrap a response card as an AI-generated message with feedback."""
+    card_attachment = Attachment(
+        content_type="application/vnd.microsoft.card.adaptive",
+        content=card_dict["attachments"][0]["content"],
+    )
+    return Activity(
+        **{
+            "type": ActivityTypes.message,
+            "attachments": [card_attachment],
+            "entities": [
+                {
+                    "type": "https://schema.org/Message",
+                    "@type": "Message",
+                    "@context": "https://schema.org",
+                    "additionalType": ["AIGeneratedContent"],
+                }
+            ],
+            "channel_data": {"feedbackLoop": {"type": "custom"}},
+            **({"from": sender} if sender else {}),
+        }
+    )
+
+
 async def _send_content_card(
     context: TurnContext,
     code_blocks: List[Dict[str, Any]],
@@ -278,42 +586,23 @@ async def _send_content_card(
             "completion_tokens": run_metadata["completion_tokens"],
         }
 
-    # Text was already streamed, pass empty string
-    card_dict = build_response_adaptive_card(
-        "", metadata, code_blocks, images
-    )
+    await _resolve_inline_images(images)
+
+    # Text was already streamed, pass empty string. Large outputs are split
+    # into continuation cards so no single card exceeds the payload limit.
+    cards = build_response_adaptive_cards("", metadata, code_blocks, images)
+    if len(cards) > 1:
+        logger.info("Content split into %d cards", len(cards))
 
     # Try streaming finalize first
-    streamed = await finalize_stream_with_card(context, card_dict)
-    if streamed:
-        return
+    streamed = await finalize_stream_with_card(context, cards[0])
 
-    # Fallback to normal activity
-    card_attachment = Attachment(
-        content_type="application/vnd.microsoft.card.adaptive",
-        content=card_dict["attachments"][0]["content"],
-    )
+    # Fallback to normal activity (and send any continuation cards)
     sender = getattr(context.activity, "from_property", None) or getattr(
         context.activity, "recipient", None
     )
-    await context.send_activity(
-        Activity(
-            **{
-                "type": ActivityTypes.message,
-                "attachments": [card_attachment],
-                "entities": [
-                    {
-                        "type": "https://schema.org/Message",
-                        "@type": "Message",
-                        "@context": "https://schema.org",
-                        "additionalType": ["AIGeneratedContent"],
-                    }
-                ],
-                "channel_data": {"feedbackLoop": {"type": "custom"}},
-                **({"from": sender} if sender else {}),
-            }
-        )
-    )
+    for card_dict in cards[1:] if streamed else cards:
+        await context.send_activity(_content_card_activity(card_dict, sender))
 
 
 async def _send_metadata_card(
@@ -377,7 +666,19 @@ async def _send_metadata_card(
     )
 
 
-@AGENT_APP.activity("invoke")
+async def _send_drain_notice(context: TurnContext) -> None:
+    """Tell the user a cancelled turn was cut short and close its stream."""
+    sr = getattr(context, "streaming_response", None)
+    try:
+        if sr:
+            queue_text(context, f"\n\n_{DRAIN_NOTICE}_")
+            await sr.end_stream()
+        else:
+            await context.send_activity(DRAIN_NOTICE)
+    except Exception as exc:  # noqa: BLE001
+        logger.debug("Failed to send drain notice: %s", exc)
+
+
 async def invoke(
     context: TurnContext, state: TurnState
 ):  # noqa: ARG001
@@ -397,10 +698,47 @@ async def invoke(
         context.activity.type,
         context.activity.id,
     )
+    buffer = get_feedback_buffer()
+    if buffer is not None:
+        record = parse_feedback(context.activity)
+        if record is not None:
+            buffer.submit(record)
     await context.send_activity(invoke_response)
 
 
-@AGENT_APP.message(re.compile(r".+"))
+def _start_prewarm(context: TurnContext, source: str) -> None:
+    """Warm the conversation's agent ahead of its next message."""
+    prewarmer = get_prewarmer()
+    if prewarmer is None or TURN_DRAIN.draining:
+        return
+    monitor = get_loop_monitor()
+    if monitor is not None and monitor.overloaded:
+        return
+    conversation_id = getattr(context.activity.conversation, "id", None)
+    if not conversation_id or not _validate_configuration():
+        return
+    prewarmer.start(
+        conversation_id,
+        lambda: _warm_conversation(conversation_id),
+        _dispose_warm_agent,
+        source,
+    )
+
+
+async def on_members_added(
+    context: TurnContext, state: TurnState
+):  # noqa: ARG001
+    """Pre-warm when the bot is installed or a conversation is opened."""
+    _start_prewarm(context, "conversation_update")
+
+
+async def on_typing(
+    context: TurnContext, state: TurnState
+):  # noqa: ARG001
+    """Pre-warm while the user is typing."""
+    _start_prewarm(context, "typing")
+
+
 async def on_user_message(
     context: TurnContext, state: TurnState
 ):  # noqa: ARG001
@@ -413,6 +751,76 @@ async def on_user_message(
         )
         return
 
+    if TURN_DRAIN.draining:
+        logger.info("Refusing turn while draining")
+        await context.send_activity(DRAIN_REFUSAL)
+        return
+
+    # Defer new turns while the event loop is lagging; shed if it persists
+    monitor = get_loop_monitor()
+    if monitor is not None and not await monitor.admit(LOOP_LAG_DEFER_SECONDS):
+        logger.warning(
+            "Shedding turn: event loop lag %.0f ms", monitor.smoothed_lag_ms
+        )
+        await context.send_activity(
+            "The service is busy right now. Please try again in a moment."
+        )
+        return
+
+    async with TURN_DRAIN.track():
+        slot = None
+        reservation: Optional[TokenReservation] = None
+        handled = False
+        try:
+            # Wait for token budget before taking a scheduler slot, so a turn
+            # queued on the TPM limit does not hold up its tenant's others
+            conv_ctx = _extract_conversation_context(context)
+            if _runs_agent(conv_ctx["user_content"]):
+                admitted, reservation = await _reserve_token_budget(
+                    context, conv_ctx
+                )
+                if not admitted:
+                    return
+            # Queue behind other tenants' turns while every slot is taken
+            scheduler = get_tenant_scheduler()
+            if scheduler is not None:
+                slot = await scheduler.acquire(
+                    _tenant_id(context), on_wait=lambda: _notify_queued(context)
+                )
+                if slot is None:
+                    await context.send_activity(
+                        "The service is busy right now. "
+                        "Please try again in a moment."
+                    )
+                    return
+            handled = True
+            await _handle_user_message(context, reservation)
+        except asyncio.CancelledError:
+            if TURN_DRAIN.draining:
+                logger.warning(
+                    "Turn cancelled at drain deadline - Conversation ID: %s",
+                    getattr(context.activity.conversation, "id", "unknown"),
+                )
+                await _send_drain_notice(context)
+            raise
+        finally:
+            if reservation is not None and not handled:
+                reservation.release()
+            if slot is not None:
+                slot.release()
+
+
+async def _notify_queued(context: TurnContext) -> None:
+    queue_informative(context, "Waiting for capacity...")
+
+
+async def _handle_user_message(
+    context: TurnContext, reservation: Optional[TokenReservation] = None
+) -> None:
+    """Run one user turn: reset handling, agent run, response cards.
+
+    `reservation` holds the turn's token budget, reserved by the caller.
+    """
     try:
         # Extract conversation context
         conv_ctx = _extract_conversation_context(context)
@@ -439,6 +847,11 @@ async def on_user_message(
             )
             return
 
+        # Let a compaction from the previous turn rebind the thread first
+        compactor = get_thread_compactor()
+        if compactor is not None:
+            await compactor.wait(conversation_id)
+
         # Handle reset command
         if user_content.lower() in RESET_COMMAND_KEYWORDS:
             await _handle_reset_command(context, conversation_id)
@@ -448,8 +861,10 @@ async def on_user_message(
         agent, thread, thread_id = await _create_agent_and_thread(
             conversation_id
         )
+        started_thread_id = getattr(thread, "service_thread_id", None)
 
         # Stream agent response and collect metadata
+        run_started = time.time()
         try:
             run_metadata = await _stream_agent_response(
                 agent, user_content, thread, conversation_id, context
@@ -462,6 +877,7 @@ async def on_user_message(
                 json_error,
                 exc_info=True,
             )
+            _record_run(context, conversation_id, "timeout", None, run_started)
             await context.send_activity(
                 "The request timed out while waiting for the agent to "
                 "respond. This may be due to a long-running operation. "
@@ -469,18 +885,28 @@ async def on_user_message(
             )
             return
         except Exception as stream_error:  # noqa: BLE001
+            budget = get_token_budget()
+            if budget is not None and is_throttle_error(stream_error):
+                budget.record_throttle()
             logger.error(
                 "Error during agent run - Conversation ID: %s, Error: %s",
                 conversation_id,
                 stream_error,
                 exc_info=True,
             )
+            _record_run(context, conversation_id, "error", None, run_started)
             await context.send_activity(
                 "An error occurred while generating the response. "
                 "Please try again."
             )
             return
 
+        if reservation is not None:
+            reservation.settle(run_metadata["total_tokens"])
+        thread = run_metadata["thread"]
+        await _persist_thread_id(conversation_id, thread, started_thread_id)
+        _record_run(context, conversation_id, "ok", run_metadata)
+
         # Send appropriate response card(s)
         if run_metadata["code_blocks"] or run_metadata["images"]:
             # Send card with code/images
@@ -503,6 +929,15 @@ async def on_user_message(
                 except (RuntimeError, OSError, ValueError) as exc:
                     logger.debug("Failed to end stream (no metadata): %s", exc)
 
+        if compactor is not None:
+            reason = await compactor.observe(
+                conversation_id, run_metadata["thread_id"], run_metadata
+            )
+            if reason:
+                compactor.schedule(
+                    agent, conversation_id, thread, run_metadata, reason
+                )
+
     except Exception as exc:  # noqa: BLE001
         logger.error(
             "Unhandled error in on_user_message: %s", exc, exc_info=True
@@ -513,3 +948,20 @@ async def on_user_message(
             )
         except Exception:  # noqa: BLE001
             logger.debug("Failed to send error activity")
+
+
+def register_handlers(agent_app: AgentApplication) -> None:
+    """Attach the activity handlers to `agent_app`."""
+    agent_app.activity("invoke")(invoke)
+    agent_app.conversation_update("membersAdded")(on_members_added)
+    agent_app.activity("typing")(on_typing)
+    agent_app.message(re.compile(r".+"))(on_user_message)
+
+
+__all__ = [
+    "invoke",
+    "on_members_added",
+    "on_typing",
+    "on_user_message",
+    "register_handlers",
+]
@@ -0,0 +1,448 @@
+"""Resolve code-interpreter image file ids to inline (data URI) images.
+
+Image outputs from the code interpreter arrive as Foundry file ids. Cards
+can only show them if the bytes are fetched and embedded, so this module
+provides:
+
+  ImageCache     – content-addressed on-disk cache (size-bounded, LRU
+                   eviction) fronted by a small in-memory data-URI map.
+  ImageResolver  – fetches uncached file ids concurrently with a per-turn
+                   concurrency cap and time budget, authenticating with one
+                   lazily created credential it owns.
+
+Anything not resolved within the budget keeps its placeholder rendering.
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import aiohttp
+
+from ..agents import ensure_agent_sdk_loaded
+from ..app.lifecycle import register_closeable
+from ..app.config import (AZURE_AI_PROJECT_ENDPOINT,
+                          INLINE_IMAGE_CACHE_DIR, INLINE_IMAGE_CACHE_MAX_BYTES,
+                          INLINE_IMAGE_FILES_ENDPOINT,
+                          INLINE_IMAGE_MAX_BYTES,
+                          INLINE_IMAGE_MAX_CONCURRENCY,
+                          INLINE_IMAGE_TIME_BUDGET_SECONDS)
+from .cards import inline_image_max_bytes
+
+logger = logging.getLogger(__name__)
+
+FOUNDRY_TOKEN_SCOPE = "https://ai.azure.com/.default"
+FOUNDRY_FILES_API_VERSION = "2025-05-15-preview"
+
+CredentialFactory = Callable[[], Awaitable[Any]]
+
+# Tokens are refreshed this long before they expire
+_TOKEN_REFRESH_MARGIN_S = 300.0
+
+_MAGIC_MIME_TYPES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+
+def _sniff_image_mime(data: bytes, declared: Optional[str]) -> Optional[str]:
+    """Return an image MIME type for `data`, or None if it is not an image."""
+    if declared and declared.startswith("image/"):
+        return declared
+    for magic, mime in _MAGIC_MIME_TYPES:
+        if data.startswith(magic):
+            return mime
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def _to_data_uri(data: bytes, mime: str) -> str:
+    return f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+class ImageCache:
+    """Content-addressed image cache with size-based eviction.
+
+    Blobs are stored once per sha256 digest under ``blobs/``; ``refs/``
+    maps a (hashed) file id to ``"<digest> <mime>"``. The oldest blobs are
+    evicted once the total size exceeds ``max_bytes``. A bounded in-memory
+    map of ready-made data URIs makes repeated renders free.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        max_bytes: int,
+        *,
+        memory_entries: int = 128,
+    ) -> None:
+        self._blob_dir = directory / "blobs"
+        self._ref_dir = directory / "refs"
+        self._max_bytes = max_bytes
+        self._memory_entries = memory_entries
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._sizes: Optional[OrderedDict[str, int]] = None
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # -- in-memory layer -------------------------------------------------
+    def get_memory(self, file_id: str) -> Optional[str]:
+        with self._lock:
+            url = self._memory.get(file_id)
+            if url is not None:
+                self._memory.move_to_end(file_id)
+                self.hits += 1
+        return url
+
+    def _remember(self, file_id: str, url: str) -> None:
+        with self._lock:
+            self._memory[file_id] = url
+            self._memory.move_to_end(file_id)
+            while len(self._memory) > self._memory_entries:
+                self._memory.popitem(last=False)
+
+    # -- on-disk layer (blocking; call via asyncio.to_thread) ------------
+    def _load_index(self) -> OrderedDict[str, int]:
+        with self._lock:
+            if self._sizes is None:
+                self._scan()
+            assert self._sizes is not None
+            return self._sizes
+
+    def _scan(self) -> None:
+        self._blob_dir.mkdir(parents=True, exist_ok=True)
+        self._ref_dir.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for blob in self._blob_dir.iterdir():
+            if "." in blob.name:  # partial write left by a crash
+                continue
+            try:
+                stat = blob.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, blob.name, stat.st_size))
+        entries.sort()
+        self._sizes = OrderedDict((name, size) for _, name, size in entries)
+        self._total_bytes = sum(self._sizes.values())
+
+    def _ref_path(self, file_id: str) -> Path:
+        return self._ref_dir / hashlib.sha256(file_id.encode()).hexdigest()
+
+    def get(self, file_id: str) -> Optional[str]:
+        """Return the data URI for `file_id` from memory or disk."""
+        url = self.get_memory(file_id)
+        if url is not None:
+            return url
+        sizes = self._load_index()
+        try:
+            digest, mime = self._ref_path(file_id).read_text().split(" ", 1)
+            data = (self._blob_dir / digest).read_bytes()
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        with self._lock:
+            if digest in sizes:
+                sizes.move_to_end(digest)
+        try:
+            os.utime(self._blob_dir / digest)
+        except OSError:
+            pass
+        url = _to_data_uri(data, mime)
+        self._remember(file_id, url)
+        self.hits += 1
+        return url
+
+    def put(self, file_id: str, data: bytes, mime: str) -> str:
+        """Store image bytes for `file_id` and return its data URI."""
+        sizes = self._load_index()
+        digest = hashlib.sha256(data).hexdigest()
+        blob_path = self._blob_dir / digest
+        if digest not in sizes:
+            tmp_path = blob_path.with_suffix(".tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, blob_path)
+        self._ref_path(file_id).write_text(f"{digest} {mime}")
+        with self._lock:
+            if digest not in sizes:
+                sizes[digest] = len(data)
+                self._total_bytes += len(data)
+            sizes.move_to_end(digest)
+            evicted = self._evict(keep=digest)
+        for old in evicted:
+            try:
+                (self._blob_dir / old).unlink()
+            except OSError:
+                pass
+        url = _to_data_uri(data, mime)
+        self._remember(file_id, url)
+        return url
+
+    def _evict(self, *, keep: str) -> list[str]:
+        """Drop oldest blobs from the index; return digests to unlink.
+
+        Dangling refs are harmless: `get` treats a missing blob as a miss.
+        """
+        sizes = self._load_index()
+        evicted: list[str] = []
+        while self._total_bytes > self._max_bytes and len(sizes) > 1:
+            digest, size = next(iter(sizes.items()))
+            if digest == keep:
+                break
+            sizes.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            evicted.append(digest)
+        return evicted
+
+
+class ImageResolver:
+    """Fetch Foundry image files for a turn and attach inline data URIs."""
+
+    def __init__(
+        self,
+        *,
+        files_endpoint: str,
+        cache: ImageCache,
+        max_concurrency: int = 4,
+        time_budget_s: float = 5.0,
+        max_image_bytes: int = 100 * 1024,
+        api_version: str = FOUNDRY_FILES_API_VERSION,
+        credential_factory: Optional[CredentialFactory] = None,
+        token_scope: str = FOUNDRY_TOKEN_SCOPE,
+    ) -> None:
+        self._files_endpoint = files_endpoint.rstrip("/")
+        self._cache = cache
+        self._max_concurrency = max(1, max_concurrency)
+        self._time_budget_s = time_budget_s
+        self._max_image_bytes = max_image_bytes
+        self._api_version = api_version
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._credential_factory = credential_factory
+        self._token_scope = token_scope
+        self._credential: Optional[Any] = None
+        self._access_token: Optional[Any] = None
+        self._token_lock = asyncio.Lock()
+
+    @property
+    def cache(self) -> ImageCache:
+        return self._cache
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self._time_budget_s),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        credential, self._credential = self._credential, None
+        self._access_token = None
+        if credential is not None:
+            await credential.close()
+
+    async def _token(self) -> Optional[str]:
+        """Return a bearer token, creating the credential on first use.
+
+        The resolver owns the credential, so downloads shared between turns
+        never depend on the turn that started them.
+        """
+        if self._credential_factory is None:
+            return None
+        async with self._token_lock:
+            access_token = self._access_token
+            if (
+                access_token is None
+                or access_token.expires_on - time.time()
+                < _TOKEN_REFRESH_MARGIN_S
+            ):
+                if self._credential is None:
+                    self._credential = await self._credential_factory()
+                access_token = await self._credential.get_token(
+                    self._token_scope
+                )
+                self._access_token = access_token
+        return access_token.token
+
+    async def resolve(self, images: List[Dict[str, Any]]) -> int:
+        """Populate ``url`` on each image dict that can be resolved in time.
+
+        Returns the number of images that ended up with an inline URL.
+        """
+        if not images or not self._files_endpoint:
+            return 0
+
+        pending_ids: list[str] = []
+        for img in images:
+            file_id = img.get("file_id")
+            if not file_id or img.get("url"):
+                continue
+            url = self._cache.get_memory(file_id)
+            if url is not None:
+                img["url"] = url
+            elif file_id not in pending_ids:
+                pending_ids.append(file_id)
+
+        if pending_ids:
+            semaphore = asyncio.Semaphore(self._max_concurrency)
+            tasks = {
+                file_id: asyncio.ensure_future(
+                    self._fetch(file_id, semaphore)
+                )
+                for file_id in pending_ids
+            }
+            done, not_done = await asyncio.wait(
+                tasks.values(), timeout=self._time_budget_s
+            )
+            for task in not_done:
+                task.cancel()
+            if not_done:
+                logger.info(
+                    "Image resolution budget exhausted (%.1fs); %d of %d "
+                    "image(s) left as placeholders",
+                    self._time_budget_s,
+                    len(not_done),
+                    len(tasks),
+                )
+            resolved: Dict[str, str] = {}
+            for file_id, task in tasks.items():
+                if task in done and not task.cancelled() and task.exception() is None:
+                    url = task.result()
+                    if url:
+                        resolved[file_id] = url
+            for img in images:
+                url = resolved.get(img.get("file_id") or "")
+                if url and not img.get("url"):
+                    img["url"] = url
+
+        return sum(1 for img in images if img.get("url"))
+
+    async def _fetch(
+        self, file_id: str, semaphore: asyncio.Semaphore
+    ) -> Optional[str]:
+        """Wait for `file_id` while holding one of this turn's slots."""
+        async with semaphore:
+            return await asyncio.shield(self._single_flight(file_id))
+
+    def _single_flight(self, file_id: str) -> asyncio.Future:
+        """Share one download per file id across concurrent turns.
+
+        Callers await it shielded, so a turn running out of budget does not
+        abort a download another turn (or the next render) can still use.
+        """
+        future = self._inflight.get(file_id)
+        if future is None or future.done():
+            future = asyncio.ensure_future(self._load(file_id))
+            self._inflight[file_id] = future
+            future.add_done_callback(
+                lambda _f: self._inflight.pop(file_id, None)
+            )
+        return future
+
+    async def _load(self, file_id: str) -> Optional[str]:
+        url = await asyncio.to_thread(self._cache.get, file_id)
+        if url is not None:
+            return url
+        fetched = await self._download(file_id, await self._token())
+        if fetched is None:
+            return None
+        data, mime = fetched
+        return await asyncio.to_thread(self._cache.put, file_id, data, mime)
+
+    async def _download(
+        self, file_id: str, token: Optional[str]
+    ) -> Optional[tuple[bytes, str]]:
+        url = f"{self._files_endpoint}/files/{file_id}/content"
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        try:
+            async with self._get_session().get(
+                url, params={"api-version": self._api_version}, headers=headers
+            ) as resp:
+                if resp.status != 200:
+                    logger.warning(
+                        "Image fetch failed - file_id=%s status=%s",
+                        file_id,
+                        resp.status,
+                    )
+                    return None
+                if (resp.content_length or 0) > self._max_image_bytes:
+                    logger.info(
+                        "Image too large to inline - file_id=%s bytes=%s",
+                        file_id,
+                        resp.content_length,
+                    )
+                    return None
+                data = await resp.content.read(self._max_image_bytes + 1)
+                declared = resp.headers.get("Content-Type", "").split(";")[0]
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            logger.warning("Image fetch error - file_id=%s: %s", file_id, exc)
+            return None
+        if len(data) > self._max_image_bytes:
+            logger.info("Image too large to inline - file_id=%s", file_id)
+            return None
+        mime = _sniff_image_mime(data, declared.strip() or None)
+        if mime is None:
+            logger.info("File is not an image - file_id=%s", file_id)
+            return None
+        logger.info(
+            "Image fetched - file_id=%s bytes=%d mime=%s", file_id, len(data), mime
+        )
+        return data, mime
+
+
+_resolver: Optional[ImageResolver] = None
+
+
+async def _default_credential() -> Any:
+    await ensure_agent_sdk_loaded()
+    from azure.identity.aio import DefaultAzureCredential
+
+    return DefaultAzureCredential()
+
+
+def get_image_resolver() -> ImageResolver:
+    """Return the process-wide resolver built from configuration."""
+    global _resolver
+    if _resolver is None:
+        cache_dir = INLINE_IMAGE_CACHE_DIR or os.path.join(
+            tempfile.gettempdir(), "m365-agents-image-cache"
+        )
+        _resolver = ImageResolver(
+            files_endpoint=INLINE_IMAGE_FILES_ENDPOINT or AZURE_AI_PROJECT_ENDPOINT,
+            cache=ImageCache(Path(cache_dir), INLINE_IMAGE_CACHE_MAX_BYTES),
+            max_concurrency=INLINE_IMAGE_MAX_CONCURRENCY,
+            time_budget_s=INLINE_IMAGE_TIME_BUDGET_SECONDS,
+            # Images too large for a card would only become placeholders
+            max_image_bytes=min(
+                INLINE_IMAGE_MAX_BYTES, inline_image_max_bytes()
+            ),
+            credential_factory=_default_credential,
+        )
+        register_closeable(_resolver)
+    return _resolver
+
+
+__all__ = [
+    "FOUNDRY_TOKEN_SCOPE",
+    "ImageCache",
+    "ImageResolver",
+    "get_image_resolver",
+]
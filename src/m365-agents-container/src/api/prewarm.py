@@ -0,0 +1,205 @@
+"""Speculative pre-warming of a conversation's agent.
+
+A conversation's first message pays for credential and agent resolution
+before the run starts. `conversationUpdate` (members added) and `typing`
+activities usually arrive shortly before a message, so their handlers
+start that work in the background and the message handler takes the
+result, awaiting a warm-up still in flight instead of starting another.
+
+Limits keep the activities from being used to create work: one warm-up
+per conversation, a cap on concurrent warm-ups and on results held, and a
+cooldown for conversations whose warm result expired unused.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+WarmFn = Callable[[], Awaitable[Any]]
+DisposeFn = Callable[[Any], Awaitable[None]]
+
+
+@dataclass
+class _Entry:
+    task: asyncio.Task
+    dispose: DisposeFn
+    source: str
+    expiry: Optional[asyncio.TimerHandle] = None
+
+
+class Prewarmer:
+    """Start, hand over and expire per-conversation warm-ups."""
+
+    def __init__(
+        self,
+        *,
+        ttl_s: float = 60.0,
+        cooldown_s: float = 300.0,
+        max_in_flight: int = 8,
+        max_entries: int = 256,
+    ) -> None:
+        self.ttl_s = ttl_s
+        self.cooldown_s = cooldown_s
+        self.max_in_flight = max_in_flight
+        self.max_entries = max_entries
+        self.started = 0
+        self.skipped = 0
+        self.hits = 0
+        self.joined = 0
+        self.misses = 0
+        self.expired = 0
+        self.failed = 0
+        self.started_by: Dict[str, int] = {}
+        self._entries: Dict[str, _Entry] = {}
+        self._cooldown: Dict[str, float] = {}
+        self._disposing: Set[asyncio.Task] = set()
+
+    @property
+    def in_flight(self) -> int:
+        return sum(1 for e in self._entries.values() if not e.task.done())
+
+    def _cooling(self, conversation_id: str) -> bool:
+        until = self._cooldown.get(conversation_id)
+        if until is None:
+            return False
+        if until > time.monotonic():
+            return True
+        del self._cooldown[conversation_id]
+        return False
+
+    def start(
+        self,
+        conversation_id: str,
+        warm: WarmFn,
+        dispose: DisposeFn,
+        source: str,
+    ) -> bool:
+        """Start warming `conversation_id`; False if a limit applies."""
+        if (
+            conversation_id in self._entries
+            or self._cooling(conversation_id)
+            or len(self._entries) >= self.max_entries
+            or self.in_flight >= self.max_in_flight
+        ):
+            self.skipped += 1
+            return False
+        entry = _Entry(asyncio.ensure_future(warm()), dispose, source)
+        self._entries[conversation_id] = entry
+        self.started += 1
+        self.started_by[source] = self.started_by.get(source, 0) + 1
+        entry.task.add_done_callback(
+            lambda task: self._warmed(conversation_id, entry, task)
+        )
+        logger.debug(
+            "Pre-warming conversation %s (%s)", conversation_id, source
+        )
+        return True
+
+    def _warmed(
+        self, conversation_id: str, entry: _Entry, task: asyncio.Task
+    ) -> None:
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None:
+            self.failed += 1
+            if self._entries.get(conversation_id) is entry:
+                del self._entries[conversation_id]
+            logger.warning(
+                "Pre-warm failed - Conversation ID: %s, Error: %s",
+                conversation_id,
+                exc,
+            )
+            return
+        if self._entries.get(conversation_id) is entry:
+            entry.expiry = asyncio.get_running_loop().call_later(
+                self.ttl_s, self._expire, conversation_id, entry
+            )
+
+    def _expire(self, conversation_id: str, entry: _Entry) -> None:
+        if self._entries.get(conversation_id) is not entry:
+            return
+        del self._entries[conversation_id]
+        self.expired += 1
+        self._cooldown[conversation_id] = time.monotonic() + self.cooldown_s
+        if len(self._cooldown) > self.max_entries * 4:
+            now = time.monotonic()
+            for key in [k for k, v in self._cooldown.items() if v <= now]:
+                del self._cooldown[key]
+        self._dispose(entry)
+
+    def _dispose(self, entry: _Entry) -> None:
+        task = asyncio.ensure_future(entry.dispose(entry.task.result()))
+        self._disposing.add(task)
+        task.add_done_callback(self._disposing.discard)
+
+    async def take(self, conversation_id: str) -> Optional[Any]:
+        """The conversation's warm result, awaiting one in flight."""
+        entry = self._entries.pop(conversation_id, None)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expiry is not None:
+            entry.expiry.cancel()
+        if entry.task.done():
+            self.hits += 1
+        else:
+            self.joined += 1
+        try:
+            return await entry.task
+        except Exception:  # noqa: BLE001 - logged by _warmed
+            return None
+
+    async def close(self) -> None:
+        """Cancel warm-ups in flight and dispose unused results."""
+        entries = list(self._entries.values())
+        self._entries.clear()
+        for entry in entries:
+            if entry.expiry is not None:
+                entry.expiry.cancel()
+            if not entry.task.done():
+                entry.task.cancel()
+            elif entry.task.exception() is None:
+                self._dispose(entry)
+        if self._disposing:
+            await asyncio.gather(*self._disposing, return_exceptions=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        used = self.hits + self.joined
+        return {
+            "started": self.started,
+            "started_by": dict(self.started_by),
+            "skipped": self.skipped,
+            "hits": self.hits,
+            "joined": self.joined,
+            "misses": self.misses,
+            "expired": self.expired,
+            "failed": self.failed,
+            "hit_rate": (
+                round(used / (used + self.misses), 3)
+                if used + self.misses else None
+            ),
+            "in_flight": self.in_flight,
+            "held": len(self._entries),
+        }
+
+
+_prewarmer: Optional[Prewarmer] = None
+
+
+def get_prewarmer() -> Optional[Prewarmer]:
+    return _prewarmer
+
+
+def configure_prewarmer(prewarmer: Optional[Prewarmer]) -> None:
+    """Install `prewarmer` (None turns pre-warming off)."""
+    global _prewarmer
+    _prewarmer = prewarmer
+
+
+__all__ = ["Prewarmer", "configure_prewarmer", "get_prewarmer"]
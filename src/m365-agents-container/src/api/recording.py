@@ -0,0 +1,172 @@
+"""Opt-in recording of agent streams for offline replay.
+
+When ``STREAM_RECORD_DIR`` is set, `_stream_agent_response` feeds every
+chunk from ``agent.run_stream`` to a `StreamRecorder`, which keeps the
+chunk's content types, payloads and the time since the previous chunk.
+At the end of the turn the recording is written off the event loop as one
+gzipped JSONL file: a header line followed by one line per chunk.
+
+With redaction on, text, code and log payloads are replaced by filler of
+the same length and whitespace layout, so replays keep realistic sizes and
+code-block shapes without user content. ``perf.replay`` turns recordings
+back into agent framework updates.
+"""
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import logging
+import random
+import re
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ..app.config import (STREAM_RECORD_DIR, STREAM_RECORD_REDACT,
+                          STREAM_RECORD_SAMPLE_RATE)
+
+logger = logging.getLogger(__name__)
+
+RECORDING_VERSION = 1
+RECORDING_SUFFIX = ".jsonl.gz"
+
+_NON_SPACE = re.compile(r"\S")
+
+
+def redact(text: str) -> str:
+    """Replace every non-whitespace character with ``x``."""
+    return _NON_SPACE.sub("x", text)
+
+
+class StreamRecorder:
+    """Collects one turn's stream and writes it to `directory`."""
+
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        redact_payloads: bool = True,
+        channel: Optional[str] = None,
+    ) -> None:
+        self.directory = directory
+        self.redact_payloads = redact_payloads
+        self.channel = channel
+        self.events: List[Dict[str, Any]] = []
+        self.run_id: Optional[str] = None
+        self._started = time.perf_counter()
+        self._last = self._started
+
+    def _payload(self, text: Optional[str]) -> Optional[str]:
+        if text and self.redact_payloads:
+            return redact(text)
+        return text
+
+    def record(self, chunk: Any, ci_delta: Any = None) -> None:
+        """Append `chunk` (and its code-interpreter delta, if any)."""
+        now = time.perf_counter()
+        event: Dict[str, Any] = {
+            "kind": "chunk",
+            "dt_ms": round((now - self._last) * 1000, 2),
+        }
+        self._last = now
+        if self.run_id is None:
+            self.run_id = getattr(chunk, "response_id", None)
+
+        contents = []
+        for content in getattr(chunk, "contents", None) or []:
+            ctype = type(content).__name__
+            if ctype == "TextContent":
+                contents.append({
+                    "type": "text",
+                    "text": self._payload(getattr(content, "text", "")),
+                })
+            elif ctype == "UsageContent":
+                details = getattr(content, "details", None)
+                contents.append({
+                    "type": "usage",
+                    "input": getattr(details, "input_token_count", None),
+                    "output": getattr(details, "output_token_count", None),
+                    "total": getattr(details, "total_token_count", None),
+                })
+            elif ctype == "HostedFileContent" or "Image" in ctype:
+                contents.append({
+                    "type": "file",
+                    "file_id": getattr(content, "file_id", None),
+                })
+            else:
+                # Unknown content is kept by type so replays show the gap
+                contents.append({"type": ctype})
+        if contents:
+            event["contents"] = contents
+
+        if ci_delta is not None:
+            code: Dict[str, Any] = {}
+            if getattr(ci_delta, "input", None):
+                code["input"] = self._payload(ci_delta.input)
+            outputs = getattr(ci_delta, "outputs", None)
+            if outputs:
+                code["logs"] = [
+                    self._payload(getattr(output, "logs", None) or "")
+                    for output in outputs
+                ]
+            event["code_interpreter"] = code
+        self.events.append(event)
+
+    def _write(self, status: str) -> Path:
+        header = {
+            "kind": "header",
+            "version": RECORDING_VERSION,
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "run_id": self.run_id,
+            "channel": self.channel,
+            "redacted": self.redact_payloads,
+            "status": status,
+            "chunks": len(self.events),
+            "duration_ms": round((self._last - self._started) * 1000, 1),
+        }
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        path = self.directory / (
+            f"{stamp}_{uuid.uuid4().hex[:8]}{RECORDING_SUFFIX}"
+        )
+        with gzip.open(path, "wt", encoding="utf-8") as fh:
+            for line in [header, *self.events]:
+                fh.write(json.dumps(line, separators=(",", ":")) + "\n")
+        return path
+
+    async def save(self, status: str = "ok") -> Optional[Path]:
+        """Write the recording; failures are logged, never raised."""
+        try:
+            path = await asyncio.to_thread(self._write, status)
+        except (OSError, TypeError, ValueError) as exc:
+            logger.warning("Failed to write stream recording: %s", exc)
+            return None
+        logger.debug(
+            "Stream recorded: %s (%d chunks)", path, len(self.events)
+        )
+        return path
+
+
+def stream_recorder(channel: Optional[str] = None) -> Optional[StreamRecorder]:
+    """Return a recorder for this turn, or None when recording is off."""
+    if not STREAM_RECORD_DIR or STREAM_RECORD_SAMPLE_RATE <= 0:
+        return None
+    if random.random() >= STREAM_RECORD_SAMPLE_RATE:
+        return None
+    return StreamRecorder(
+        Path(STREAM_RECORD_DIR),
+        redact_payloads=STREAM_RECORD_REDACT,
+        channel=channel,
+    )
+
+
+__all__ = [
+    "RECORDING_SUFFIX",
+    "RECORDING_VERSION",
+    "StreamRecorder",
+    "redact",
+    "stream_recorder",
+]
@@ -0,0 +1,247 @@
+"""Structured per-turn run records for offline latency and token analysis.
+
+Every agent turn produces one compact record (run and thread ids,
+outcome, response time, time to first token, chunk and token counts). The
+handler submits it to a `RunRecordWriter`, a bounded batched writer (see
+``app.batch_writer``), so analytics never adds latency to the turn.
+
+Sinks:
+
+* `JsonlRunRecordSink`: one JSON object per line, rotated by size
+  (``path`` may contain ``{pid}`` to give each worker its own file);
+* `SqliteRunRecordSink`: a ``run_records`` table, shareable by workers;
+* `OtlpRunRecordSink`: OpenTelemetry log records through the configured
+  logger provider (needs ``opentelemetry-api`` and an exporter, e.g. from
+  ``setup_observability``).
+
+``python -m perf.run_stats`` computes percentiles from JSONL or SQLite
+records.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from ..app.batch_writer import BatchSink, BatchWriter
+
+logger = logging.getLogger(__name__)
+
+RUN_RECORD_VERSION = 1
+RUN_RECORD_FIELDS = (
+    "ts", "conversation_id", "channel", "tenant_id", "status", "run_id",
+    "thread_id", "response_time_ms", "first_token_ms", "chunks",
+    "prompt_tokens", "completion_tokens", "total_tokens", "code_blocks",
+    "images",
+)
+
+
+def build_run_record(
+    *,
+    conversation_id: str,
+    channel: Optional[str],
+    tenant_id: Optional[str],
+    status: str,
+    run_metadata: Optional[Dict[str, Any]] = None,
+    response_time_ms: Optional[float] = None,
+) -> Dict[str, Any]:
+    """One turn's record; failed turns carry only what is known."""
+    meta = run_metadata or {}
+    elapsed = meta.get("response_time_ms", response_time_ms)
+    first_token = meta.get("first_token_ms")
+    return {
+        "v": RUN_RECORD_VERSION,
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "conversation_id": conversation_id,
+        "channel": channel,
+        "tenant_id": tenant_id,
+        "status": status,
+        "run_id": meta.get("run_id"),
+        "thread_id": meta.get("thread_id"),
+        "response_time_ms": round(elapsed, 1) if elapsed is not None else None,
+        "first_token_ms": (
+            round(first_token, 1) if first_token is not None else None
+        ),
+        "chunks": meta.get("chunks"),
+        "prompt_tokens": meta.get("prompt_tokens"),
+        "completion_tokens": meta.get("completion_tokens"),
+        "total_tokens": meta.get("total_tokens"),
+        "code_blocks": len(meta.get("code_blocks") or []),
+        "images": len(meta.get("images") or []),
+    }
+
+
+class JsonlRunRecordSink:
+    """Appends JSON lines to `path`, rotating at `max_bytes`.
+
+    Rotated files are ``path.1`` (newest) to ``path.<backups>``.
+    """
+
+    def __init__(
+        self, path: str, *, max_bytes: int = 50_000_000, backups: int = 5
+    ) -> None:
+        self._template = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+    @property
+    def path(self) -> str:
+        return self._template.replace("{pid}", str(os.getpid()))
+
+    def _rotate(self, path: str) -> None:
+        if self.backups <= 0:
+            os.remove(path)
+            return
+        for n in range(self.backups - 1, 0, -1):
+            older = f"{path}.{n}"
+            if os.path.exists(older):
+                os.replace(older, f"{path}.{n + 1}")
+        os.replace(path, f"{path}.1")
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        path = self.path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.max_bytes > 0:
+            try:
+                if os.path.getsize(path) >= self.max_bytes:
+                    self._rotate(path)
+            except FileNotFoundError:
+                pass
+        data = "".join(
+            json.dumps(record, separators=(",", ":")) + "\n"
+            for record in records
+        )
+        with open(path, "a", encoding="utf-8") as fh:
+            fh.write(data)
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteRunRecordSink:
+    """Inserts records into a ``run_records`` table (WAL mode)."""
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        columns = ", ".join(RUN_RECORD_FIELDS)
+        with self._connect() as conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS run_records ({columns})"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS run_records_ts ON run_records (ts)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(
+                self._path, timeout=5.0, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        placeholders = ", ".join("?" for _ in RUN_RECORD_FIELDS)
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                f"INSERT INTO run_records ({', '.join(RUN_RECORD_FIELDS)}) "
+                f"VALUES ({placeholders})",
+                [tuple(r.get(f) for f in RUN_RECORD_FIELDS) for r in records],
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+class OtlpRunRecordSink:
+    """Emits each record as an OpenTelemetry log record."""
+
+    EVENT_NAME = "agent.run"
+
+    def __init__(self) -> None:
+        from opentelemetry import _logs  # optional dependency
+
+        self._logs = _logs
+        self._logger = _logs.get_logger(__name__)
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        for record in records:
+            present = {k: v for k, v in record.items() if v is not None}
+            self._logger.emit(
+                body=present,
+                attributes={f"run.{k}": v for k, v in present.items()},
+                event_name=self.EVENT_NAME,
+                severity_number=self._logs.SeverityNumber.INFO,
+            )
+
+    def close(self) -> None:
+        pass
+
+
+def create_run_record_sink(
+    backend: str, path: str, *, max_bytes: int = 50_000_000, backups: int = 5
+) -> Optional[BatchSink]:
+    """Create a sink for `backend` ("none", "jsonl", "sqlite" or "otlp")."""
+    backend = (backend or "none").lower()
+    if backend == "none":
+        return None
+    if backend == "jsonl":
+        return JsonlRunRecordSink(path, max_bytes=max_bytes, backups=backups)
+    if backend == "sqlite":
+        return SqliteRunRecordSink(path)
+    if backend == "otlp":
+        try:
+            return OtlpRunRecordSink()
+        except ImportError as exc:
+            raise ValueError(
+                "RUN_RECORD_BACKEND=otlp needs opentelemetry-api"
+            ) from exc
+    raise ValueError(f"Unknown run record backend: {backend}")
+
+
+class RunRecordWriter(BatchWriter):
+    """Bounded queue of run records flushed to a sink in batches."""
+
+    def __init__(self, sink: BatchSink, **kwargs: Any) -> None:
+        super().__init__(sink, name="run", **kwargs)
+
+
+_writer: Optional[RunRecordWriter] = None
+
+
+def get_run_record_writer() -> Optional[RunRecordWriter]:
+    return _writer
+
+
+def configure_run_record_writer(writer: Optional[RunRecordWriter]) -> None:
+    """Install `writer` (None turns run records off)."""
+    global _writer
+    _writer = writer
+
+
+__all__ = [
+    "JsonlRunRecordSink",
+    "OtlpRunRecordSink",
+    "RUN_RECORD_FIELDS",
+    "RunRecordWriter",
+    "SqliteRunRecordSink",
+    "build_run_record",
+    "configure_run_record_writer",
+    "create_run_record_sink",
+    "get_run_record_writer",
+]
@@ -13,17 +13,68 @@ swallowed (debug logged) because streaming clients may disconnect.
 """
 from __future__ import annotations
 
+import asyncio
 import logging
+import weakref
+from typing import Any, Optional
 
 from microsoft_agents.hosting.core import TurnContext
 
 logger = logging.getLogger(__name__)
 
+class _InformativeGate:
+    """Hand a streaming response at most one informative update at a time.
+
+    While the stream is still sending (slow or throttled), later statuses
+    wait here and only the newest is queued once the stream has caught up,
+    so an obsolete status is never replayed after the fact.
+    """
+
+    def __init__(self, sr: Any) -> None:
+        self._sr = sr
+        self._pending: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def queue(self, message: str) -> None:
+        if self._task is None or self._task.done():
+            # Stream is idle: queue at once, keeping order with text chunks
+            self._sr.queue_informative_update(message)
+            self._task = asyncio.ensure_future(self._send_pending())
+        else:
+            if self._pending is not None:
+                logger.debug("Replaced an obsolete informative update")
+            self._pending = message
+
+    async def _send_pending(self) -> None:
+        while True:
+            try:
+                await self._sr.wait_for_queue()
+            except Exception as exc:  # noqa: BLE001 - the stream reports it
+                logger.debug("Informative update not sent: %s", exc)
+            message, self._pending = self._pending, None
+            if message is None:
+                return
+            try:
+                self._sr.queue_informative_update(message)
+            except (RuntimeError, OSError, ValueError) as exc:
+                logger.debug(
+                    "Failed queue_informative '%s' (closed?): %s",
+                    message,
+                    exc,
+                )
+                return
+
+
+_informative_gates: "weakref.WeakKeyDictionary[Any, _InformativeGate]" = (
+    weakref.WeakKeyDictionary()
+)
+
 
 def queue_informative(context: TurnContext, message: str) -> None:
     """Queue an informative/status update (pass-through).
 
-    Mirrors C# `QueueInformativeUpdateAsync`. Non-fatal on failure.
+    Mirrors C# `QueueInformativeUpdateAsync`. Non-fatal on failure. While
+    the stream is still sending, only the newest update is kept for it.
     """
     sr = getattr(context, "streaming_response", None)
     if not sr:
@@ -32,7 +83,10 @@ def queue_informative(context: TurnContext, message: str) -> None:
     if not message:
         return
     try:
-        sr.queue_informative_update(message)
+        gate = _informative_gates.get(sr)
+        if gate is None:
+            gate = _informative_gates[sr] = _InformativeGate(sr)
+        gate.queue(message)
         logger.debug("Queued informative: %s", message)
     except (RuntimeError, OSError, ValueError) as exc:
         logger.debug(
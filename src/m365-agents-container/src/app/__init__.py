@@ -7,6 +7,7 @@ Submodules:
   config      – Environment + hosting object initialization.
   logging     – Root logging configuration helper.
   server      – HTTP server (aiohttp) setup and start.
+  lifecycle   – In-flight turn tracking and graceful drain on shutdown.
   bootstrap   – Public main() entry point used by the CLI script.
 """
 from .bootstrap import main  # re-export for convenience
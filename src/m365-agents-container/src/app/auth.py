@@ -0,0 +1,278 @@
+"""Cached bearer-token validation for ``/api/messages``.
+
+The Agents SDK middleware validates every request's token from scratch and
+builds a new JWKS client each time, so each POST fetches the signing keys
+synchronously on the event loop. Channels reuse a token for many requests
+within its lifetime, so here:
+
+* `JwksCache` keeps signing keys per JWKS URI, fetched with aiohttp and
+  refreshed in the background. A token with an unknown key id triggers one
+  refresh shared by every waiting request (single flight), at most once
+  per ``min_refresh_interval_s`` per URI;
+* `CachedTokenValidator` performs the SDK's checks (RS256 signature, expiry
+  with leeway, audience = client id) and caches the resulting claims under
+  the token's SHA-256 digest until the token's ``exp``.
+
+Invalid tokens are never cached and are rejected with 401, as in the SDK.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+import jwt
+from aiohttp import web
+from aiohttp.web import Request, json_response
+from microsoft_agents.hosting.core import AgentAuthConfiguration
+from microsoft_agents.hosting.core.authorization import ClaimsIdentity
+
+logger = logging.getLogger(__name__)
+
+BOT_FRAMEWORK_ISSUER = "https://api.botframework.com"
+BOT_FRAMEWORK_JWKS_URI = "https://login.botframework.com/v1/.well-known/keys"
+ENTRA_JWKS_URI = (
+    "https://login.microsoftonline.com/{tenant}/discovery/v2.0/keys"
+)
+
+
+class JwksCache:
+    """Signing keys per JWKS URI, refreshed in the background."""
+
+    def __init__(
+        self,
+        *,
+        refresh_interval_s: float = 3600.0,
+        min_refresh_interval_s: float = 30.0,
+        timeout_s: float = 10.0,
+    ) -> None:
+        self.refresh_interval_s = refresh_interval_s
+        self.min_refresh_interval_s = min_refresh_interval_s
+        self.timeout_s = timeout_s
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self._keys: Dict[str, Dict[str, jwt.PyJWK]] = {}
+        self._fetched: Dict[str, float] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout_s),
+            )
+        return self._session
+
+    async def get_key(self, uri: str, kid: Optional[str]) -> jwt.PyJWK:
+        """The key `kid` from `uri`; ValueError if it is not published."""
+        key = self._keys.get(uri, {}).get(kid or "")
+        if key is not None:
+            self.hits += 1
+            return key
+        self.misses += 1
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+        fetched = self._fetched.get(uri)
+        if (
+            fetched is None
+            or time.monotonic() - fetched >= self.min_refresh_interval_s
+        ):
+            await self._refresh(uri)
+        key = self._keys.get(uri, {}).get(kid or "")
+        if key is None:
+            raise ValueError(f"Unknown signing key: {kid}")
+        return key
+
+    def _refresh(self, uri: str) -> asyncio.Future:
+        """Fetch `uri`, sharing a fetch already in flight."""
+        future = self._inflight.get(uri)
+        if future is None or future.done():
+            future = asyncio.ensure_future(self._fetch(uri))
+            self._inflight[uri] = future
+            future.add_done_callback(lambda _f: self._inflight.pop(uri, None))
+        # Shielded so a cancelled request does not abort a shared fetch
+        return asyncio.shield(future)
+
+    async def _fetch(self, uri: str) -> None:
+        # Set first so a failing endpoint is retried at most once per interval
+        self._fetched[uri] = time.monotonic()
+        self.refreshes += 1
+        try:
+            async with self._get_session().get(uri) as resp:
+                resp.raise_for_status()
+                data = await resp.json(content_type=None)
+            keys = {
+                key.key_id: key
+                for key in jwt.PyJWKSet.from_dict(data).keys
+                if key.key_id
+            }
+        except (
+            aiohttp.ClientError,
+            asyncio.TimeoutError,
+            ValueError,
+            jwt.PyJWTError,
+        ) as exc:
+            self.refresh_failures += 1
+            logger.warning("Failed to fetch signing keys from %s: %s", uri, exc)
+            return
+        self._keys[uri] = keys
+        logger.debug("Fetched %d signing key(s) from %s", len(keys), uri)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval_s)
+            await asyncio.gather(
+                *(self._refresh(uri) for uri in list(self._keys)),
+                return_exceptions=True,
+            )
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "uris": len(self._keys),
+            "keys": sum(len(keys) for keys in self._keys.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+        }
+
+
+class CachedTokenValidator:
+    """Validate bearer tokens, caching claims until each token expires."""
+
+    def __init__(
+        self,
+        configuration: AgentAuthConfiguration,
+        jwks: JwksCache,
+        *,
+        max_entries: int = 10_000,
+        leeway_s: float = 300.0,
+        jwks_uri: str = "",
+    ) -> None:
+        self.configuration = configuration
+        self.jwks = jwks
+        self.max_entries = max_entries
+        self.leeway_s = leeway_s
+        self.jwks_uri = jwks_uri
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        # token digest -> (claims, expires at, epoch seconds)
+        self._cache: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = (
+            OrderedDict()
+        )
+
+    def _uri(self, issuer: Optional[str]) -> str:
+        if self.jwks_uri:
+            return self.jwks_uri
+        if issuer == BOT_FRAMEWORK_ISSUER:
+            return BOT_FRAMEWORK_JWKS_URI
+        return ENTRA_JWKS_URI.format(tenant=self.configuration.TENANT_ID)
+
+    async def _decode(self, token: str) -> Dict[str, Any]:
+        try:
+            header = jwt.get_unverified_header(token)
+            unverified = jwt.decode(token, options={"verify_signature": False})
+            key = await self.jwks.get_key(
+                self._uri(unverified.get("iss")), header.get("kid")
+            )
+            claims = jwt.decode(
+                token,
+                key=key,
+                algorithms=["RS256"],
+                leeway=self.leeway_s,
+                options={"verify_aud": False},
+            )
+        except jwt.PyJWTError as exc:
+            raise ValueError(str(exc)) from exc
+        if claims.get("aud") != self.configuration.CLIENT_ID:
+            raise ValueError("Invalid audience.")
+        return claims
+
+    async def validate(self, token: str) -> ClaimsIdentity:
+        """Claims for `token`; ValueError if it is not valid."""
+        digest = hashlib.sha256(token.encode()).hexdigest()
+        now = time.time()
+        cached = self._cache.get(digest)
+        if cached is not None:
+            if cached[1] > now:
+                self.hits += 1
+                self._cache.move_to_end(digest)
+                return ClaimsIdentity(dict(cached[0]), True)
+            del self._cache[digest]
+        self.misses += 1
+        try:
+            claims = await self._decode(token)
+        except ValueError:
+            self.rejected += 1
+            raise
+        expires = claims.get("exp")
+        if isinstance(expires, (int, float)) and expires > now:
+            self._cache[digest] = (claims, float(expires))
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return ClaimsIdentity(dict(claims), True)
+
+    async def close(self) -> None:
+        await self.jwks.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "cached": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "rejected": self.rejected,
+            "jwks": self.jwks.snapshot(),
+        }
+
+
+def cached_jwt_authorization_middleware(validator: CachedTokenValidator):
+    """Drop-in for the SDK's ``jwt_authorization_middleware``."""
+
+    @web.middleware
+    async def _middleware(request: Request, handler):  # type: ignore[override]
+        auth_config: AgentAuthConfiguration = request.app["agent_configuration"]
+        auth_header = request.headers.get("Authorization")
+        if auth_header:
+            token = auth_header.partition(" ")[2].strip()
+            try:
+                request["claims_identity"] = await validator.validate(token)
+            except ValueError as exc:
+                logger.info("JWT validation error: %s", exc)
+                return json_response({"error": str(exc)}, status=401)
+        elif not auth_config or not auth_config.CLIENT_ID:
+            request["claims_identity"] = ClaimsIdentity(
+                {}, False, authentication_type="Anonymous"
+            )
+        else:
+            return json_response(
+                {"error": "Authorization header not found"}, status=401
+            )
+        return await handler(request)
+
+    return _middleware
+
+
+__all__ = [
+    "CachedTokenValidator",
+    "JwksCache",
+    "cached_jwt_authorization_middleware",
+]
@@ -0,0 +1,131 @@
+"""Bounded, batched background writer for analytics records.
+
+Request handlers call `BatchWriter.submit`, which only appends to an
+in-memory queue: when the queue is full new records are dropped (and
+counted) rather than slowing the turn down. A background task, started on
+the first submit, writes pending records to a `BatchSink` in a worker
+thread once ``batch_size`` records are pending or ``flush_interval_s`` has
+passed. A failed write puts the batch back for the next flush. `close`
+(registered for shutdown) flushes what is left and closes the sink.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Protocol
+
+logger = logging.getLogger(__name__)
+
+
+class BatchSink(Protocol):
+    def write(self, records: List[Dict[str, Any]]) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class BatchWriter:
+    """Bounded queue of records flushed to a `BatchSink` in batches."""
+
+    def __init__(
+        self,
+        sink: BatchSink,
+        *,
+        name: str = "record",
+        max_pending: int = 10_000,
+        batch_size: int = 100,
+        flush_interval_s: float = 5.0,
+    ) -> None:
+        self.sink = sink
+        self.name = name
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.received = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.flushed = 0
+        self.write_failures = 0
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._closed = False
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """Queue `record`; False (and counted) if the buffer is full."""
+        self.received += 1
+        if self._closed or len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return False
+        self._pending.append(record)
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._wake.wait(), self.flush_interval_s
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write everything pending, one batch at a time."""
+        async with self._lock:
+            while self._pending:
+                count = min(self.batch_size, len(self._pending))
+                batch = [self._pending.popleft() for _ in range(count)]
+                try:
+                    await asyncio.to_thread(self.sink.write, batch)
+                except Exception as exc:  # noqa: BLE001
+                    self.write_failures += 1
+                    # Put the batch back (as far as it fits) and retry on
+                    # the next flush
+                    room = self.max_pending - len(self._pending)
+                    self.dropped += max(0, len(batch) - room)
+                    self._pending.extendleft(reversed(batch[:room]))
+                    logger.warning(
+                        "Failed to write %d %s record(s): %s",
+                        len(batch),
+                        self.name,
+                        exc,
+                    )
+                    return
+                self.flushes += 1
+                self.flushed += len(batch)
+
+    async def close(self) -> None:
+        """Stop the flusher, write what is pending and close the sink."""
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        await self.flush()
+        if self._pending:
+            logger.warning(
+                "Discarding %d unwritten %s record(s) at shutdown",
+                len(self._pending),
+                self.name,
+            )
+        await asyncio.to_thread(self.sink.close)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "sink": type(self.sink).__name__,
+            "received": self.received,
+            "pending": len(self._pending),
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "flushed": self.flushed,
+            "write_failures": self.write_failures,
+        }
+
+
+__all__ = ["BatchSink", "BatchWriter"]
@@ -1,20 +1,65 @@
 """Public main() entry point; adds optional telemetry bootstrap."""
 from __future__ import annotations
 
+import asyncio
+import logging
 import os
 from typing import Optional
 
-# Import handlers to register routes via decorators (side-effect registration)
-from ..api import handlers  # noqa: F401  # pylint: disable=unused-import
-from .config import AGENT_APP, CONNECTION_MANAGER
+from aiohttp.web import Application
+from microsoft_agents.hosting.core import AgentAuthConfiguration
+
+from ..agents import (CompactionPolicy, RunHedger, ThreadCompactor,
+                      configure_conversation_store, configure_run_hedger,
+                      configure_thread_compactor,
+                      create_conversation_store, ensure_agent_sdk_loaded,
+                      load_agent_sdk)
+# Module import (not a name) so importing src.api first does not cycle
+from ..api import handlers
+from ..api.feedback import (FeedbackBuffer, configure_feedback_buffer,
+                            create_feedback_sink)
+from ..api.prewarm import Prewarmer, configure_prewarmer
+from ..api.run_records import (RunRecordWriter, configure_run_record_writer,
+                               create_run_record_sink)
+from .auth import CachedTokenValidator, JwksCache
+from .config import (CONVERSATION_STATE_BACKEND, CONVERSATION_STATE_PATH,
+                     DRAIN_GRACE_SECONDS, FEEDBACK_BACKEND,
+                     FEEDBACK_BATCH_SIZE, FEEDBACK_FLUSH_SECONDS,
+                     FEEDBACK_MAX_PENDING, FEEDBACK_PATH,
+                     JWKS_MIN_REFRESH_SECONDS, JWKS_REFRESH_SECONDS, JWKS_URI,
+                     JWT_CACHE_MAX_ENTRIES, JWT_VALIDATION_CACHE,
+                     LOOP_LAG_MONITOR,
+                     LOOP_LAG_SAMPLE_INTERVAL_SECONDS,
+                     LOOP_LAG_SHED_THRESHOLD_MS, LOOP_SLOW_CALLBACK_MS,
+                     METRICS_ENDPOINT,
+                     PREWARM, PREWARM_COOLDOWN_SECONDS, PREWARM_MAX_ENTRIES,
+                     PREWARM_MAX_IN_FLIGHT, PREWARM_TTL_SECONDS,
+                     RUN_HEDGING, RUN_HEDGING_DEFAULT_DELAY_MS,
+                     RUN_HEDGING_MIN_DELAY_MS, RUN_HEDGING_PERCENTILE,
+                     RUN_RECORD_BACKEND, RUN_RECORD_BACKUPS,
+                     RUN_RECORD_BATCH_SIZE, RUN_RECORD_FLUSH_SECONDS,
+                     RUN_RECORD_MAX_BYTES, RUN_RECORD_MAX_PENDING,
+                     RUN_RECORD_PATH,
+                     SERVER_ACCESS_LOG, SERVER_BACKLOG, SERVER_CLIENT_MAX_SIZE,
+                     SERVER_KEEPALIVE_TIMEOUT, SERVER_SHUTDOWN_TIMEOUT,
+                     SERVER_USE_UVLOOP, TENANT_DEFAULT_WEIGHT,
+                     TENANT_MAX_CONCURRENT_TURNS, TENANT_MAX_QUEUE_DEPTH,
+                     TENANT_QUEUE_DEPTHS, TENANT_QUEUE_SECONDS,
+                     TENANT_SCHEDULER, TENANT_WEIGHTS,
+                     THREAD_COMPACTION_PROMPT_TOKENS,
+                     THREAD_COMPACTION_TIMEOUT_SECONDS, THREAD_COMPACTION_TURNS,
+                     TPM_DEFAULT_TURN_TOKENS, TPM_LIMIT,
+                     TPM_LIMIT_PER_TENANT, TPM_LIMIT_PER_USER, WEB_WORKERS)
+from .hosting import get_agent_application, get_connection_manager
+from .lifecycle import register_closeable
 from .logging import configure_root_logging
+from .loop_monitor import LoopLagMonitor
+from .metrics import register_metrics_provider
 from .server import build_app, run_server
+from .tenant_scheduler import TenantScheduler, install_tenant_scheduler
+from .token_budget import TokenBudget, install_token_budget
 
-try:  # Agent Framework observability is optional
-    from agent_framework.observability import \
-        setup_observability  # type: ignore
-except ImportError:  # pragma: no cover - if dependency not present
-    setup_observability = None  # type: ignore
+logger = logging.getLogger(__name__)
 
 
 def _maybe_enable_observability() -> None:
@@ -25,26 +70,222 @@ def _maybe_enable_observability() -> None:
     - Either APPLICATIONINSIGHTS_CONNECTION_STRING is set OR ENABLE_OTEL=true.
     This avoids unnecessary overhead when telemetry isn't configured.
     """
-    if setup_observability is None:  # library not installed
-        return
     ai_conn: Optional[str] = os.getenv("APPLICATIONINSIGHTS_CONNECTION_STRING")
     enable_otel_flag = os.getenv("ENABLE_OTEL", "").lower() == "true"
-    if ai_conn or enable_otel_flag:
-        # setup_observability reads env vars (conn str, OTLP endpoint, flags)
-        setup_observability()
+    if not (ai_conn or enable_otel_flag):
+        return
+    try:  # Agent Framework observability is optional (and heavy to import)
+        from agent_framework.observability import \
+            setup_observability  # type: ignore
+    except ImportError:  # pragma: no cover - if dependency not present
+        return
+    # setup_observability reads env vars (conn str, OTLP endpoint, flags)
+    setup_observability()
+
+
+def _configure_conversation_state() -> None:
+    """Install the shared conversation store before any worker starts."""
+    configure_conversation_store(
+        create_conversation_store(
+            CONVERSATION_STATE_BACKEND, CONVERSATION_STATE_PATH
+        )
+    )
+    if WEB_WORKERS > 1 and CONVERSATION_STATE_BACKEND == "memory":
+        logger.warning(
+            "WEB_WORKERS=%d with in-memory conversation state: a follow-up "
+            "turn served by another worker starts a new thread. Set "
+            "CONVERSATION_STATE_BACKEND=sqlite to share state.",
+            WEB_WORKERS,
+        )
+
+
+def _build_loop_monitor() -> Optional[LoopLagMonitor]:
+    if not LOOP_LAG_MONITOR:
+        return None
+    return LoopLagMonitor(
+        interval_s=LOOP_LAG_SAMPLE_INTERVAL_SECONDS,
+        shed_threshold_ms=LOOP_LAG_SHED_THRESHOLD_MS,
+        slow_callback_ms=LOOP_SLOW_CALLBACK_MS,
+    )
+
+
+def _build_token_validator(
+    auth_configuration: AgentAuthConfiguration,
+) -> Optional[CachedTokenValidator]:
+    if not JWT_VALIDATION_CACHE:
+        return None
+    validator = CachedTokenValidator(
+        auth_configuration,
+        JwksCache(
+            refresh_interval_s=JWKS_REFRESH_SECONDS,
+            min_refresh_interval_s=JWKS_MIN_REFRESH_SECONDS,
+        ),
+        max_entries=JWT_CACHE_MAX_ENTRIES,
+        jwks_uri=JWKS_URI,
+    )
+    register_closeable(validator)
+    register_metrics_provider("auth", validator.snapshot)
+    return validator
+
+
+def _configure_thread_compaction() -> None:
+    policy = CompactionPolicy(
+        prompt_tokens=THREAD_COMPACTION_PROMPT_TOKENS,
+        turns=THREAD_COMPACTION_TURNS,
+    )
+    if not policy.enabled:
+        return
+    compactor = ThreadCompactor(
+        policy, timeout_s=THREAD_COMPACTION_TIMEOUT_SECONDS
+    )
+    configure_thread_compactor(register_closeable(compactor))
+    register_metrics_provider("thread_compaction", compactor.snapshot)
+
+
+def _configure_run_hedging() -> None:
+    if not RUN_HEDGING:
+        return
+    hedger = RunHedger(
+        percentile=RUN_HEDGING_PERCENTILE,
+        min_delay_ms=RUN_HEDGING_MIN_DELAY_MS,
+        default_delay_ms=RUN_HEDGING_DEFAULT_DELAY_MS,
+    )
+    configure_run_hedger(register_closeable(hedger))
+    register_metrics_provider("run_hedging", hedger.snapshot)
+
+
+def _configure_prewarm() -> None:
+    if not PREWARM:
+        return
+    prewarmer = Prewarmer(
+        ttl_s=PREWARM_TTL_SECONDS,
+        cooldown_s=PREWARM_COOLDOWN_SECONDS,
+        max_in_flight=PREWARM_MAX_IN_FLIGHT,
+        max_entries=PREWARM_MAX_ENTRIES,
+    )
+    configure_prewarmer(register_closeable(prewarmer))
+    register_metrics_provider("prewarm", prewarmer.snapshot)
+
+
+def _configure_feedback() -> None:
+    sink = create_feedback_sink(FEEDBACK_BACKEND, FEEDBACK_PATH)
+    if sink is None:
+        return
+    buffer = FeedbackBuffer(
+        sink,
+        max_pending=FEEDBACK_MAX_PENDING,
+        batch_size=FEEDBACK_BATCH_SIZE,
+        flush_interval_s=FEEDBACK_FLUSH_SECONDS,
+    )
+    configure_feedback_buffer(register_closeable(buffer))
+    register_metrics_provider("feedback", buffer.snapshot)
+    logger.info("Feedback sink: %s (%s)", type(sink).__name__, FEEDBACK_PATH)
+
+
+def _configure_run_records() -> None:
+    sink = create_run_record_sink(
+        RUN_RECORD_BACKEND,
+        RUN_RECORD_PATH,
+        max_bytes=RUN_RECORD_MAX_BYTES,
+        backups=RUN_RECORD_BACKUPS,
+    )
+    if sink is None:
+        return
+    writer = RunRecordWriter(
+        sink,
+        max_pending=RUN_RECORD_MAX_PENDING,
+        batch_size=RUN_RECORD_BATCH_SIZE,
+        flush_interval_s=RUN_RECORD_FLUSH_SECONDS,
+    )
+    configure_run_record_writer(register_closeable(writer))
+    register_metrics_provider("run_records", writer.snapshot)
+    logger.info("Run record sink: %s", type(sink).__name__)
+
+
+def _configure_token_budget() -> None:
+    # Each worker enforces its share of the quota
+    workers = max(1, WEB_WORKERS)
+    install_token_budget(TokenBudget(
+        tokens_per_minute=TPM_LIMIT / workers,
+        per_user_tokens_per_minute=TPM_LIMIT_PER_USER / workers,
+        per_tenant_tokens_per_minute=TPM_LIMIT_PER_TENANT / workers,
+        default_turn_tokens=TPM_DEFAULT_TURN_TOKENS,
+    ))
+
+
+def _configure_tenant_scheduler() -> None:
+    if not TENANT_SCHEDULER:
+        return
+    # Each worker runs its share of the concurrent turns
+    workers = max(1, WEB_WORKERS)
+    install_tenant_scheduler(TenantScheduler(
+        max_concurrent=max(1, TENANT_MAX_CONCURRENT_TURNS // workers),
+        default_weight=TENANT_DEFAULT_WEIGHT,
+        weights=TENANT_WEIGHTS,
+        max_queue_depth=TENANT_MAX_QUEUE_DEPTH,
+        queue_depths=TENANT_QUEUE_DEPTHS,
+        max_wait_s=TENANT_QUEUE_SECONDS,
+    ))
+
+
+def _warm_agent_sdk(app: Application) -> None:
+    """Load the agent SDK so the first turn does not pay for the import.
+
+    With pre-forked workers it is imported in the supervisor so workers
+    share the pages; otherwise it loads in a thread once serving starts.
+    """
+    if WEB_WORKERS > 1:
+        load_agent_sdk()
+        return
+
+    async def _warm() -> None:
+        try:
+            await ensure_agent_sdk_loaded()
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Agent SDK warm-up failed: %s", exc)
+
+    async def _on_startup(_app: Application) -> None:
+        asyncio.ensure_future(_warm())
+
+    app.on_startup.append(_on_startup)
 
 
 def main() -> None:  # pragma: no cover - thin orchestration
     # Initialize telemetry first so logging captures early spans
     _maybe_enable_observability()
     configure_root_logging()
+    _configure_conversation_state()
+    _configure_token_budget()
+    _configure_tenant_scheduler()
+    _configure_thread_compaction()
+    _configure_run_hedging()
+    _configure_prewarm()
+    _configure_feedback()
+    _configure_run_records()
+    agent_app = get_agent_application()
+    handlers.register_handlers(agent_app)
+    auth_configuration = (
+        get_connection_manager().get_default_connection_configuration()
+    )
     app = build_app(
-        agent_application=AGENT_APP,
-        auth_configuration=(
-            CONNECTION_MANAGER.get_default_connection_configuration()
-        ),
+        agent_application=agent_app,
+        auth_configuration=auth_configuration,
+        client_max_size=SERVER_CLIENT_MAX_SIZE,
+        drain_grace_seconds=DRAIN_GRACE_SECONDS,
+        serve_metrics=METRICS_ENDPOINT,
+        loop_monitor=_build_loop_monitor(),
+        token_validator=_build_token_validator(auth_configuration),
+    )
+    _warm_agent_sdk(app)
+    run_server(
+        app,
+        workers=WEB_WORKERS,
+        use_uvloop=SERVER_USE_UVLOOP,
+        backlog=SERVER_BACKLOG,
+        keepalive_timeout=SERVER_KEEPALIVE_TIMEOUT,
+        access_log=SERVER_ACCESS_LOG,
+        shutdown_timeout=SERVER_SHUTDOWN_TIMEOUT,
     )
-    run_server(app)
 
 
 __all__ = ["main"]
@@ -1,29 +1,22 @@
-"""Environment configuration & hosting object wiring.
+"""Environment configuration.
 
 Original contents moved from the top-level `config.py` for better modularity.
-A thin compatibility shim remains in the legacy location importing these
-symbols so external imports continue to function.
+Only settings live here: importing this module reads the environment (and
+`.env`) but builds no hosting objects or credentials and imports no SDKs.
+The Agents SDK hosting objects are built lazily by `app.hosting`; the
+legacy `AGENT_APP` / `CONNECTION_MANAGER` names still resolve through it.
 """
 from __future__ import annotations
 
 import logging
 from os import environ
-from typing import List
+from typing import Any, Dict, List
 
-from azure.identity import DefaultAzureCredential
-from azure.identity.aio import \
-    DefaultAzureCredential as AsyncDefaultAzureCredential
 from dotenv import load_dotenv
-from microsoft_agents.activity import load_configuration_from_env
-from microsoft_agents.authentication.msal import MsalConnectionManager
-from microsoft_agents.hosting.aiohttp import CloudAdapter
-from microsoft_agents.hosting.core import (AgentApplication, Authorization,
-                                           MemoryStorage, TurnState)
 
 logger = logging.getLogger(__name__)
 
 load_dotenv()
-agents_sdk_config = load_configuration_from_env(environ)
 
 AZURE_AI_PROJECT_ENDPOINT: str = environ.get("AZURE_AI_PROJECT_ENDPOINT", "")
 AZURE_AI_FOUNDRY_AGENT_ID: str = environ.get("AZURE_AI_FOUNDRY_AGENT_ID", "")
@@ -36,33 +29,391 @@ ENABLE_RESPONSE_METADATA_CARD: bool = environ.get(
     "ENABLE_RESPONSE_METADATA_CARD", "false"
 ).lower() in {"1", "true", "yes", "on"}
 
+# Inline images: resolve code-interpreter image file ids into data URIs
+ENABLE_INLINE_IMAGES: bool = environ.get(
+    "ENABLE_INLINE_IMAGES", "true"
+).lower() in {"1", "true", "yes", "on"}
+# Defaults to AZURE_AI_PROJECT_ENDPOINT; override to point at a local stand-in
+INLINE_IMAGE_FILES_ENDPOINT: str = environ.get("INLINE_IMAGE_FILES_ENDPOINT", "")
+INLINE_IMAGE_MAX_CONCURRENCY: int = int(
+    environ.get("INLINE_IMAGE_MAX_CONCURRENCY", "4")
+)
+INLINE_IMAGE_TIME_BUDGET_SECONDS: float = float(
+    environ.get("INLINE_IMAGE_TIME_BUDGET_SECONDS", "5")
+)
+INLINE_IMAGE_MAX_BYTES: int = int(
+    environ.get("INLINE_IMAGE_MAX_BYTES", str(100 * 1024))
+)
+INLINE_IMAGE_CACHE_DIR: str = environ.get("INLINE_IMAGE_CACHE_DIR", "")
+INLINE_IMAGE_CACHE_MAX_BYTES: int = int(
+    environ.get("INLINE_IMAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+)
+
+# Response card size budget (serialized bytes) and continuation card limit
+CARD_MAX_BYTES: int = int(environ.get("CARD_MAX_BYTES", str(28 * 1024)))
+CARD_MAX_CONTINUATIONS: int = int(environ.get("CARD_MAX_CONTINUATIONS", "3"))
+
+# Serving: number of pre-forked worker processes sharing the port (1 = off)
+WEB_WORKERS: int = int(environ.get("WEB_WORKERS", "1"))
+
+# aiohttp server tuning (defaults match aiohttp's own)
+SERVER_USE_UVLOOP: bool = environ.get(
+    "SERVER_USE_UVLOOP", "false"
+).lower() in {"1", "true", "yes", "on"}
+SERVER_BACKLOG: int = int(environ.get("SERVER_BACKLOG", "128"))
+SERVER_KEEPALIVE_TIMEOUT: float = float(
+    environ.get("SERVER_KEEPALIVE_TIMEOUT", "75")
+)
+SERVER_CLIENT_MAX_SIZE: int = int(
+    environ.get("SERVER_CLIENT_MAX_SIZE", str(1024 * 1024))
+)
+SERVER_ACCESS_LOG: bool = environ.get(
+    "SERVER_ACCESS_LOG", "true"
+).lower() in {"1", "true", "yes", "on"}
+SERVER_SHUTDOWN_TIMEOUT: float = float(
+    environ.get("SERVER_SHUTDOWN_TIMEOUT", "60")
+)
+# Seconds in-flight turns get to finish after SIGTERM before being cancelled
+# (keep below the platform's termination grace period).
+DRAIN_GRACE_SECONDS: float = float(environ.get("DRAIN_GRACE_SECONDS", "25"))
+
+# Serve the per-process metrics snapshot on /metrics. It is not
+# authenticated, so only turn it on where the port is not publicly reachable.
+METRICS_ENDPOINT: bool = environ.get(
+    "METRICS_ENDPOINT", "false"
+).lower() in {"1", "true", "yes", "on"}
+
+# Event-loop lag monitoring. New turns are deferred (up to
+# LOOP_LAG_DEFER_SECONDS) and then shed while lag exceeds the threshold;
+# 0 disables shedding / slow-callback stack logging respectively.
+LOOP_LAG_MONITOR: bool = environ.get(
+    "LOOP_LAG_MONITOR", "true"
+).lower() in {"1", "true", "yes", "on"}
+LOOP_LAG_SAMPLE_INTERVAL_SECONDS: float = float(
+    environ.get("LOOP_LAG_SAMPLE_INTERVAL_SECONDS", "0.25")
+)
+LOOP_LAG_SHED_THRESHOLD_MS: float = float(
+    environ.get("LOOP_LAG_SHED_THRESHOLD_MS", "500")
+)
+LOOP_LAG_DEFER_SECONDS: float = float(
+    environ.get("LOOP_LAG_DEFER_SECONDS", "2")
+)
+LOOP_SLOW_CALLBACK_MS: float = float(
+    environ.get("LOOP_SLOW_CALLBACK_MS", "250")
+)
+
+# Shared conversation -> thread id store ("memory" or "sqlite"). Use a
+# shared backend whenever WEB_WORKERS > 1 so any worker can serve any turn.
+CONVERSATION_STATE_BACKEND: str = environ.get(
+    "CONVERSATION_STATE_BACKEND", "memory"
+).lower()
+CONVERSATION_STATE_PATH: str = environ.get(
+    "CONVERSATION_STATE_PATH", "conversation_state.db"
+)
+
+# Tokens-per-minute budget (0 = no limit), split evenly across workers.
+# Turns wait up to TPM_QUEUE_SECONDS for budget before being refused.
+TPM_LIMIT: int = int(environ.get("TPM_LIMIT", "0"))
+TPM_LIMIT_PER_USER: int = int(environ.get("TPM_LIMIT_PER_USER", "0"))
+TPM_LIMIT_PER_TENANT: int = int(environ.get("TPM_LIMIT_PER_TENANT", "0"))
+TPM_QUEUE_SECONDS: float = float(environ.get("TPM_QUEUE_SECONDS", "10"))
+TPM_DEFAULT_TURN_TOKENS: int = int(
+    environ.get("TPM_DEFAULT_TURN_TOKENS", "2000")
+)
+
+# Thread compaction: summarise a conversation's thread into a fresh one
+# once a turn's prompt tokens or the turns on the thread reach these
+# thresholds (0 disables a trigger).
+THREAD_COMPACTION_PROMPT_TOKENS: int = int(
+    environ.get("THREAD_COMPACTION_PROMPT_TOKENS", "0")
+)
+THREAD_COMPACTION_TURNS: int = int(environ.get("THREAD_COMPACTION_TURNS", "0"))
+THREAD_COMPACTION_TIMEOUT_SECONDS: float = float(
+    environ.get("THREAD_COMPACTION_TIMEOUT_SECONDS", "60")
+)
+
+# Hedge a conversation's first run with a second one on another fresh
+# thread when no token has arrived after the hedge delay: the given
+# percentile of recent time-to-first-token (default delay until enough
+# samples), never below the minimum.
+RUN_HEDGING: bool = environ.get("RUN_HEDGING", "false").lower() in {
+    "1",
+    "true",
+    "yes",
+    "on",
+}
+RUN_HEDGING_PERCENTILE: float = float(
+    environ.get("RUN_HEDGING_PERCENTILE", "95")
+)
+RUN_HEDGING_MIN_DELAY_MS: float = float(
+    environ.get("RUN_HEDGING_MIN_DELAY_MS", "1000")
+)
+RUN_HEDGING_DEFAULT_DELAY_MS: float = float(
+    environ.get("RUN_HEDGING_DEFAULT_DELAY_MS", "4000")
+)
+
+# Pre-warm a conversation's agent on conversationUpdate (members added)
+# and typing activities. Warm results unused after the TTL are dropped and
+# the conversation is not warmed again for the cooldown.
+PREWARM: bool = environ.get("PREWARM", "false").lower() in {
+    "1",
+    "true",
+    "yes",
+    "on",
+}
+PREWARM_TTL_SECONDS: float = float(environ.get("PREWARM_TTL_SECONDS", "60"))
+PREWARM_COOLDOWN_SECONDS: float = float(
+    environ.get("PREWARM_COOLDOWN_SECONDS", "300")
+)
+PREWARM_MAX_IN_FLIGHT: int = int(environ.get("PREWARM_MAX_IN_FLIGHT", "8"))
+PREWARM_MAX_ENTRIES: int = int(environ.get("PREWARM_MAX_ENTRIES", "256"))
+
+# Feedback-loop submissions (thumbs up/down): "none" keeps nothing, "sqlite"
+# or "jsonl" write them to FEEDBACK_PATH in batches of FEEDBACK_BATCH_SIZE
+# or every FEEDBACK_FLUSH_SECONDS, buffering at most FEEDBACK_MAX_PENDING.
+FEEDBACK_BACKEND: str = environ.get("FEEDBACK_BACKEND", "none")
+FEEDBACK_PATH: str = environ.get("FEEDBACK_PATH", "feedback.db")
+FEEDBACK_BATCH_SIZE: int = int(environ.get("FEEDBACK_BATCH_SIZE", "100"))
+FEEDBACK_FLUSH_SECONDS: float = float(
+    environ.get("FEEDBACK_FLUSH_SECONDS", "5")
+)
+FEEDBACK_MAX_PENDING: int = int(environ.get("FEEDBACK_MAX_PENDING", "10000"))
+
+# Per-turn run records for offline analysis: "none", "jsonl" (rotated at
+# RUN_RECORD_MAX_BYTES, keeping RUN_RECORD_BACKUPS files; "{pid}" in the
+# path gives each worker its own file), "sqlite" or "otlp".
+RUN_RECORD_BACKEND: str = environ.get("RUN_RECORD_BACKEND", "none")
+RUN_RECORD_PATH: str = environ.get("RUN_RECORD_PATH", "run_records.jsonl")
+RUN_RECORD_MAX_BYTES: int = int(
+    environ.get("RUN_RECORD_MAX_BYTES", str(50 * 1024 * 1024))
+)
+RUN_RECORD_BACKUPS: int = int(environ.get("RUN_RECORD_BACKUPS", "5"))
+RUN_RECORD_BATCH_SIZE: int = int(environ.get("RUN_RECORD_BATCH_SIZE", "200"))
+RUN_RECORD_FLUSH_SECONDS: float = float(
+    environ.get("RUN_RECORD_FLUSH_SECONDS", "5")
+)
+RUN_RECORD_MAX_PENDING: int = int(
+    environ.get("RUN_RECORD_MAX_PENDING", "10000")
+)
+
+# Turn state storage ("memory" or "sqlite" at STORAGE_PATH). STORAGE_CACHE
+# puts an in-process read cache with write-behind in front of it: writes
+# are coalesced per key and flushed every STORAGE_FLUSH_SECONDS; cached
+# reads are trusted for STORAGE_CACHE_TTL_SECONDS. Other workers' writes are
+# not seen meanwhile, so with WEB_WORKERS > 1 and a shared backend the read
+# cache defaults to off (TTL 0) and only the write-behind buffer is used.
+STORAGE_BACKEND: str = environ.get("STORAGE_BACKEND", "memory").lower()
+STORAGE_PATH: str = environ.get("STORAGE_PATH", "turn_state.db")
+STORAGE_CACHE: bool = environ.get("STORAGE_CACHE", "false").lower() in {
+    "1",
+    "true",
+    "yes",
+    "on",
+}
+STORAGE_FLUSH_SECONDS: float = float(environ.get("STORAGE_FLUSH_SECONDS", "1"))
+STORAGE_CACHE_TTL_SECONDS: float = float(
+    environ.get(
+        "STORAGE_CACHE_TTL_SECONDS",
+        "0" if WEB_WORKERS > 1 and STORAGE_BACKEND != "memory" else "5",
+    )
+)
+STORAGE_CACHE_MAX_ENTRIES: int = int(
+    environ.get("STORAGE_CACHE_MAX_ENTRIES", "10000")
+)
+
+# Cache validated bearer tokens on /api/messages until they expire (at most
+# JWT_CACHE_MAX_ENTRIES) and keep signing keys in memory, refreshed every
+# JWKS_REFRESH_SECONDS; an unknown key id refetches them at most once per
+# JWKS_MIN_REFRESH_SECONDS. JWKS_URI overrides the issuer's key endpoint
+# (for local testing).
+JWT_VALIDATION_CACHE: bool = environ.get(
+    "JWT_VALIDATION_CACHE", "true"
+).lower() in {"1", "true", "yes", "on"}
+JWT_CACHE_MAX_ENTRIES: int = int(environ.get("JWT_CACHE_MAX_ENTRIES", "10000"))
+JWKS_REFRESH_SECONDS: float = float(environ.get("JWKS_REFRESH_SECONDS", "3600"))
+JWKS_MIN_REFRESH_SECONDS: float = float(
+    environ.get("JWKS_MIN_REFRESH_SECONDS", "30")
+)
+JWKS_URI: str = environ.get("JWKS_URI", "")
+
+# Outbound Bot Connector requests share one connection pool of up to
+# OUTBOUND_MAX_CONNECTIONS. At most OUTBOUND_MAX_PER_CONVERSATION requests
+# per conversation are in flight; 429s are retried (OUTBOUND_MAX_RETRIES)
+# after Retry-After when it is at most OUTBOUND_MAX_RETRY_AFTER_SECONDS.
+OUTBOUND_POOL: bool = environ.get("OUTBOUND_POOL", "true").lower() in {
+    "1",
+    "true",
+    "yes",
+    "on",
+}
+OUTBOUND_MAX_CONNECTIONS: int = int(
+    environ.get("OUTBOUND_MAX_CONNECTIONS", "100")
+)
+OUTBOUND_TIMEOUT_SECONDS: float = float(
+    environ.get("OUTBOUND_TIMEOUT_SECONDS", "30")
+)
+OUTBOUND_MAX_PER_CONVERSATION: int = int(
+    environ.get("OUTBOUND_MAX_PER_CONVERSATION", "4")
+)
+OUTBOUND_MAX_RETRIES: int = int(environ.get("OUTBOUND_MAX_RETRIES", "3"))
+OUTBOUND_MAX_RETRY_AFTER_SECONDS: float = float(
+    environ.get("OUTBOUND_MAX_RETRY_AFTER_SECONDS", "30")
+)
+
+# Weighted fair scheduling of turns across tenants: at most
+# TENANT_MAX_CONCURRENT_TURNS turns run at once (split across workers);
+# the rest queue per tenant, dispatched in proportion to the tenant's
+# weight. TENANT_WEIGHTS and TENANT_QUEUE_DEPTHS are "tenant=value" lists
+# separated by commas; other tenants get the defaults.
+TENANT_SCHEDULER: bool = environ.get("TENANT_SCHEDULER", "false").lower() in {
+    "1",
+    "true",
+    "yes",
+    "on",
+}
+TENANT_MAX_CONCURRENT_TURNS: int = int(
+    environ.get("TENANT_MAX_CONCURRENT_TURNS", "32")
+)
+TENANT_DEFAULT_WEIGHT: float = float(environ.get("TENANT_DEFAULT_WEIGHT", "1"))
+TENANT_MAX_QUEUE_DEPTH: int = int(environ.get("TENANT_MAX_QUEUE_DEPTH", "50"))
+TENANT_QUEUE_SECONDS: float = float(environ.get("TENANT_QUEUE_SECONDS", "30"))
+
+
+def _parse_tenant_values(raw: str) -> Dict[str, float]:
+    values: Dict[str, float] = {}
+    for item in raw.split(","):
+        tenant, sep, value = item.partition("=")
+        if sep and tenant.strip() and value.strip():
+            values[tenant.strip()] = float(value)
+    return values
+
+
+TENANT_WEIGHTS: Dict[str, float] = _parse_tenant_values(
+    environ.get("TENANT_WEIGHTS", "")
+)
+TENANT_QUEUE_DEPTHS: Dict[str, int] = {
+    tenant: int(depth)
+    for tenant, depth in _parse_tenant_values(
+        environ.get("TENANT_QUEUE_DEPTHS", "")
+    ).items()
+}
+
+# Opt-in recording of agent streams (chunk payloads and inter-arrival
+# times) for offline replay; one gzipped JSONL file per turn.
+STREAM_RECORD_DIR: str = environ.get("STREAM_RECORD_DIR", "")
+STREAM_RECORD_REDACT: bool = environ.get(
+    "STREAM_RECORD_REDACT", "true"
+).lower() in {"1", "true", "yes", "on"}
+STREAM_RECORD_SAMPLE_RATE: float = float(
+    environ.get("STREAM_RECORD_SAMPLE_RATE", "1.0")
+)
+
 RAW_RESET_KEYWORDS = environ.get("RESET_COMMAND_KEYWORDS", "reset,restart,new")
 RESET_COMMAND_KEYWORDS: List[str] = [
     k.strip().lower() for k in RAW_RESET_KEYWORDS.split(",") if k.strip()
 ]
 
-STORAGE = MemoryStorage()
-CONNECTION_MANAGER = MsalConnectionManager(**agents_sdk_config)
-ADAPTER = CloudAdapter(connection_manager=CONNECTION_MANAGER)
-AUTHORIZATION = Authorization(STORAGE, CONNECTION_MANAGER, **agents_sdk_config)
+_HOSTING_ATTRS = {
+    "AGENT_APP": "get_agent_application",
+    "CONNECTION_MANAGER": "get_connection_manager",
+    "STORAGE": "get_storage",
+}
 
-AGENT_APP = AgentApplication[TurnState](
-    storage=STORAGE,
-    adapter=ADAPTER,
-    authorization=AUTHORIZATION,
-    **agents_sdk_config,
-)
 
-credential = DefaultAzureCredential()
-async_credential = AsyncDefaultAzureCredential()
+def __getattr__(name: str) -> Any:
+    """Resolve legacy hosting globals on first access (PEP 562)."""
+    if name in _HOSTING_ATTRS:
+        from . import hosting
+
+        return getattr(hosting, _HOSTING_ATTRS[name])()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
-    "AGENT_APP",
     "AZURE_AI_PROJECT_ENDPOINT",
     "AZURE_AI_FOUNDRY_AGENT_ID",
     "AZURE_AI_MODEL_DEPLOYMENT_NAME",
     "ENABLE_RESPONSE_METADATA_CARD",
+    "ENABLE_INLINE_IMAGES",
+    "INLINE_IMAGE_FILES_ENDPOINT",
+    "INLINE_IMAGE_MAX_CONCURRENCY",
+    "INLINE_IMAGE_TIME_BUDGET_SECONDS",
+    "INLINE_IMAGE_MAX_BYTES",
+    "INLINE_IMAGE_CACHE_DIR",
+    "INLINE_IMAGE_CACHE_MAX_BYTES",
+    "CARD_MAX_BYTES",
+    "CARD_MAX_CONTINUATIONS",
     "RESET_COMMAND_KEYWORDS",
-    "CONNECTION_MANAGER",
-    "async_credential",
+    "WEB_WORKERS",
+    "SERVER_USE_UVLOOP",
+    "SERVER_BACKLOG",
+    "SERVER_KEEPALIVE_TIMEOUT",
+    "SERVER_CLIENT_MAX_SIZE",
+    "SERVER_ACCESS_LOG",
+    "SERVER_SHUTDOWN_TIMEOUT",
+    "DRAIN_GRACE_SECONDS",
+    "METRICS_ENDPOINT",
+    "LOOP_LAG_MONITOR",
+    "LOOP_LAG_SAMPLE_INTERVAL_SECONDS",
+    "LOOP_LAG_SHED_THRESHOLD_MS",
+    "LOOP_LAG_DEFER_SECONDS",
+    "LOOP_SLOW_CALLBACK_MS",
+    "CONVERSATION_STATE_BACKEND",
+    "CONVERSATION_STATE_PATH",
+    "TPM_LIMIT",
+    "TPM_LIMIT_PER_USER",
+    "TPM_LIMIT_PER_TENANT",
+    "TPM_QUEUE_SECONDS",
+    "TPM_DEFAULT_TURN_TOKENS",
+    "THREAD_COMPACTION_PROMPT_TOKENS",
+    "THREAD_COMPACTION_TURNS",
+    "THREAD_COMPACTION_TIMEOUT_SECONDS",
+    "RUN_HEDGING",
+    "RUN_HEDGING_PERCENTILE",
+    "RUN_HEDGING_MIN_DELAY_MS",
+    "RUN_HEDGING_DEFAULT_DELAY_MS",
+    "PREWARM",
+    "PREWARM_TTL_SECONDS",
+    "PREWARM_COOLDOWN_SECONDS",
+    "PREWARM_MAX_IN_FLIGHT",
+    "PREWARM_MAX_ENTRIES",
+    "FEEDBACK_BACKEND",
+    "FEEDBACK_PATH",
+    "FEEDBACK_BATCH_SIZE",
+    "FEEDBACK_FLUSH_SECONDS",
+    "FEEDBACK_MAX_PENDING",
+    "RUN_RECORD_BACKEND",
+    "RUN_RECORD_PATH",
+    "RUN_RECORD_MAX_BYTES",
+    "RUN_RECORD_BACKUPS",
+    "RUN_RECORD_BATCH_SIZE",
+    "RUN_RECORD_FLUSH_SECONDS",
+    "RUN_RECORD_MAX_PENDING",
+    "STORAGE_BACKEND",
+    "STORAGE_PATH",
+    "STORAGE_CACHE",
+    "STORAGE_FLUSH_SECONDS",
+    "STORAGE_CACHE_TTL_SECONDS",
+    "STORAGE_CACHE_MAX_ENTRIES",
+    "JWT_VALIDATION_CACHE",
+    "JWT_CACHE_MAX_ENTRIES",
+    "JWKS_REFRESH_SECONDS",
+    "JWKS_MIN_REFRESH_SECONDS",
+    "JWKS_URI",
+    "OUTBOUND_POOL",
+    "OUTBOUND_MAX_CONNECTIONS",
+    "OUTBOUND_TIMEOUT_SECONDS",
+    "OUTBOUND_MAX_PER_CONVERSATION",
+    "OUTBOUND_MAX_RETRIES",
+    "OUTBOUND_MAX_RETRY_AFTER_SECONDS",
+    "TENANT_SCHEDULER",
+    "TENANT_MAX_CONCURRENT_TURNS",
+    "TENANT_DEFAULT_WEIGHT",
+    "TENANT_MAX_QUEUE_DEPTH",
+    "TENANT_QUEUE_SECONDS",
+    "TENANT_WEIGHTS",
+    "TENANT_QUEUE_DEPTHS",
+    "STREAM_RECORD_DIR",
+    "STREAM_RECORD_REDACT",
+    "STREAM_RECORD_SAMPLE_RATE",
 ]
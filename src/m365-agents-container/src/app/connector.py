@@ -0,0 +1,333 @@
+"""Pooled outbound Bot Connector client.
+
+The SDK's `RestChannelServiceClientFactory` gives every turn a
+`TeamsConnectorClient` with its own aiohttp session, so each turn opens new
+connections (and TLS handshakes) to the channel, and a throttled reply
+(429) fails the send. `PooledChannelServiceClientFactory` hands out the
+same clients backed by one `OutboundClient`:
+
+* one shared session (connection pool); each turn gets a view of it that
+  carries the turn's base URL and ``Authorization`` header;
+* per-conversation lanes: at most ``max_per_conversation`` requests to a
+  conversation are in flight, later ones wait in FIFO order;
+* a 429 is retried after its ``Retry-After`` (or exponential backoff with
+  jitter when absent), and the conversation's other requests wait for the
+  same deadline instead of being throttled in turn. A ``Retry-After``
+  longer than ``max_retry_after_s`` or more than ``max_retries`` retries
+  returns the 429 to the caller as before.
+
+Other errors are not retried: replies are POSTs, so a failure after the
+request was sent may already have been delivered.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import re
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Deque, Dict, Optional
+
+import aiohttp
+from microsoft_agents.hosting.core import ClaimsIdentity, TurnContext
+from microsoft_agents.hosting.core.connector import ConnectorClientBase
+from microsoft_agents.hosting.core.connector.teams import TeamsConnectorClient
+from microsoft_agents.hosting.core.rest_channel_service_client_factory import \
+    RestChannelServiceClientFactory
+from multidict import CIMultiDict
+from yarl import URL
+
+logger = logging.getLogger(__name__)
+
+_CONVERSATION_RE = re.compile(r"/v3/conversations/([^/]+)")
+# Latency samples kept for the percentiles on /metrics
+_WINDOW = 1000
+# Idle lanes are kept while their throttle lasts; prune past this many
+_MAX_IDLE_LANES = 10_000
+
+
+def _retry_after_s(value: Optional[str]) -> Optional[float]:
+    """Seconds from a ``Retry-After`` header (delta seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _Lane:
+    """Requests to one conversation: a concurrency cap and a throttle."""
+
+    def __init__(self, limit: int) -> None:
+        self.semaphore = asyncio.Semaphore(limit)
+        self.until = 0.0
+        self.users = 0
+
+
+class _PooledRequest:
+    """``async with`` wrapper returned by `_SessionView` request methods."""
+
+    def __init__(
+        self, client: "OutboundClient", method: str, url: URL,
+        kwargs: Dict[str, Any],
+    ) -> None:
+        self._client = client
+        self._method = method
+        self._url = url
+        self._kwargs = kwargs
+        self._response: Optional[aiohttp.ClientResponse] = None
+
+    async def __aenter__(self) -> aiohttp.ClientResponse:
+        self._response = await self._client.send(
+            self._method, self._url, **self._kwargs
+        )
+        return self._response
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        if self._response is not None:
+            self._response.release()
+
+
+class _SessionView:
+    """What `ConnectorClient` needs of a session, over the shared pool."""
+
+    def __init__(
+        self, client: "OutboundClient", base_url: str, headers: Any
+    ) -> None:
+        self._client = client
+        self._base_url = URL(base_url)
+        self.headers = CIMultiDict(headers)
+        self.closed = False
+
+    def request(self, method: str, url: str, **kwargs: Any) -> _PooledRequest:
+        headers = CIMultiDict(self.headers)
+        headers.update(kwargs.pop("headers", None) or {})
+        return _PooledRequest(
+            self._client,
+            method,
+            self._base_url.join(URL(url)),
+            {**kwargs, "headers": headers},
+        )
+
+    def get(self, url: str, **kwargs: Any) -> _PooledRequest:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> _PooledRequest:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs: Any) -> _PooledRequest:
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url: str, **kwargs: Any) -> _PooledRequest:
+        return self.request("DELETE", url, **kwargs)
+
+    async def close(self) -> None:
+        # The pool outlives the turn; see OutboundClient.close
+        self.closed = True
+
+
+class OutboundClient:
+    """Shared session, per-conversation lanes and 429 handling."""
+
+    def __init__(
+        self,
+        *,
+        max_connections: int = 100,
+        timeout_s: float = 30.0,
+        max_per_conversation: int = 4,
+        max_retries: int = 3,
+        max_retry_after_s: float = 30.0,
+        backoff_base_s: float = 0.5,
+    ) -> None:
+        self.max_connections = max_connections
+        self.timeout_s = timeout_s
+        self.max_per_conversation = max(1, max_per_conversation)
+        self.max_retries = max_retries
+        self.max_retry_after_s = max_retry_after_s
+        self.backoff_base_s = backoff_base_s
+        self.requests = 0
+        self.attempts = 0
+        self.throttled = 0
+        self.retried = 0
+        self.gave_up = 0
+        self.transport_errors = 0
+        self.queued = 0
+        self.status: Dict[str, int] = {}
+        self.retry_wait_ms = 0.0
+        self._latencies: Deque[float] = deque(maxlen=_WINDOW)
+        self._lanes: Dict[str, _Lane] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout_s),
+            )
+        return self._session
+
+    def view(self, base_url: str, headers: Any) -> _SessionView:
+        """A session-like object for one connector client."""
+        return _SessionView(self, base_url, headers)
+
+    def _delay_s(self, response: aiohttp.ClientResponse, attempt: int) -> float:
+        retry_after = _retry_after_s(response.headers.get("Retry-After"))
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, self.backoff_base_s * 2**attempt)
+
+    async def send(
+        self, method: str, url: URL, **kwargs: Any
+    ) -> aiohttp.ClientResponse:
+        """Send through the conversation's lane, retrying 429s."""
+        self.requests += 1
+        match = _CONVERSATION_RE.search(url.path)
+        key = match.group(1) if match else ""
+        lane = self._lanes.get(key)
+        if lane is None:
+            if len(self._lanes) > _MAX_IDLE_LANES:
+                self._prune_lanes()
+            lane = self._lanes[key] = _Lane(self.max_per_conversation)
+        lane.users += 1
+        try:
+            if lane.semaphore.locked():
+                self.queued += 1
+            async with lane.semaphore:
+                return await self._send(lane, method, url, kwargs)
+        finally:
+            lane.users -= 1
+            if (
+                lane.users == 0
+                and lane.until <= time.monotonic()
+                and self._lanes.get(key) is lane
+            ):
+                del self._lanes[key]
+
+    def _prune_lanes(self) -> None:
+        now = time.monotonic()
+        for key in [
+            k for k, lane in self._lanes.items()
+            if lane.users == 0 and lane.until <= now
+        ]:
+            del self._lanes[key]
+
+    async def _send(
+        self, lane: _Lane, method: str, url: URL, kwargs: Dict[str, Any]
+    ) -> aiohttp.ClientResponse:
+        attempt = 0
+        while True:
+            wait = lane.until - time.monotonic()
+            if wait > 0:
+                self.retry_wait_ms += wait * 1000
+                await asyncio.sleep(wait)
+            self.attempts += 1
+            started = time.perf_counter()
+            try:
+                response = await self._get_session().request(
+                    method, url, **kwargs
+                )
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                self.transport_errors += 1
+                raise
+            self._latencies.append((time.perf_counter() - started) * 1000)
+            family = f"{response.status // 100}xx"
+            self.status[family] = self.status.get(family, 0) + 1
+            if response.status != 429:
+                return response
+            self.throttled += 1
+            delay = self._delay_s(response, attempt)
+            if attempt >= self.max_retries or delay > self.max_retry_after_s:
+                self.gave_up += 1
+                logger.warning(
+                    "Connector throttled %s %s; giving up after %d retries "
+                    "(Retry-After %.1fs)",
+                    method,
+                    url.path,
+                    attempt,
+                    delay,
+                )
+                return response
+            response.release()
+            attempt += 1
+            self.retried += 1
+            # The whole conversation backs off, not just this request
+            lane.until = max(lane.until, time.monotonic() + delay)
+            logger.info(
+                "Connector throttled %s %s; retry %d in %.2fs",
+                method,
+                url.path,
+                attempt,
+                delay,
+            )
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        ordered = sorted(self._latencies)
+
+        def pct(p: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 1)
+
+        return {
+            "requests": self.requests,
+            "attempts": self.attempts,
+            "status": dict(self.status),
+            "throttled": self.throttled,
+            "retried": self.retried,
+            "gave_up": self.gave_up,
+            "transport_errors": self.transport_errors,
+            "queued": self.queued,
+            "retry_wait_ms": round(self.retry_wait_ms, 1),
+            "latency_p50_ms": pct(0.50),
+            "latency_p95_ms": pct(0.95),
+            "latency_p99_ms": pct(0.99),
+            "lanes": len(self._lanes),
+        }
+
+
+class PooledChannelServiceClientFactory(RestChannelServiceClientFactory):
+    """Connector clients that share an `OutboundClient`."""
+
+    def __init__(
+        self, connection_manager: Any, outbound: OutboundClient, **kwargs: Any
+    ) -> None:
+        super().__init__(connection_manager, **kwargs)
+        self.outbound = outbound
+
+    async def create_connector_client(
+        self,
+        context: TurnContext,
+        claims_identity: ClaimsIdentity,
+        service_url: str,
+        audience: str,
+        scopes: Optional[list[str]] = None,
+        use_anonymous: bool = False,
+    ) -> ConnectorClientBase:
+        # The SDK acquires the token (including agentic identities); keep
+        # its headers and swap the per-turn session for a pooled view. The
+        # discarded session never opened a connection.
+        client = await super().create_connector_client(
+            context, claims_identity, service_url, audience, scopes,
+            use_anonymous,
+        )
+        headers = CIMultiDict(client.client.headers)
+        base_url = client.base_uri
+        await client.close()
+        return TeamsConnectorClient(
+            base_url, "", session=self.outbound.view(base_url, headers)
+        )
+
+
+__all__ = ["OutboundClient", "PooledChannelServiceClientFactory"]
@@ -0,0 +1,116 @@
+"""Lazily built Microsoft 365 Agents SDK hosting objects.
+
+`MsalConnectionManager`, turn-state storage, `CloudAdapter` (with the
+pooled outbound connector client), `Authorization` and the
+`AgentApplication` are created on first use (normally by the bootstrap)
+rather than when configuration is imported, so tools and benchmarks that
+only need settings do not pay for them.
+"""
+from __future__ import annotations
+
+import logging
+from os import environ
+from typing import Any, Dict, Optional
+
+from microsoft_agents.activity import load_configuration_from_env
+from microsoft_agents.authentication.msal import MsalConnectionManager
+from microsoft_agents.hosting.aiohttp import CloudAdapter
+from microsoft_agents.hosting.core import (AgentApplication, Authorization,
+                                           Storage, TurnState)
+
+from .config import (OUTBOUND_MAX_CONNECTIONS, OUTBOUND_MAX_PER_CONVERSATION,
+                     OUTBOUND_MAX_RETRIES, OUTBOUND_MAX_RETRY_AFTER_SECONDS,
+                     OUTBOUND_POOL, OUTBOUND_TIMEOUT_SECONDS, STORAGE_BACKEND,
+                     STORAGE_CACHE, STORAGE_CACHE_MAX_ENTRIES,
+                     STORAGE_CACHE_TTL_SECONDS, STORAGE_FLUSH_SECONDS,
+                     STORAGE_PATH)
+from .connector import OutboundClient, PooledChannelServiceClientFactory
+from .lifecycle import register_closeable
+from .metrics import register_metrics_provider
+from .storage import CachingStorage, create_storage
+
+logger = logging.getLogger(__name__)
+
+_sdk_config: Optional[Dict[str, Any]] = None
+_connection_manager: Optional[MsalConnectionManager] = None
+_storage: Optional[Storage] = None
+_agent_app: Optional[AgentApplication] = None
+
+
+def _agents_sdk_config() -> Dict[str, Any]:
+    global _sdk_config
+    if _sdk_config is None:
+        _sdk_config = load_configuration_from_env(environ)
+    return _sdk_config
+
+
+def get_connection_manager() -> MsalConnectionManager:
+    """Return the process-wide MSAL connection manager."""
+    global _connection_manager
+    if _connection_manager is None:
+        _connection_manager = MsalConnectionManager(**_agents_sdk_config())
+    return _connection_manager
+
+
+def get_storage() -> Storage:
+    """Return the turn-state storage shared by the app and authorization."""
+    global _storage
+    if _storage is None:
+        _storage = create_storage(
+            STORAGE_BACKEND,
+            STORAGE_PATH,
+            cache=STORAGE_CACHE,
+            flush_interval_s=STORAGE_FLUSH_SECONDS,
+            ttl_s=STORAGE_CACHE_TTL_SECONDS,
+            max_entries=STORAGE_CACHE_MAX_ENTRIES,
+        )
+        if isinstance(_storage, CachingStorage):
+            # Flushes pending writes at shutdown
+            register_closeable(_storage)
+            register_metrics_provider("storage", _storage.snapshot)
+        logger.info("Turn state storage: %s", type(_storage).__name__)
+    return _storage
+
+
+def _build_adapter(connection_manager: MsalConnectionManager) -> CloudAdapter:
+    if not OUTBOUND_POOL:
+        return CloudAdapter(connection_manager=connection_manager)
+    outbound = OutboundClient(
+        max_connections=OUTBOUND_MAX_CONNECTIONS,
+        timeout_s=OUTBOUND_TIMEOUT_SECONDS,
+        max_per_conversation=OUTBOUND_MAX_PER_CONVERSATION,
+        max_retries=OUTBOUND_MAX_RETRIES,
+        max_retry_after_s=OUTBOUND_MAX_RETRY_AFTER_SECONDS,
+    )
+    register_closeable(outbound)
+    register_metrics_provider("outbound", outbound.snapshot)
+    return CloudAdapter(
+        channel_service_client_factory=PooledChannelServiceClientFactory(
+            connection_manager, outbound
+        ),
+    )
+
+
+def get_agent_application() -> AgentApplication:
+    """Return the process-wide `AgentApplication`, building it on first use.
+
+    Handlers are not registered here; see `api.handlers.register_handlers`.
+    """
+    global _agent_app
+    if _agent_app is None:
+        sdk_config = _agents_sdk_config()
+        connection_manager = get_connection_manager()
+        storage = get_storage()
+        _agent_app = AgentApplication[TurnState](
+            storage=storage,
+            adapter=_build_adapter(connection_manager),
+            authorization=Authorization(
+                storage, connection_manager, **sdk_config
+            ),
+            **sdk_config,
+        )
+        logger.debug("AgentApplication created")
+    return _agent_app
+
+
+__all__ = ["get_agent_application", "get_connection_manager", "get_storage"]
@@ -0,0 +1,180 @@
+"""Process lifecycle: in-flight turn tracking and graceful drain.
+
+On SIGTERM (rolling deploy, scale-in) the service:
+
+  1. flips readiness to not-ready and refuses new turns,
+  2. gives in-flight turns a grace period to finish,
+  3. cancels whatever is still running (handlers send a short notice),
+  4. then lets aiohttp shut down; pooled clients and credentials registered
+     here are closed during cleanup.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import signal
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Set
+
+from aiohttp.web import Application, GracefulExit
+
+from .metrics import register_metrics_provider
+
+logger = logging.getLogger(__name__)
+
+DRAIN_NOTICE = (
+    "The service is restarting and this response was cut short. "
+    "Please send your message again in a moment."
+)
+DRAIN_REFUSAL = (
+    "The service is restarting. Please try again in a moment."
+)
+
+
+class TurnDrain:
+    """Track in-flight turns and drain them on shutdown."""
+
+    def __init__(self) -> None:
+        self.draining = False
+        self._inflight: Set[asyncio.Task] = set()
+        self._drained: asyncio.Event | None = None
+        self.cancelled_turns = 0
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    @asynccontextmanager
+    async def track(self) -> AsyncIterator[None]:
+        """Register the current task as an in-flight turn."""
+        task = asyncio.current_task()
+        if task is None:
+            yield
+            return
+        self._inflight.add(task)
+        try:
+            yield
+        finally:
+            self._inflight.discard(task)
+
+    async def drain(self, grace_s: float) -> None:
+        """Stop accepting turns, wait up to `grace_s`, cancel the rest."""
+        if self._drained is not None:
+            await self._drained.wait()
+            return
+        self._drained = asyncio.Event()
+        self.draining = True
+        pending = set(self._inflight)
+        logger.info(
+            "Draining: %d in-flight turn(s), grace %.1fs", len(pending), grace_s
+        )
+        if pending:
+            _, still_running = await asyncio.wait(pending, timeout=grace_s)
+            if still_running:
+                logger.warning(
+                    "Drain deadline reached; cancelling %d turn(s)",
+                    len(still_running),
+                )
+                self.cancelled_turns += len(still_running)
+                for task in still_running:
+                    task.cancel()
+                # Give cancelled turns a moment to send their notice
+                await asyncio.wait(still_running, timeout=5.0)
+        logger.info("Drain complete")
+        self._drained.set()
+
+
+_closeables: "weakref.WeakSet[Any]" = weakref.WeakSet()
+_close_callbacks: List[Callable[[], Awaitable[None]]] = []
+
+
+def register_closeable(resource: Any) -> Any:
+    """Close `resource` (async ``close()``) at shutdown if still alive."""
+    try:
+        _closeables.add(resource)
+    except TypeError:  # not weak-referenceable
+        pass
+    return resource
+
+
+def register_close_callback(callback: Callable[[], Awaitable[None]]) -> None:
+    """Run `callback` at shutdown (e.g. close a pooled HTTP session)."""
+    _close_callbacks.append(callback)
+
+
+async def close_resources() -> None:
+    closers: List[Awaitable[Any]] = [cb() for cb in _close_callbacks]
+    for resource in list(_closeables):
+        close = getattr(resource, "close", None)
+        if close is not None:
+            result = close()
+            if asyncio.iscoroutine(result):
+                closers.append(result)
+    results = await asyncio.gather(*closers, return_exceptions=True)
+    failures = [r for r in results if isinstance(r, Exception)]
+    for failure in failures:
+        logger.debug("Error closing resource: %s", failure)
+    logger.info(
+        "Closed %d resource(s) (%d failed)", len(results), len(failures)
+    )
+
+
+TURN_DRAIN = TurnDrain()
+
+
+def install_drain(app: Application, *, grace_s: float) -> None:
+    """Wire drain-on-SIGTERM and resource cleanup into `app`."""
+
+    def _raise_graceful_exit() -> None:
+        raise GracefulExit()
+
+    def _on_sigterm() -> None:
+        if TURN_DRAIN.draining:
+            return
+        logger.info("SIGTERM received; draining before shutdown")
+        loop = asyncio.get_running_loop()
+        task = loop.create_task(TURN_DRAIN.drain(grace_s))
+        task.add_done_callback(lambda _t: loop.call_soon(_raise_graceful_exit))
+
+    async def _on_startup(_app: Application) -> None:
+        # Replaces aiohttp's SIGTERM handler so the listener stays open
+        # (answering readiness with 503) while turns finish.
+        try:
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGTERM, _on_sigterm
+            )
+        except (NotImplementedError, RuntimeError):
+            logger.debug("Signal handlers unavailable; drain on shutdown only")
+
+    async def _on_shutdown(_app: Application) -> None:
+        started = time.monotonic()
+        await TURN_DRAIN.drain(grace_s)
+        logger.debug("Shutdown drain took %.2fs", time.monotonic() - started)
+
+    async def _on_cleanup(_app: Application) -> None:
+        await close_resources()
+
+    register_metrics_provider(
+        "turns",
+        lambda: {
+            "inflight": TURN_DRAIN.inflight,
+            "draining": TURN_DRAIN.draining,
+            "cancelled_at_drain": TURN_DRAIN.cancelled_turns,
+        },
+    )
+    app.on_startup.append(_on_startup)
+    app.on_shutdown.append(_on_shutdown)
+    app.on_cleanup.append(_on_cleanup)
+
+
+__all__ = [
+    "DRAIN_NOTICE",
+    "DRAIN_REFUSAL",
+    "TURN_DRAIN",
+    "TurnDrain",
+    "install_drain",
+    "register_close_callback",
+    "register_closeable",
+]
@@ -0,0 +1,239 @@
+"""Event-loop lag monitor with load shedding.
+
+A background task sleeps for a fixed interval and records how late it wakes
+up; that delay is time the loop spent running other callbacks, i.e. latency
+added to every concurrent conversation. Samples go into a fixed-bucket
+histogram. A watchdog thread logs the loop thread's stack when a single
+callback blocks for longer than `slow_callback_ms`.
+
+When smoothed lag (an EWMA, so one stray spike does not trip it) exceeds
+`shed_threshold_ms` the monitor reports itself overloaded until it falls
+back below half the threshold; handlers defer new turns while overloaded
+and shed them if it does not recover in time.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional
+
+from aiohttp.web import Application
+
+from .metrics import register_metrics_provider
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the lag histogram buckets; the last bucket is +Inf
+LAG_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+_EWMA_ALPHA = 0.3
+
+
+class LoopLagMonitor:
+    """Sample event-loop lag and flag overload for load shedding."""
+
+    def __init__(
+        self,
+        *,
+        interval_s: float = 0.25,
+        shed_threshold_ms: float = 500.0,
+        slow_callback_ms: float = 250.0,
+    ) -> None:
+        self.interval_s = interval_s
+        self.shed_threshold_ms = shed_threshold_ms
+        self.slow_callback_ms = slow_callback_ms
+        self.overloaded = False
+        self.last_lag_ms = 0.0
+        self.smoothed_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.samples = 0
+        self.shed_turns = 0
+        self.deferred_turns = 0
+        self.slow_callbacks = 0
+        self._counts: List[int] = [0] * (len(LAG_BUCKETS_MS) + 1)
+        self._sum_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._recovered: Optional[asyncio.Event] = None
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Sampling
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        """Start sampling on the running loop (and the watchdog thread)."""
+        if self._task is not None:
+            return
+        self._recovered = asyncio.Event()
+        self._recovered.set()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._sample())
+        if self.slow_callback_ms > 0:
+            self._stop.clear()
+            self._watchdog = threading.Thread(
+                target=self._watch, name="loop-lag-watchdog", daemon=True
+            )
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sample(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval_s
+            await asyncio.sleep(self.interval_s)
+            now = time.monotonic()
+            self._heartbeat = now
+            self.record((now - expected) * 1000.0)
+
+    def record(self, lag_ms: float) -> None:
+        lag_ms = max(0.0, lag_ms)
+        self.samples += 1
+        self.last_lag_ms = lag_ms
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        self._sum_ms += lag_ms
+        self._counts[bisect_left(LAG_BUCKETS_MS, lag_ms)] += 1
+        self.smoothed_lag_ms += _EWMA_ALPHA * (lag_ms - self.smoothed_lag_ms)
+        if self.shed_threshold_ms <= 0:
+            return
+        smoothed = self.smoothed_lag_ms
+        if not self.overloaded and smoothed > self.shed_threshold_ms:
+            self.overloaded = True
+            if self._recovered is not None:
+                self._recovered.clear()
+            logger.warning(
+                "Event loop lag %.0f ms over %.0f ms; deferring new turns",
+                smoothed,
+                self.shed_threshold_ms,
+            )
+        elif self.overloaded and smoothed < self.shed_threshold_ms / 2:
+            self.overloaded = False
+            if self._recovered is not None:
+                self._recovered.set()
+            logger.info("Event loop lag recovered (%.0f ms)", smoothed)
+
+    # ------------------------------------------------------------------
+    # Slow callback watchdog
+    # ------------------------------------------------------------------
+    def _watch(self) -> None:
+        limit_s = self.interval_s + self.slow_callback_ms / 1000.0
+        reported = None
+        while not self._stop.wait(self.slow_callback_ms / 2000.0):
+            beat = self._heartbeat
+            blocked_s = time.monotonic() - beat
+            if blocked_s <= limit_s or reported == beat:
+                continue
+            reported = beat
+            self.slow_callbacks += 1
+            frame = sys._current_frames().get(self._loop_thread_id)  # noqa: SLF001
+            stack = "".join(traceback.format_stack(frame)) if frame else "n/a"
+            logger.warning(
+                "Event loop blocked for over %.0f ms; loop thread stack:\n%s",
+                (blocked_s - self.interval_s) * 1000.0,
+                stack,
+            )
+
+    # ------------------------------------------------------------------
+    # Admission
+    # ------------------------------------------------------------------
+    async def admit(self, defer_s: float) -> bool:
+        """Wait up to `defer_s` for lag to recover; False means shed."""
+        if not self.overloaded or self._recovered is None:
+            return True
+        self.deferred_turns += 1
+        try:
+            await asyncio.wait_for(self._recovered.wait(), timeout=defer_s)
+            return True
+        except asyncio.TimeoutError:
+            self.shed_turns += 1
+            return False
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+    def percentile(self, q: float) -> float:
+        """Bucket upper bound containing the `q` quantile (0-1)."""
+        if not self.samples:
+            return 0.0
+        target = q * self.samples
+        seen = 0
+        for bound, count in zip(LAG_BUCKETS_MS, self._counts):
+            seen += count
+            if seen >= target:
+                return float(bound)
+        return self.max_lag_ms
+
+    def summary(self) -> Dict[str, Any]:
+        """Short form for the readiness route."""
+        return {
+            "lag_ms": round(self.last_lag_ms, 1),
+            "smoothed_lag_ms": round(self.smoothed_lag_ms, 1),
+            "p99_ms": self.percentile(0.99),
+            "overloaded": self.overloaded,
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        buckets = {
+            f"le_{bound}": count
+            for bound, count in zip(LAG_BUCKETS_MS, self._counts)
+        }
+        buckets["le_inf"] = self._counts[-1]
+        return {
+            **self.summary(),
+            "samples": self.samples,
+            "mean_ms": round(self._sum_ms / self.samples, 2) if self.samples else 0.0,
+            "max_ms": round(self.max_lag_ms, 1),
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "buckets_ms": buckets,
+            "shed_threshold_ms": self.shed_threshold_ms,
+            "deferred_turns": self.deferred_turns,
+            "shed_turns": self.shed_turns,
+            "slow_callbacks": self.slow_callbacks,
+        }
+
+
+_monitor: Optional[LoopLagMonitor] = None
+
+
+def get_loop_monitor() -> Optional[LoopLagMonitor]:
+    """Return the installed monitor, or None when monitoring is disabled."""
+    return _monitor
+
+
+def install_loop_monitor(app: Application, monitor: LoopLagMonitor) -> None:
+    """Run `monitor` for the lifetime of `app` (per worker process)."""
+    global _monitor
+    _monitor = monitor
+    register_metrics_provider("event_loop", monitor.snapshot)
+
+    async def _on_startup(_app: Application) -> None:
+        monitor.start()
+
+    async def _on_cleanup(_app: Application) -> None:
+        await monitor.stop()
+
+    app.on_startup.append(_on_startup)
+    app.on_cleanup.append(_on_cleanup)
+
+
+__all__ = [
+    "LAG_BUCKETS_MS",
+    "LoopLagMonitor",
+    "get_loop_monitor",
+    "install_loop_monitor",
+]
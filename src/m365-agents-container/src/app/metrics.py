@@ -0,0 +1,37 @@
+"""Process-local metrics registry served as JSON on ``/metrics``.
+
+Components register a provider (a zero-argument callable returning a
+JSON-serializable dict) under a name; the route calls each provider when
+scraped, so nothing is computed between scrapes.
+"""
+from __future__ import annotations
+
+import logging
+import os
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+MetricsProvider = Callable[[], Dict[str, Any]]
+
+_providers: Dict[str, MetricsProvider] = {}
+
+
+def register_metrics_provider(name: str, provider: MetricsProvider) -> None:
+    """Expose `provider()` under `name` (replaces an existing provider)."""
+    _providers[name] = provider
+
+
+def collect_metrics() -> Dict[str, Any]:
+    """Snapshot every registered provider; failures are reported inline."""
+    snapshot: Dict[str, Any] = {"pid": os.getpid()}
+    for name, provider in list(_providers.items()):
+        try:
+            snapshot[name] = provider()
+        except Exception as exc:  # noqa: BLE001
+            logger.debug("Metrics provider %s failed: %s", name, exc)
+            snapshot[name] = {"error": str(exc)}
+    return snapshot
+
+
+__all__ = ["MetricsProvider", "collect_metrics", "register_metrics_provider"]
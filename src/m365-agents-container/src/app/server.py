@@ -1,9 +1,16 @@
 """aiohttp server startup utilities (extracted from start_server.py)."""
 from __future__ import annotations
 
+import asyncio
+import gc
+import logging
+import os
+import signal
+import socket
+import time
 from datetime import datetime
 from os import environ
-from typing import Any
+from typing import Any, Dict, Optional
 
 from aiohttp import web
 from aiohttp.web import Application, Request, Response, run_app
@@ -13,13 +20,38 @@ from microsoft_agents.hosting.aiohttp import (CloudAdapter,
 from microsoft_agents.hosting.core import (AgentApplication,
                                            AgentAuthConfiguration)
 
+from .auth import CachedTokenValidator, cached_jwt_authorization_middleware
+from .lifecycle import TURN_DRAIN, install_drain
+from .loop_monitor import LoopLagMonitor, install_loop_monitor
+from .metrics import collect_metrics
+
+logger = logging.getLogger(__name__)
+
+# Minimum worker lifetime before a crash is treated as a crash loop
+_MIN_WORKER_UPTIME_S = 1.0
+_FORWARDED_SIGNALS = (signal.SIGTERM, signal.SIGINT, signal.SIGHUP)
+
 
 def build_app(
     *,
     agent_application: AgentApplication,
     auth_configuration: AgentAuthConfiguration,
+    client_max_size: int = 1024**2,
+    drain_grace_seconds: float = 25.0,
+    serve_metrics: bool = False,
+    loop_monitor: Optional[LoopLagMonitor] = None,
+    token_validator: Optional[CachedTokenValidator] = None,
 ) -> Application:
-    """Create and configure the aiohttp Application instance."""
+    """Create and configure the aiohttp Application instance.
+
+    `client_max_size` caps the request body size aiohttp will read;
+    `drain_grace_seconds` is how long in-flight turns may run after SIGTERM.
+    `serve_metrics` adds the unauthenticated ``/metrics`` route (off by
+    default). `loop_monitor`, when given, samples event-loop lag for the
+    app's lifetime and is reported on ``/readyz`` and ``/metrics``. `token_validator`,
+    when given, replaces the SDK's per-request JWT validation with a cached
+    one.
+    """
 
     async def entry_point(req: Request) -> Response:
         agent: AgentApplication = req.app["agent_app"]
@@ -36,10 +68,27 @@ def build_app(
                     "time": datetime.utcnow().isoformat() + "Z",
                 }
             )
+        if request.path == "/readyz":
+            ready = not TURN_DRAIN.draining
+            body: Dict[str, Any] = {
+                "status": "ready" if ready else "draining",
+                "inflight_turns": TURN_DRAIN.inflight,
+            }
+            if loop_monitor is not None:
+                body["event_loop"] = loop_monitor.summary()
+            return web.json_response(body, status=200 if ready else 503)
+        if serve_metrics and request.path == "/metrics":
+            return web.json_response(collect_metrics())
         return await handler(request)
 
+    auth_middleware = (
+        jwt_authorization_middleware
+        if token_validator is None
+        else cached_jwt_authorization_middleware(token_validator)
+    )
     app = Application(
-        middlewares=[health_auth_bypass_middleware, jwt_authorization_middleware]
+        middlewares=[health_auth_bypass_middleware, auth_middleware],
+        client_max_size=client_max_size,
     )
     app.router.add_post("/api/messages", entry_point)
 
@@ -48,16 +97,166 @@ def build_app(
 
     app.router.add_get("/healthz", _health_placeholder)
     app.router.add_get("/health", _health_placeholder)
+    app.router.add_get("/readyz", _health_placeholder)
+    if serve_metrics:
+        app.router.add_get("/metrics", _health_placeholder)
+    install_drain(app, grace_s=drain_grace_seconds)
+    if loop_monitor is not None:
+        install_loop_monitor(app, loop_monitor)
     app["agent_configuration"] = auth_configuration
     app["agent_app"] = agent_application
     app["adapter"] = agent_application.adapter
     return app
 
 
-def run_server(app: Application) -> None:
-    """Run the aiohttp application on the configured port."""
+def _new_event_loop(use_uvloop: bool) -> asyncio.AbstractEventLoop:
+    """Create the worker's event loop (uvloop when requested and installed)."""
+    if use_uvloop:
+        try:
+            import uvloop  # type: ignore
+        except ImportError:
+            logger.warning("SERVER_USE_UVLOOP set but uvloop is not installed")
+        else:
+            logger.info("Using uvloop event loop")
+            return uvloop.new_event_loop()
+    return asyncio.new_event_loop()
+
+
+def _run_worker(
+    app: Application,
+    port: int,
+    *,
+    reuse_port: bool,
+    options: Dict[str, Any],
+) -> None:
+    """Serve `app` in the current process (one worker)."""
+    loop = _new_event_loop(options.get("use_uvloop", False))
+    asyncio.set_event_loop(loop)
+    access_log: Optional[logging.Logger] = (
+        logging.getLogger("aiohttp.access")
+        if options.get("access_log", True)
+        else None
+    )
+    run_app(
+        app,
+        host="0.0.0.0",
+        port=port,
+        reuse_port=reuse_port or None,
+        backlog=options.get("backlog", 128),
+        keepalive_timeout=options.get("keepalive_timeout", 75.0),
+        shutdown_timeout=options.get("shutdown_timeout", 60.0),
+        access_log=access_log,
+        loop=loop,
+    )
+
+
+def _run_prefork(
+    app: Application, port: int, workers: int, options: Dict[str, Any]
+) -> None:
+    """Fork `workers` processes that share the port via SO_REUSEPORT.
+
+    The parent only supervises: it restarts workers that die and forwards
+    SIGTERM/SIGINT/SIGHUP to them. Everything imported so far is moved to
+    the permanent GC generation before forking so collections in the
+    workers do not touch (and un-share) the copy-on-write pages.
+    """
+    children: Dict[int, float] = {}
+    stopping = False
+
+    def _spawn() -> None:
+        pid = os.fork()
+        if pid == 0:  # worker
+            for sig in _FORWARDED_SIGNALS:
+                signal.signal(sig, signal.SIG_DFL)
+            gc.enable()
+            exit_code = 0
+            try:
+                logger.info("Worker %d serving on port %d", os.getpid(), port)
+                _run_worker(app, port, reuse_port=True, options=options)
+            except BaseException:  # noqa: BLE001 - report and exit the worker
+                logger.exception("Worker %d crashed", os.getpid())
+                exit_code = 1
+            finally:
+                logging.shutdown()
+                os._exit(exit_code)
+        children[pid] = time.monotonic()
+
+    def _forward(signum: int, _frame: Any) -> None:
+        nonlocal stopping
+        if signum in (signal.SIGTERM, signal.SIGINT):
+            stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    for sig in _FORWARDED_SIGNALS:
+        signal.signal(sig, _forward)
+
+    gc.disable()
+    gc.freeze()
+    logger.info("Supervisor %d starting %d workers", os.getpid(), workers)
+    for _ in range(workers):
+        _spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if stopping or started is None:
+            continue
+        logger.warning(
+            "Worker %d exited (status %d); restarting",
+            pid,
+            os.waitstatus_to_exitcode(status),
+        )
+        if time.monotonic() - started < _MIN_WORKER_UPTIME_S:
+            time.sleep(_MIN_WORKER_UPTIME_S)
+        if not stopping:
+            _spawn()
+    logger.info("Supervisor %d: all workers stopped", os.getpid())
+
+
+def run_server(
+    app: Application,
+    *,
+    workers: int = 1,
+    use_uvloop: bool = False,
+    backlog: int = 128,
+    keepalive_timeout: float = 75.0,
+    access_log: bool = True,
+    shutdown_timeout: float = 60.0,
+) -> None:
+    """Run the aiohttp application on the configured port.
+
+    With `workers` > 1 a pre-fork supervisor runs that many worker processes
+    on the same port (Linux SO_REUSEPORT); otherwise a single process serves.
+    The remaining options are passed to `aiohttp.web.run_app` (uvloop is
+    used only if installed).
+    """
     port_val = int(environ.get("PORT", 3978))
-    run_app(app, host="0.0.0.0", port=port_val)
+    options: Dict[str, Any] = {
+        "use_uvloop": use_uvloop,
+        "backlog": backlog,
+        "keepalive_timeout": keepalive_timeout,
+        "access_log": access_log,
+        "shutdown_timeout": shutdown_timeout,
+    }
+    workers = max(1, workers)
+    if workers > 1 and not hasattr(socket, "SO_REUSEPORT"):
+        logger.warning(
+            "%d workers requested but SO_REUSEPORT is unavailable; "
+            "serving from a single process",
+            workers,
+        )
+        workers = 1
+    if workers > 1:
+        _run_prefork(app, port_val, workers, options)
+    else:
+        _run_worker(app, port_val, reuse_port=False, options=options)
 
 
 __all__ = ["build_app", "run_server"]
@@ -0,0 +1,445 @@
+"""Turn-state storage: a SQLite backend and a write-behind cache.
+
+`AgentApplication` and `Authorization` read and write conversation and
+user state through one `Storage` on every turn. With a durable backend
+that is a remote read and write per turn, so `CachingStorage` wraps any
+backend:
+
+* reads are served from an in-process cache (misses included) for
+  ``ttl_s``, and misses for several keys go to the backend in one read;
+* writes and deletes update the cache and return at once; the key is
+  marked dirty, so several turns' writes to it become one backend write
+  when the cache flushes (every ``flush_interval_s`` and at shutdown);
+* optimistic concurrency: the cache remembers each key's etag and writes
+  it back with the item. A backend that checks etags (`SqliteStorage`)
+  rejects a write when another process changed the key since it was
+  read; the local write is then dropped and counted, and the key is
+  re-read on next use.
+
+Writes are acknowledged before they are durable: a crash loses at most one
+flush interval of state. `SqliteStorage` can be shared by every worker on
+a host and stands in for Cosmos DB or Blob storage locally.
+"""
+from __future__ import annotations
+
+import asyncio
+import copy
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Type
+
+from microsoft_agents.hosting.core import MemoryStorage, Storage, StoreItem
+
+logger = logging.getLogger(__name__)
+
+# Key of the etag in stored JSON (Bot Framework convention)
+ETAG = "e_tag"
+
+
+class StorageConflictError(Exception):
+    """Writes rejected because the stored etag changed; the rest were saved."""
+
+    def __init__(self, keys: List[str]) -> None:
+        super().__init__(f"etag conflict for {len(keys)} key(s)")
+        self.keys = keys
+
+
+def _to_json(value: Any) -> Dict[str, Any]:
+    if isinstance(value, StoreItem):
+        return value.store_item_to_json() or {}
+    return dict(value)
+
+
+class _Raw(StoreItem):
+    """Stored JSON passed through a backend unchanged."""
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        self.data = data
+        self.e_tag: Optional[str] = data.get(ETAG)
+
+    def store_item_to_json(self) -> Dict[str, Any]:
+        return self.data
+
+    @staticmethod
+    def from_json_to_store_item(json_data: Dict[str, Any]) -> "_Raw":
+        return _Raw(json_data)
+
+
+class SqliteStorage(Storage):
+    """`Storage` in a SQLite file, with etags for optimistic concurrency.
+
+    Items are stored as JSON with an etag that changes on every write and
+    is returned in the item's ``e_tag`` field. A write carrying an
+    ``e_tag`` (other than ``"*"``) only succeeds if it still matches.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS storage ("
+                "key TEXT PRIMARY KEY, etag TEXT NOT NULL, "
+                "data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(
+                self._path, timeout=5.0, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def _read(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        placeholders = ", ".join("?" for _ in keys)
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT key, etag, data FROM storage "
+                f"WHERE key IN ({placeholders})",
+                keys,
+            ).fetchall()
+        items = {}
+        for key, etag, data in rows:
+            item = json.loads(data)
+            item[ETAG] = etag
+            items[key] = item
+        return items
+
+    def _write(self, changes: Dict[str, Any]) -> None:
+        conflicts: List[str] = []
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            for key, value in changes.items():
+                data = dict(_to_json(value))
+                expected = data.pop(ETAG, None)
+                etag = uuid.uuid4().hex
+                payload = json.dumps(data, separators=(",", ":"))
+                if expected in (None, "*"):
+                    conn.execute(
+                        "INSERT INTO storage (key, etag, data, updated_at) "
+                        "VALUES (?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET "
+                        "etag = excluded.etag, data = excluded.data, "
+                        "updated_at = excluded.updated_at",
+                        (key, etag, payload, now),
+                    )
+                elif not conn.execute(
+                    "UPDATE storage SET etag = ?, data = ?, updated_at = ? "
+                    "WHERE key = ? AND etag = ?",
+                    (etag, payload, now, key, expected),
+                ).rowcount:
+                    conflicts.append(key)
+                    continue
+                if hasattr(value, ETAG):
+                    setattr(value, ETAG, etag)
+        if conflicts:
+            raise StorageConflictError(conflicts)
+
+    def _delete(self, keys: List[str]) -> None:
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "DELETE FROM storage WHERE key = ?", [(k,) for k in keys]
+            )
+
+    async def read(
+        self, keys: List[str], *, target_cls: Type[StoreItem] = None, **kwargs
+    ) -> Dict[str, StoreItem]:
+        if not keys:
+            raise ValueError("Storage.read(): Keys are required when reading.")
+        if not target_cls:
+            raise ValueError("Storage.read(): target_cls cannot be None.")
+        items = await asyncio.to_thread(self._read, list(keys))
+        return {
+            key: target_cls.from_json_to_store_item(item)
+            for key, item in items.items()
+        }
+
+    async def write(self, changes: Dict[str, StoreItem]) -> None:
+        if not changes:
+            raise ValueError("Storage.write(): Changes are required when writing.")
+        await asyncio.to_thread(self._write, changes)
+
+    async def delete(self, keys: List[str]) -> None:
+        if not keys:
+            raise ValueError("Storage.delete(): Keys are required when deleting.")
+        await asyncio.to_thread(self._delete, list(keys))
+
+    async def close(self) -> None:
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+@dataclass
+class _Entry:
+    data: Optional[Dict[str, Any]]  # None: the key does not exist
+    etag: Optional[str]
+    loaded: float
+    dirty: bool = False
+    version: int = 0
+
+
+class CachingStorage(Storage):
+    """Read cache and write-behind buffer in front of another `Storage`."""
+
+    def __init__(
+        self,
+        backend: Storage,
+        *,
+        flush_interval_s: float = 1.0,
+        ttl_s: float = 5.0,
+        max_entries: int = 10_000,
+    ) -> None:
+        self.backend = backend
+        self.flush_interval_s = flush_interval_s
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.backend_reads = 0
+        self.writes = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.flushed = 0
+        self.conflicts = 0
+        self.write_failures = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    @property
+    def dirty(self) -> int:
+        return sum(1 for e in self._entries.values() if e.dirty)
+
+    def _fresh(self, entry: _Entry, now: float) -> bool:
+        return entry.dirty or now - entry.loaded < self.ttl_s
+
+    def _evict(self) -> None:
+        """Drop least recently used clean entries over `max_entries`."""
+        excess = len(self._entries) - self.max_entries
+        if excess <= 0:
+            return
+        for key in [k for k, e in self._entries.items() if not e.dirty]:
+            del self._entries[key]
+            excess -= 1
+            if excess <= 0:
+                return
+
+    async def read(
+        self, keys: List[str], *, target_cls: Type[StoreItem] = None, **kwargs
+    ) -> Dict[str, StoreItem]:
+        if not keys:
+            raise ValueError("Storage.read(): Keys are required when reading.")
+        if not target_cls:
+            raise ValueError("Storage.read(): target_cls cannot be None.")
+        now = time.monotonic()
+        missing = []
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is not None and self._fresh(entry, now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                missing.append(key)
+        if missing:
+            self.misses += len(missing)
+            self.backend_reads += 1
+            loaded = await self.backend.read(missing, target_cls=_Raw, **kwargs)
+            for key in missing:
+                entry = self._entries.get(key)
+                if entry is not None and entry.dirty:
+                    continue  # written while the read was in flight
+                item = loaded.get(key)
+                data = dict(_to_json(item)) if item is not None else None
+                etag = data.pop(ETAG, None) if data is not None else None
+                self._entries[key] = _Entry(data, etag, now)
+
+        result: Dict[str, StoreItem] = {}
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is not None and entry.data is not None:
+                # Callers mutate what they read; the cache keeps its own copy
+                result[key] = target_cls.from_json_to_store_item(
+                    copy.deepcopy(entry.data)
+                )
+        self._evict()
+        return result
+
+    def _set(self, key: str, data: Optional[Dict[str, Any]]) -> None:
+        if key == "":
+            raise ValueError("CachingStorage: key cannot be empty")
+        self.writes += 1
+        entry = self._entries.get(key)
+        if entry is None:
+            # Written without a read: no etag, so the write is unconditional
+            entry = self._entries[key] = _Entry(None, None, time.monotonic())
+        elif entry.dirty:
+            self.coalesced += 1
+        entry.data = data
+        entry.dirty = True
+        entry.version += 1
+        self._entries.move_to_end(key)
+        if self._task is None and not self._closed:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def write(self, changes: Dict[str, StoreItem]) -> None:
+        if not changes:
+            raise ValueError("Storage.write(): Changes are required when writing.")
+        for key, value in changes.items():
+            data = copy.deepcopy(_to_json(value))
+            data.pop(ETAG, None)
+            self._set(key, data)
+        if self._closed:
+            await self.flush()
+
+    async def delete(self, keys: List[str]) -> None:
+        if not keys:
+            raise ValueError("Storage.delete(): Keys are required when deleting.")
+        for key in keys:
+            self._set(key, None)
+        if self._closed:
+            await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval_s)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write dirty keys to the backend (one write and one delete)."""
+        async with self._flush_lock:
+            batch = {k: e for k, e in self._entries.items() if e.dirty}
+            if not batch:
+                return
+            versions = {k: e.version for k, e in batch.items()}
+            writes = {
+                key: _Raw({**entry.data, ETAG: entry.etag or "*"})
+                for key, entry in batch.items()
+                if entry.data is not None
+            }
+            deletes = [k for k, e in batch.items() if e.data is None]
+            conflicts: List[str] = []
+            try:
+                if writes:
+                    try:
+                        await self.backend.write(writes)
+                    except StorageConflictError as exc:
+                        conflicts = exc.keys
+                if deletes:
+                    await self.backend.delete(deletes)
+            except Exception as exc:  # noqa: BLE001
+                # Keys stay dirty and are retried on the next flush
+                self.write_failures += 1
+                logger.warning(
+                    "Failed to flush %d state key(s): %s", len(batch), exc
+                )
+                return
+            self.flushes += 1
+            self.flushed += len(batch) - len(conflicts)
+            now = time.monotonic()
+            for key, entry in batch.items():
+                if self._entries.get(key) is not entry:
+                    continue
+                if key in conflicts:
+                    # Changed by another process: drop ours, re-read on use
+                    self.conflicts += 1
+                    logger.warning(
+                        "State write lost to a concurrent update: %s", key
+                    )
+                    if entry.version == versions[key]:
+                        del self._entries[key]
+                    # A newer write made during the flush is kept and goes
+                    # through its own etag check on the next flush
+                    continue
+                item = writes.get(key)
+                entry.etag = item.e_tag if item is not None else None
+                if entry.etag == "*":
+                    entry.etag = None
+                if entry.version == versions[key]:
+                    entry.dirty = False
+                    entry.loaded = now
+            self._evict()
+
+    async def close(self) -> None:
+        """Stop the flush timer, write what is dirty and close the backend."""
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        await self.flush()
+        if self.dirty:
+            logger.warning(
+                "Discarding %d unwritten state key(s) at shutdown", self.dirty
+            )
+        close = getattr(self.backend, "close", None)
+        if close is not None:
+            result = close()
+            if asyncio.iscoroutine(result):
+                await result
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self._entries),
+            "dirty": self.dirty,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "backend_reads": self.backend_reads,
+            "writes": self.writes,
+            "coalesced": self.coalesced,
+            "flushes": self.flushes,
+            "flushed": self.flushed,
+            "conflicts": self.conflicts,
+            "write_failures": self.write_failures,
+        }
+
+
+def create_storage(
+    backend: str,
+    path: str,
+    *,
+    cache: bool = False,
+    flush_interval_s: float = 1.0,
+    ttl_s: float = 5.0,
+    max_entries: int = 10_000,
+) -> Storage:
+    """Create turn-state storage for `backend` ("memory" or "sqlite")."""
+    backend = (backend or "memory").lower()
+    if backend == "sqlite":
+        storage: Storage = SqliteStorage(path)
+    elif backend == "memory":
+        storage = MemoryStorage()
+    else:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    if cache:
+        storage = CachingStorage(
+            storage,
+            flush_interval_s=flush_interval_s,
+            ttl_s=ttl_s,
+            max_entries=max_entries,
+        )
+    return storage
+
+
+__all__ = [
+    "CachingStorage",
+    "SqliteStorage",
+    "StorageConflictError",
+    "create_storage",
+]
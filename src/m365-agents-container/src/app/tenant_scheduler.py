@@ -0,0 +1,286 @@
+"""Weighted fair scheduling of turns across tenants.
+
+Turns run under a global concurrency cap. When the cap is reached, new
+turns queue per tenant and free slots are handed out by start-time fair
+queuing: each queued turn is tagged with a virtual finish time
+
+    start  = max(virtual_time, tenant's last finish)
+    finish = start + 1 / weight
+
+and the turn with the smallest tag runs next, advancing the virtual time
+to its start tag. A tenant with weight 2 is therefore dispatched twice as
+often as one with weight 1 while both have turns waiting, an idle tenant
+gets no credit for the time it was idle, and a single busy tenant can
+still use every slot when nobody else is waiting.
+
+A tenant's queue is bounded (``max_queue_depth``, per tenant overrides);
+turns past it are refused at once, and queued turns give up after
+``max_wait_s``. Turns without a tenant share the ``""`` tenant.
+
+The cap is per process: with several workers, give each its share.
+Tenants are reported on /metrics by a digest of their id, not the id.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import heapq
+import itertools
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from .metrics import register_metrics_provider
+
+logger = logging.getLogger(__name__)
+
+# Queue-time samples kept per tenant for the percentiles on /metrics
+_WINDOW = 500
+# Tenants whose counters are reported; least recently seen are dropped
+_MAX_TRACKED_TENANTS = 256
+
+
+def _tenant_label(tenant: str) -> str:
+    """How a tenant is keyed on /metrics (never the raw id)."""
+    if not tenant:
+        return "unknown"
+    return "tenant-" + hashlib.sha256(tenant.encode()).hexdigest()[:12]
+
+
+class _TenantStats:
+    def __init__(self) -> None:
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.running = 0
+        self.waiting = 0
+        self.queue_ms: Deque[float] = deque(maxlen=_WINDOW)
+
+    def snapshot(self) -> Dict[str, Any]:
+        ordered = sorted(self.queue_ms)
+
+        def pct(p: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 1)
+
+        return {
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "running": self.running,
+            "waiting": self.waiting,
+            "queue_p50_ms": pct(0.50),
+            "queue_p95_ms": pct(0.95),
+            "queue_max_ms": round(ordered[-1], 1) if ordered else None,
+        }
+
+
+class TenantSlot:
+    """One running turn; `release` it when the turn ends."""
+
+    def __init__(self, scheduler: "TenantScheduler", tenant: str) -> None:
+        self._scheduler = scheduler
+        self.tenant = tenant
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self._scheduler._release(self.tenant)
+
+
+class TenantScheduler:
+    """Admit turns under a concurrency cap, fairly across tenants."""
+
+    def __init__(
+        self,
+        *,
+        max_concurrent: int = 32,
+        default_weight: float = 1.0,
+        weights: Optional[Dict[str, float]] = None,
+        max_queue_depth: int = 50,
+        queue_depths: Optional[Dict[str, int]] = None,
+        max_wait_s: float = 30.0,
+    ) -> None:
+        self.max_concurrent = max(1, max_concurrent)
+        self.default_weight = default_weight
+        self.weights = dict(weights or {})
+        self.max_queue_depth = max_queue_depth
+        self.queue_depths = dict(queue_depths or {})
+        self.max_wait_s = max_wait_s
+        self.running = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._waiting: Dict[str, int] = {}
+        # (finish tag, arrival, start tag, tenant, future)
+        self._heap: List[Tuple[float, int, float, str, asyncio.Future]] = []
+        self._arrivals = itertools.count()
+        self._stats: "OrderedDict[str, _TenantStats]" = OrderedDict()
+
+    def weight(self, tenant: str) -> float:
+        weight = self.weights.get(tenant, self.default_weight)
+        return weight if weight > 0 else self.default_weight
+
+    def queue_depth(self, tenant: str) -> int:
+        return self.queue_depths.get(tenant, self.max_queue_depth)
+
+    def _tenant_stats(self, tenant: str) -> _TenantStats:
+        stats = self._stats.get(tenant)
+        if stats is None:
+            stats = self._stats[tenant] = _TenantStats()
+            while len(self._stats) > _MAX_TRACKED_TENANTS:
+                self._stats.popitem(last=False)
+        else:
+            self._stats.move_to_end(tenant)
+        return stats
+
+    async def acquire(
+        self,
+        tenant_id: Optional[str],
+        *,
+        on_wait: Optional[Callable[[], Awaitable[None]]] = None,
+    ) -> Optional[TenantSlot]:
+        """A slot for the tenant's next turn, or None if it is refused.
+
+        Runs at once while a slot is free and nobody is queued; otherwise
+        the turn waits its turn (calling `on_wait()` first) for up to
+        `max_wait_s`.
+        """
+        tenant = tenant_id or ""
+        stats = self._tenant_stats(tenant)
+        if self.running < self.max_concurrent and not self._waiting:
+            self._start(tenant, stats, 0.0)
+            return TenantSlot(self, tenant)
+
+        waiting = self._waiting.get(tenant, 0)
+        if waiting >= self.queue_depth(tenant):
+            self.rejected += 1
+            stats.rejected += 1
+            logger.warning(
+                "Tenant queue full - Tenant: %s, %d waiting",
+                tenant or "unknown",
+                waiting,
+            )
+            return None
+
+        start = max(self._virtual_time, self._last_finish.get(tenant, 0.0))
+        finish = start + 1.0 / self.weight(tenant)
+        self._last_finish[tenant] = finish
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._heap, (finish, next(self._arrivals), start, tenant, future)
+        )
+        self._waiting[tenant] = waiting + 1
+        stats.waiting += 1
+        stats.queued += 1
+        queued_at = time.perf_counter()
+        try:
+            if on_wait is not None:
+                await on_wait()
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait_s)
+        except asyncio.TimeoutError:
+            if self._abandon(future, tenant, stats):
+                self.timed_out += 1
+                stats.timed_out += 1
+                logger.warning(
+                    "Turn waited %.1fs for a slot - Tenant: %s",
+                    self.max_wait_s,
+                    tenant or "unknown",
+                )
+                return None
+        except BaseException:
+            # Cancelled: give back a slot granted in the meantime
+            if not self._abandon(future, tenant, stats):
+                self._release(tenant)
+            raise
+        stats.queue_ms.append((time.perf_counter() - queued_at) * 1000)
+        return TenantSlot(self, tenant)
+
+    def _abandon(
+        self, future: asyncio.Future, tenant: str, stats: _TenantStats
+    ) -> bool:
+        """Withdraw a queued turn; False if it was already dispatched."""
+        if future.done():
+            return False
+        future.cancel()
+        self._left_queue(tenant, stats)
+        return True
+
+    def _left_queue(self, tenant: str, stats: _TenantStats) -> None:
+        waiting = self._waiting.get(tenant, 1) - 1
+        if waiting:
+            self._waiting[tenant] = waiting
+        else:
+            self._waiting.pop(tenant, None)
+        stats.waiting = max(0, stats.waiting - 1)
+
+    def _start(self, tenant: str, stats: _TenantStats, start: float) -> None:
+        self.running += 1
+        stats.running += 1
+        stats.admitted += 1
+        self._virtual_time = max(self._virtual_time, start)
+
+    def _release(self, tenant: str) -> None:
+        self.running -= 1
+        stats = self._stats.get(tenant)
+        if stats is not None:
+            stats.running = max(0, stats.running - 1)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._heap and self.running < self.max_concurrent:
+            _finish, _arrival, start, tenant, future = heapq.heappop(self._heap)
+            if future.done():  # timed out or cancelled while queued
+                continue
+            stats = self._tenant_stats(tenant)
+            self._left_queue(tenant, stats)
+            self._start(tenant, stats, start)
+            future.set_result(None)
+        if not self._waiting:
+            # Nobody is waiting: finish tags no longer order anything, and
+            # what is left on the heap was withdrawn
+            self._heap.clear()
+            self._last_finish.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "running": self.running,
+            "waiting": sum(self._waiting.values()),
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "tenants": {
+                _tenant_label(tenant): stats.snapshot()
+                for tenant, stats in self._stats.items()
+            },
+        }
+
+
+_scheduler: Optional[TenantScheduler] = None
+
+
+def get_tenant_scheduler() -> Optional[TenantScheduler]:
+    """The process's scheduler, or None when scheduling is disabled."""
+    return _scheduler
+
+
+def install_tenant_scheduler(scheduler: Optional[TenantScheduler]) -> None:
+    """Make `scheduler` the process's scheduler and export its metrics."""
+    global _scheduler
+    _scheduler = scheduler
+    if scheduler is not None:
+        register_metrics_provider("tenant_scheduler", scheduler.snapshot)
+
+
+__all__ = [
+    "TenantScheduler",
+    "TenantSlot",
+    "get_tenant_scheduler",
+    "install_tenant_scheduler",
+]
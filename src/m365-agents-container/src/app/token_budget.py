@@ -0,0 +1,328 @@
+"""Tokens-per-minute budget for agent runs.
+
+Token buckets (global, per tenant and per user) refill at the configured
+tokens-per-minute rate and hold at most one minute's worth. Before a turn
+starts, its cost is estimated from the conversation's previous turns (an
+EWMA of total tokens, falling back to the process-wide average and then a
+configured default) and reserved from every applicable bucket; when a
+bucket is short the turn waits for it to refill, up to a limit, and is
+otherwise refused. Once the run reports usage the reservation is settled
+against the actual total, so buckets track real consumption and may go
+negative after an unexpectedly expensive turn.
+
+A 429 from the service empties the global bucket so new turns back off
+instead of adding to the throttling.
+
+Buckets are per process: with several workers, give each its share of the
+deployment's quota.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .metrics import register_metrics_provider
+
+logger = logging.getLogger(__name__)
+
+_EWMA_ALPHA = 0.3
+_MIN_WAIT_S = 0.05
+# Conversations whose cost estimate is remembered (least recently used
+# entries are dropped first)
+_MAX_TRACKED_CONVERSATIONS = 10_000
+
+
+class TokenBucket:
+    """Refills at `tokens_per_minute`, holding at most one minute's worth."""
+
+    def __init__(self, tokens_per_minute: float) -> None:
+        self.capacity = float(tokens_per_minute)
+        self.rate = self.capacity / 60.0
+        self._level = self.capacity
+        self._updated = time.monotonic()
+
+    @property
+    def level(self) -> float:
+        now = time.monotonic()
+        self._level = min(
+            self.capacity, self._level + (now - self._updated) * self.rate
+        )
+        self._updated = now
+        return self._level
+
+    @property
+    def full(self) -> bool:
+        return self.level >= self.capacity
+
+    def wait_for(self, tokens: float) -> float:
+        """Seconds until `tokens` (capped at capacity) are available."""
+        shortfall = min(tokens, self.capacity) - self.level
+        return shortfall / self.rate if shortfall > 0 else 0.0
+
+    def take(self, tokens: float) -> None:
+        self._level = self.level - tokens
+
+    def drain(self) -> None:
+        self._level = min(self.level, 0.0)
+
+
+class TokenReservation:
+    """Tokens reserved for one turn; settle with the actual usage."""
+
+    def __init__(
+        self,
+        budget: "TokenBudget",
+        taken: List[Tuple[TokenBucket, float]],
+        conversation_id: str,
+        estimate: float,
+    ) -> None:
+        self.budget = budget
+        self.taken = taken
+        self.conversation_id = conversation_id
+        self.estimate = estimate
+        self.settled = False
+
+    def settle(self, total_tokens: Optional[int]) -> None:
+        """Charge the difference between actual and reserved tokens.
+
+        Without usage data (failed or truncated run) the estimate stands.
+        """
+        if self.settled:
+            return
+        self.settled = True
+        if total_tokens is None:
+            return
+        for bucket, tokens in self.taken:
+            bucket.take(total_tokens - tokens)
+        self.budget.record_usage(self.conversation_id, total_tokens)
+
+    def release(self) -> None:
+        """Give the reserved tokens back (the turn never ran)."""
+        if self.settled:
+            return
+        self.settled = True
+        for bucket, tokens in self.taken:
+            bucket.take(-tokens)
+
+
+class TokenBudget:
+    """Admit turns against global, per-tenant and per-user token buckets."""
+
+    def __init__(
+        self,
+        *,
+        tokens_per_minute: float = 0.0,
+        per_user_tokens_per_minute: float = 0.0,
+        per_tenant_tokens_per_minute: float = 0.0,
+        default_turn_tokens: float = 2000.0,
+    ) -> None:
+        self.global_bucket = (
+            TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        )
+        self.per_user = per_user_tokens_per_minute
+        self.per_tenant = per_tenant_tokens_per_minute
+        self.default_turn_tokens = default_turn_tokens
+        self.average_turn_tokens: Optional[float] = None
+        self.admitted = 0
+        self.queued = 0
+        self.refused = 0
+        self.throttled = 0
+        self.tokens_used = 0
+        self._users: Dict[str, TokenBucket] = {}
+        self._tenants: Dict[str, TokenBucket] = {}
+        self._estimates: "OrderedDict[str, float]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.global_bucket or self.per_user or self.per_tenant)
+
+    def estimate(self, conversation_id: str) -> float:
+        """Expected total tokens of the conversation's next turn."""
+        estimate = self._estimates.get(conversation_id)
+        if estimate is not None:
+            return estimate
+        if self.average_turn_tokens is not None:
+            return self.average_turn_tokens
+        return self.default_turn_tokens
+
+    def record_usage(self, conversation_id: str, total_tokens: int) -> None:
+        self.tokens_used += total_tokens
+        previous = self._estimates.pop(conversation_id, None)
+        self._estimates[conversation_id] = (
+            float(total_tokens) if previous is None
+            else previous + _EWMA_ALPHA * (total_tokens - previous)
+        )
+        if len(self._estimates) > _MAX_TRACKED_CONVERSATIONS:
+            self._estimates.popitem(last=False)
+        average = self.average_turn_tokens
+        self.average_turn_tokens = (
+            float(total_tokens) if average is None
+            else average + _EWMA_ALPHA * (total_tokens - average)
+        )
+
+    def record_throttle(self) -> None:
+        """The service rate limited a run: stop admitting until buckets refill."""
+        self.throttled += 1
+        if self.global_bucket is not None:
+            self.global_bucket.drain()
+
+    def _bucket(
+        self, buckets: Dict[str, TokenBucket], key: str, limit: float
+    ) -> TokenBucket:
+        bucket = buckets.get(key)
+        if bucket is None:
+            # Full buckets carry no state; drop them before adding more
+            if len(buckets) >= 1024:
+                for stale in [k for k, b in buckets.items() if b.full]:
+                    del buckets[stale]
+            bucket = buckets[key] = TokenBucket(limit)
+        return bucket
+
+    def _buckets_for(
+        self, user_id: Optional[str], tenant_id: Optional[str]
+    ) -> List[TokenBucket]:
+        buckets: List[TokenBucket] = []
+        if self.global_bucket is not None:
+            buckets.append(self.global_bucket)
+        if self.per_tenant > 0 and tenant_id:
+            buckets.append(self._bucket(self._tenants, tenant_id, self.per_tenant))
+        if self.per_user > 0 and user_id:
+            buckets.append(self._bucket(self._users, user_id, self.per_user))
+        return buckets
+
+    async def acquire(
+        self,
+        conversation_id: str,
+        *,
+        user_id: Optional[str] = None,
+        tenant_id: Optional[str] = None,
+        max_wait_s: float = 0.0,
+        on_wait: Optional[Callable[[float], Awaitable[None]]] = None,
+    ) -> Tuple[Optional[TokenReservation], float]:
+        """Reserve the estimated cost of the next turn.
+
+        Returns ``(reservation, 0)`` once every bucket has room, waiting up
+        to `max_wait_s` (calling `on_wait(seconds)` before the first wait),
+        or ``(None, retry_after_s)`` if the turn should be refused.
+        """
+        estimate = self.estimate(conversation_id)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_wait_s
+        waited = False
+        while True:
+            buckets = self._buckets_for(user_id, tenant_id)
+            wait = max((b.wait_for(estimate) for b in buckets), default=0.0)
+            if wait <= 0:
+                taken = [(b, min(estimate, b.capacity)) for b in buckets]
+                for bucket, tokens in taken:
+                    bucket.take(tokens)
+                self.admitted += 1
+                return (
+                    TokenReservation(self, taken, conversation_id, estimate),
+                    0.0,
+                )
+            if loop.time() + wait > deadline:
+                self.refused += 1
+                logger.warning(
+                    "Token budget exhausted - Conversation ID: %s, "
+                    "estimate %.0f tokens, retry in %.1f s",
+                    conversation_id,
+                    estimate,
+                    wait,
+                )
+                return None, wait
+            if not waited:
+                waited = True
+                self.queued += 1
+                if on_wait is not None:
+                    await on_wait(wait)
+            await asyncio.sleep(max(wait, _MIN_WAIT_S))
+
+    def snapshot(self) -> Dict[str, Any]:
+        def _levels(buckets: Dict[str, TokenBucket]) -> Dict[str, Any]:
+            levels = [b.level for b in buckets.values()]
+            return {
+                "tracked": len(levels),
+                "min_level": round(min(levels), 1) if levels else None,
+            }
+
+        snapshot: Dict[str, Any] = {
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "refused": self.refused,
+            "throttled": self.throttled,
+            "tokens_used": self.tokens_used,
+            "average_turn_tokens": (
+                round(self.average_turn_tokens, 1)
+                if self.average_turn_tokens is not None else None
+            ),
+        }
+        if self.global_bucket is not None:
+            snapshot["global"] = {
+                "capacity": self.global_bucket.capacity,
+                "level": round(self.global_bucket.level, 1),
+            }
+        if self.per_tenant > 0:
+            snapshot["tenants"] = {
+                "capacity": self.per_tenant, **_levels(self._tenants)
+            }
+        if self.per_user > 0:
+            snapshot["users"] = {
+                "capacity": self.per_user, **_levels(self._users)
+            }
+        return snapshot
+
+
+def is_throttle_error(exc: BaseException) -> bool:
+    """True when a failed run or request was rate limited by the service.
+
+    A 429 response carries its status code, but a run that fails on the
+    tokens-per-minute quota surfaces as an exception holding only the run's
+    error message ("Rate limit is exceeded..."), so the message and error
+    code are checked too, along the exception's cause chain.
+    """
+    seen = set()
+    current: Optional[BaseException] = exc
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        if getattr(current, "status_code", None) == 429:
+            return True
+        code = getattr(current, "code", None) or getattr(
+            getattr(current, "error", None), "code", None
+        )
+        if code == "rate_limit_exceeded":
+            return True
+        message = str(current).lower()
+        if "rate limit" in message or "rate_limit_exceeded" in message:
+            return True
+        current = current.__cause__ or current.__context__
+    return False
+
+
+_budget: Optional[TokenBudget] = None
+
+
+def get_token_budget() -> Optional[TokenBudget]:
+    """The process's token budget, or None when no limit is configured."""
+    return _budget
+
+
+def install_token_budget(budget: TokenBudget) -> None:
+    """Make `budget` the process's limiter and export its bucket levels."""
+    global _budget
+    _budget = budget if budget.enabled else None
+    if _budget is not None:
+        register_metrics_provider("token_budget", _budget.snapshot)
+
+
+__all__ = [
+    "TokenBucket",
+    "TokenBudget",
+    "TokenReservation",
+    "get_token_budget",
+    "install_token_budget",
+    "is_throttle_error",
+]